@@ -0,0 +1,66 @@
+import asyncio, time
+import apis
+import pytest
+from backtest import ReplayExchange, backtest_strategy3, load_session, record_mock_session, run_virtual
+from client import close_client, get_client
+from mock_exchange import MockExchange
+from recorder import Recorder
+from strategy3_models import StrategyConfig
+
+AUTH = {"username": "replay", "password": "replay", "server": "127.0.0.1", "port": 0}
+
+
+def test_virtual_loop_reports_a_deadlock():
+    with pytest.raises(RuntimeError, match="deadlock"):
+        run_virtual(asyncio.Event().wait())
+
+
+def test_virtual_loop_waits_for_worker_threads():
+    assert run_virtual(asyncio.to_thread(lambda: time.sleep(0.05) or "done")) == "done"
+
+
+def test_load_recording_replays_the_recorded_prints(tmp_path):
+    path = str(tmp_path / "session")
+    exchange = MockExchange(seed=3)
+
+    async def main():
+        get_client(AUTH, transport=exchange.transport())
+        recorder = Recorder(AUTH, path)
+        recorder.start()
+        try:
+            await apis.query_securities(AUTH)
+            for _ in range(20):
+                exchange.advance_tick()
+                await apis.query_case_status(AUTH)
+                for ticker in exchange.tickers:
+                    await apis.query_security_order_book(AUTH, ticker, 20)
+                    await apis.query_time_and_sales_after(AUTH, ticker)
+                await apis.query_tenders(AUTH)
+        finally:
+            await recorder.stop()
+            await close_client(AUTH)
+
+    asyncio.run(main())
+    header, frames = load_session(path)
+    assert header["ticks_per_period"] == exchange.ticks_per_period
+    assert [frame["tick"] for frame in frames] == list(range(1, 21))
+
+    replay = ReplayExchange(header, frames)
+    while replay.status == "ACTIVE":
+        replay.advance_tick()
+    for ticker in exchange.tickers:
+        recorded = [(sale["price"], sale["quantity"]) for sale in exchange.time_and_sales[ticker]]
+        assert [(sale["price"], sale["quantity"]) for sale in replay.time_and_sales[ticker]] == recorded
+
+
+def test_square_off_parameters_drive_the_result(tmp_path):
+    path = str(tmp_path / "session.jsonl")
+    record_mock_session(path, seed=1)
+    session = load_session(path)
+
+    def pnl(**params):
+        config = StrategyConfig(min_vwap_margin=-1000, display_interval=0, metrics_interval=0, **params)
+        return backtest_strategy3(session, config).pnl
+
+    assert pnl(square_off_mode="stop_loss") != pnl(square_off_mode="stop_loss", stop_loss_percent=0.001)
+    assert pnl(square_off_mode="limit") != pnl(square_off_mode="limit", min_profit_margin=0.6)
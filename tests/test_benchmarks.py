@@ -0,0 +1,129 @@
+import asyncio, contextlib, io
+import pytest
+import apis
+from client import close_client, get_client
+from mock_exchange import MockExchange
+from models import CaseDataResponse, OrderRequest, OrderResponse
+from strategy3 import Strategy3, calculate_vwap
+from strategy3_models import StrategyConfig
+from stub_server import start_stub_server
+
+AUTH = {"username": "bench", "password": "bench", "server": "127.0.0.1", "port": 0}
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.run_until_complete(close_client(AUTH))
+    loop.close()
+
+
+@pytest.fixture
+def exchange():
+    exchange = MockExchange(tender_every=1, tender_expiry=1000)
+    for _ in range(20):
+        exchange.advance_tick()
+    return exchange
+
+
+@pytest.fixture
+def mock_auth(loop, exchange):
+    """AUTH routed in-process to the mock exchange."""
+    loop.run_until_complete(close_client(AUTH))
+    get_client(AUTH, transport=exchange.transport())
+    return AUTH
+
+
+@pytest.fixture
+def strategy(loop, mock_auth):
+    strategy = Strategy3(StrategyConfig(display_interval=0), mock_auth)
+    # Warm the book cache, the benchmarks read the cached book like the live loop
+    loop.run_until_complete(strategy.book_cache.book("CRZY"))
+    return strategy
+
+
+@pytest.fixture
+def quiet():
+    """Swallows the strategy's prints, they would dominate the measurement."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def test_calculate_vwap(benchmark):
+    levels = [(25.0 + i * 0.01, 1000 + 100 * i) for i in range(20)]
+    assert benchmark(calculate_vwap, levels) == calculate_vwap(levels)
+
+
+def test_generate_market_depth(benchmark, loop, strategy):
+    depth = benchmark(lambda: loop.run_until_complete(strategy.generate_market_depth("CRZY")))
+    assert depth.ticker == "CRZY"
+
+
+def test_generate_signal(benchmark, loop, strategy):
+    signal = benchmark(
+        lambda: loop.run_until_complete(
+            strategy.generate_signal("CRZY", 25.0, "BUY", 20000, 0.1)
+        )
+    )
+    assert signal.vwap is not None
+
+
+def test_order_request_validation(benchmark):
+    order = benchmark(
+        OrderRequest, ticker="CRZY", type="LIMIT", quantity=5000, action="BUY", price=25.01
+    )
+    assert order.quantity == 5000
+
+
+def test_order_response_validation(benchmark, exchange):
+    payload = exchange.submit_order("CRZY", "MARKET", 1000, "BUY")
+    assert benchmark(OrderResponse.model_validate, payload).order_id == payload["order_id"]
+
+
+def test_case_validation(benchmark, exchange):
+    payload = exchange.case()
+    assert benchmark(CaseDataResponse.model_validate, payload).tick == exchange.tick
+
+
+def test_chunk_order(benchmark, loop, mock_auth, quiet):
+    order = OrderRequest(ticker="CRZY", type="LIMIT", quantity=100000, action="BUY", price=20.0)
+    fill = benchmark(
+        lambda: loop.run_until_complete(apis.chunk_order(mock_auth, order, batch_size=10000))
+    )
+    assert len(fill.orders) == 10
+
+
+def test_tender_to_square_off(benchmark, loop, exchange, quiet):
+    """Strategy3.process_tenders from signal to a flat position, over local HTTP."""
+
+    async def serve():
+        server, port = await start_stub_server(exchange.handle)
+        await close_client(AUTH)
+        return server, {**AUTH, "port": port}
+
+    server, auth = loop.run_until_complete(serve())
+    # Every tender is favourable, and past trade_until_tick the square-off engine goes to MARKET
+    strategy = Strategy3(
+        StrategyConfig(display_interval=0, min_vwap_margin=-1000, trade_until_tick=0), auth
+    )
+
+    async def cycle():
+        # A new tick refreshes the liquidity the previous square-off took
+        exchange.advance_tick()
+        exchange._generate_tender("CRZY")
+        tender = exchange.tenders[max(exchange.tenders)]
+        # The positions poller of the live loop
+        await strategy.positions.refresh()
+        square_offs = await strategy.process_tenders([tender])
+        assert len(square_offs) == 1
+        fill = await square_offs[0]
+        assert fill.quantity_filled == tender["quantity"]
+
+    try:
+        benchmark.pedantic(lambda: loop.run_until_complete(cycle()), rounds=5)
+    finally:
+        loop.run_until_complete(close_client(auth))
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+    assert exchange.positions["CRZY"] == 0
@@ -0,0 +1,48 @@
+import math
+from market_depth import DepthSide, MarketDepth, evaluate_tender
+from order_book import OrderBook
+
+
+def test_depth_side_running_totals():
+    side = DepthSide([(25.0, 1000), (24.9, 3000)])
+    assert list(side.cumulative_volumes) == [1000, 4000]
+    assert side.vwaps[1] == (25.0 * 1000 + 24.9 * 3000) / 4000
+    assert side.level_for_quantity(1000) == 0
+    assert side.level_for_quantity(1001) == 1
+    assert side.level_for_quantity(4001) is None
+
+
+def test_depth_side_accepts_float_quantities():
+    depth = MarketDepth("CRZY", [(25.0, 1000.0), (24.9, 500.5)], [(25.1, 200.0)])
+    assert list(depth.bids.cumulative_volumes) == [1000.0, 1500.5]
+    assert depth.vwap_to_fill("BUY", 200) == 25.1
+    assert depth.vwap_to_fill("BUY", 201) is None
+
+
+def test_depth_side_zero_volume_level():
+    side = DepthSide([(25.0, 0)])
+    assert math.isnan(side.vwaps[0])
+
+
+def test_from_order_book_with_float_entries():
+    book = OrderBook("CRZY")
+    book.apply(
+        {
+            "bids": [{"price": 25.0, "quantity": 1000.0, "quantity_filled": 250.0}],
+            "asks": [{"price": 25.1, "quantity": 800.0}],
+        }
+    )
+    depth = MarketDepth.from_order_book(book)
+    assert depth.bids.vwap_for_quantity(750) == 25.0
+    assert evaluate_tender(depth, 25.2, "SELL", 500, margin=0.1) == (True, 25.0)
+
+
+def test_evaluate_tender():
+    depth = MarketDepth("CRZY", [(25.0, 1000), (24.0, 1000)], [(25.1, 1000)])
+    # Selling 2000 sweeps both bid levels down to a 24.5 VWAP
+    assert evaluate_tender(depth, 24.6, "SELL", 2000) == (True, 24.5)
+    assert evaluate_tender(depth, 24.6, "SELL", 2000, margin=0.2) == (False, 24.5)
+    # Beyond the visible depth the best level's VWAP is used
+    assert evaluate_tender(depth, 25.0, "BUY", 5000) == (True, 25.1)
+    assert evaluate_tender(depth, 25.0, "HOLD", 5000) == (False, -1)
+    assert evaluate_tender(MarketDepth("CRZY", [], []), 25.0, "BUY", 1) == (False, -1)
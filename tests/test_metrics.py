@@ -0,0 +1,45 @@
+from metrics import LatencyHistogram
+
+
+def histogram(*microseconds: int) -> LatencyHistogram:
+    result = LatencyHistogram()
+    for value in microseconds:
+        # Half a microsecond up, record() truncates to whole microseconds
+        result.record((value + 0.5) / 1e6)
+    return result
+
+
+def test_percentiles_of_known_samples():
+    latencies = histogram(*range(1, 101))
+    assert latencies.count == 100 and latencies.min == 1 and latencies.max == 100
+    # Values below 64 have a bucket each
+    assert latencies.percentile(50) == 50
+    # 98 and 99 share a bucket, reported at its upper edge
+    assert latencies.percentile(99) == 99
+    assert latencies.percentile(100) == 100
+    assert latencies.summary()["p50"] == 0.05
+
+
+def test_bucket_edges():
+    # 63 is the last exact bucket, 64 and 65 share the next one
+    latencies = histogram(63, 64, 65, 1000)
+    assert latencies.percentile(25) == 63
+    assert latencies.percentile(50) == 65
+    assert latencies.percentile(75) == 65
+    # The top bucket is capped at the largest value seen
+    assert latencies.percentile(100) == 1000
+
+
+def test_percentiles_stay_within_one_sub_bucket():
+    for value in (1, 63, 64, 127, 128, 129, 4095, 4096, 100000, 2**20 + 1):
+        reported = histogram(value, 10**9).percentile(50)
+        assert value <= reported <= value * (1 + 1 / 32)
+
+
+def test_merge_matches_recording_everything_once():
+    merged = histogram(1, 50, 700)
+    merged.merge(histogram(3, 90000))
+    everything = histogram(1, 50, 700, 3, 90000)
+    assert merged.counts == everything.counts
+    assert (merged.count, merged.min, merged.max) == (5, 1, 90000)
+    assert merged.percentile(50) == everything.percentile(50)
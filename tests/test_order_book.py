@@ -0,0 +1,50 @@
+from order_book import OrderBook
+
+
+def entry(price: float, quantity: float, filled: float = 0) -> dict:
+    return {"price": price, "quantity": quantity, "quantity_filled": filled}
+
+
+def test_apply_inserts_updates_and_removes_levels():
+    book = OrderBook("CRZY")
+    changed = book.apply(
+        {
+            "bids": [entry(24.9, 500), entry(25.0, 1000), entry(25.0, 300, 100)],
+            "asks": [entry(25.2, 400), entry(25.1, 200)],
+        }
+    )
+    assert changed == 4 and book.sequence == 1
+    # Orders at one price are aggregated, net of their fills
+    assert book.bids() == [(25.0, 1200), (24.9, 500)]
+    assert book.asks() == [(25.1, 200), (25.2, 400)]
+
+    changed = book.apply(
+        {
+            "bids": [entry(24.8, 100), entry(24.95, 700), entry(25.0, 1000)],
+            "asks": [entry(25.2, 400), entry(25.15, 50)],
+        }
+    )
+    # 25.0 resized, 24.95 and 24.8 inserted, 24.9 removed, 25.15 inserted, 25.1 removed
+    assert changed == 6
+    assert book.bids() == [(25.0, 1000), (24.95, 700), (24.8, 100)]
+    assert book.asks() == [(25.15, 50), (25.2, 400)]
+    assert list(book.bid_prices) == sorted(book.bid_prices)
+    assert list(book.ask_prices) == sorted(book.ask_prices)
+    assert book.best_bid() == (25.0, 1000) and book.best_ask() == (25.15, 50)
+
+
+def test_apply_without_changes_touches_nothing():
+    book = OrderBook("CRZY")
+    response = {"bids": [entry(25.0, 1000)], "asks": [entry(25.1, 200)]}
+    book.apply(response)
+    assert book.apply(response) == 0
+    assert book.sequence == 2
+
+
+def test_apply_drops_filled_and_emptied_sides():
+    book = OrderBook("CRZY")
+    book.apply({"bids": [entry(25.0, 1000)], "asks": [entry(25.1, 200)]})
+    book.apply({"bids": [entry(25.0, 1000, 1000)], "asks": []})
+    assert book.best_bid() is None and book.best_ask() is None
+    assert len(book.bid_prices) == 0 and book.bid_quantities == {}
+    assert book.bid_level_of(25.0) == 0 and book.ask_level_of(25.0) == 0
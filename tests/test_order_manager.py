@@ -0,0 +1,82 @@
+import asyncio
+from client import close_client, get_client
+from mock_exchange import MockExchange
+from models import OrderRequest
+from order_manager import OrderManager
+
+AUTH = {"username": "orders", "password": "orders", "server": "127.0.0.1", "port": 0}
+
+
+def order(
+    order_id: int, status: str, quantity: int = 1000, filled: int = 0, action: str = "BUY"
+) -> dict:
+    return {
+        "order_id": order_id,
+        "ticker": "CRZY",
+        "type": "LIMIT",
+        "quantity": quantity,
+        "quantity_filled": filled,
+        "action": action,
+        "price": 25.0,
+        "status": status,
+    }
+
+
+def test_index_follows_transacted_and_cancelled_updates():
+    orders = OrderManager(AUTH)
+    orders.record(order(1, "OPEN"))
+    orders.record(order(2, "OPEN", 500, action="SELL"))
+    orders.record(order(3, "OPEN", 200))
+    assert orders.open_quantity("CRZY", "BUY") == 1200
+    assert orders.open_quantity("CRZY") == 1700
+
+    orders.record(order(1, "OPEN", filled=400))
+    assert orders.open_quantity("CRZY", "BUY") == 800
+    orders.record(order(1, "TRANSACTED", filled=1000))
+    orders.record(order(2, "CANCELLED", 500, filled=100, action="SELL"))
+
+    assert orders.by_status["OPEN"] == {3}
+    assert orders.by_status["TRANSACTED"] == {1}
+    assert orders.by_status["CANCELLED"] == {2}
+    assert orders.by_ticker["CRZY"] == {1, 2, 3}
+    assert [o.order_id for o in orders.open_orders("CRZY")] == [3]
+    assert orders.open_quantity("CRZY", "BUY") == 200
+    assert orders.open_quantity("CRZY", "SELL") == 0
+
+
+def test_cancel_all_cancels_a_partially_filled_order():
+    exchange = MockExchange()
+    book = exchange.books["CRZY"]
+    # Alone at the best bid, so a market sell fills it first
+    price = round((book.best_bid() + book.best_ask()) / 2, 2)
+
+    async def main():
+        get_client(AUTH, transport=exchange.transport())
+        orders = OrderManager(AUTH)
+        try:
+            posted = await orders.post(
+                OrderRequest(
+                    ticker="CRZY", type="LIMIT", quantity=1000, action="BUY", price=price, dry_run=0
+                )
+            )
+            exchange.submit_order("CRZY", "MARKET", 400, "SELL", trader_id="taker")
+            await orders.reconcile()
+            partial = orders.orders[posted.order_id]
+            open_before = orders.open_quantity("CRZY", "BUY")
+            cancelled = await orders.cancel_all("CRZY")
+            await orders.reconcile()
+            return posted, partial, open_before, cancelled, orders
+        finally:
+            await close_client(AUTH)
+
+    posted, partial, open_before, cancelled, orders = asyncio.run(main())
+    assert partial.status == "OPEN" and partial.quantity_filled == 400
+    assert open_before == 600
+    assert cancelled == 1
+    assert orders.by_status["OPEN"] == set()
+    assert orders.by_status["CANCELLED"] == {posted.order_id}
+    assert orders.open_quantity("CRZY") == 0
+    # The reconcile keeps the fill the cancel did not undo
+    assert orders.orders[posted.order_id].quantity_filled == 400
+    assert exchange.orders[posted.order_id]["status"] == "CANCELLED"
+    assert exchange.positions["CRZY"] == 400
@@ -0,0 +1,102 @@
+import asyncio, httpx
+import apis
+from backtest import run_virtual
+from client import close_client, get_client
+from models import ClientConfig, OrderRequest
+from rate_limit import RateLimiter, TokenBucket, endpoint_class, retry_after
+
+AUTH = {"username": "limits", "password": "limits", "server": "127.0.0.1", "port": 0}
+
+
+def test_retry_after_prefers_the_body_hint():
+    request = httpx.Request("POST", "http://test/v1/orders")
+    assert retry_after(httpx.Response(429, json={"wait": 0.25}, request=request)) == 0.25
+    assert retry_after(httpx.Response(429, headers={"Retry-After": "2"}, request=request)) == 2.0
+    assert retry_after(httpx.Response(429, request=request)) == 0.5
+
+
+def test_endpoint_classes():
+    assert endpoint_class("POST", "/v1/orders") == "orders"
+    assert endpoint_class("DELETE", "/v1/orders/3") == "cancels"
+    assert endpoint_class("POST", "/v1/commands/cancel") == "cancels"
+    assert endpoint_class("GET", "/v1/orders") == "queries"
+
+
+def test_token_bucket_paces_on_the_loop_clock():
+    bucket = TokenBucket(rate=10, burst=2)
+    sleeps = []
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for _ in range(6):
+            await bucket.acquire()
+            sleeps.append(loop.time() - start)
+
+    # Virtual time only moves when every task sleeps, a wall clock bucket would spin
+    run_virtual(main())
+    assert sleeps[:2] == [0.0, 0.0]
+    assert abs(sleeps[-1] - 0.4) < 1e-9
+
+
+def test_accepted_requests_recover_the_rate_up_to_its_ceiling():
+    bucket = TokenBucket(rate=10)
+    for _ in range(100):
+        bucket.accepted()
+    assert bucket.rate == 10
+
+    limiter = RateLimiter({"orders": None}, throttled_rate=10.0)
+
+    async def main():
+        bucket = limiter.throttled("POST", "/v1/orders", 0)
+        bucket.throttled(0)
+        assert bucket.rate == 5.0
+        for _ in range(100):
+            bucket.accepted()
+        return bucket.rate
+
+    assert run_virtual(main()) == 10.0
+
+
+def test_throttled_bucket_waits_for_the_hint():
+    limiter = RateLimiter({"orders": None}, burst=1, throttled_rate=10.0)
+    assert limiter.bucket("POST", "/v1/orders") is None
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        bucket = limiter.throttled("POST", "/v1/orders", 1.5)
+        assert limiter.bucket("POST", "/v1/orders") is bucket
+        assert bucket.rate == 10.0
+        start = loop.time()
+        await bucket.acquire()
+        return loop.time() - start
+
+    assert run_virtual(main()) >= 1.5
+
+
+def test_chunk_order_leaves_429_retries_to_the_client():
+    attempts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        attempts.append(request.url.params["quantity"])
+        return httpx.Response(429, json={"wait": 0.01})
+
+    async def main():
+        get_client(
+            AUTH,
+            ClientConfig(max_retries=2, retry_backoff=0.001),
+            transport=httpx.MockTransport(handler),
+        )
+        try:
+            return await apis.chunk_order(
+                AUTH,
+                OrderRequest(ticker="CRZY", type="MARKET", quantity=15000, action="BUY", dry_run=0),
+                batch_size=10000,
+            )
+        finally:
+            await close_client(AUTH)
+
+    fill = run_virtual(main())
+    # Two children, each sent once plus the client's two retries
+    assert len(attempts) == 6
+    assert fill.quantity_filled == 0 and fill.orders == []
@@ -0,0 +1,35 @@
+import asyncio
+import apis
+from client import close_client, get_client
+from mock_exchange import MockExchange
+from recorder import CASE, Recorder, RecordingReader
+
+AUTH = {"username": "record", "password": "record", "server": "127.0.0.1", "port": 0}
+
+
+def record_session(exchange: MockExchange, path: str, ticks: int):
+    async def main():
+        get_client(AUTH, transport=exchange.transport())
+        recorder = Recorder(AUTH, path)
+        recorder.start()
+        try:
+            for _ in range(ticks):
+                await apis.query_case_status(AUTH)
+                exchange.advance_tick()
+        finally:
+            await recorder.stop()
+            await close_client(AUTH)
+
+    asyncio.run(main())
+
+
+def test_a_new_session_replaces_the_previous_recording(tmp_path):
+    path = str(tmp_path / "session")
+    record_session(MockExchange(), path, 10)
+    record_session(MockExchange(), path, 5)
+
+    with RecordingReader(path) as reader:
+        ticks = [record.tick for record in reader.records(kind=CASE)]
+        position = reader.seek_tick(3)
+        assert reader[position].tick == 3
+    assert ticks == sorted(ticks) and len(ticks) == 5
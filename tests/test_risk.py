@@ -0,0 +1,138 @@
+import asyncio
+from client import close_client, get_client
+from mock_exchange import MockExchange
+from risk import PositionService
+from strategy3 import Strategy3
+from strategy3_models import StrategyConfig
+
+AUTH = {"username": "risk", "password": "risk", "server": "127.0.0.1", "port": 0}
+
+
+def service(net_limit: int = 100000, gross_limit: int = 250000) -> PositionService:
+    return PositionService(AUTH, net_limit=net_limit, gross_limit=gross_limit)
+
+
+def test_limits_are_checked_on_net_and_gross():
+    positions = service(net_limit=50000, gross_limit=60000)
+    positions._update("CRZY", 40000, 25.0)
+    positions._update("TAME", -10000, 10.0)
+    assert (positions.net, positions.gross) == (30000, 50000)
+    assert positions.exposure_after("TAME", 10000) == (40000, 40000)
+    assert positions.can_accept("CRZY", 10000)
+    assert not positions.can_accept("CRZY", 10001)  # gross
+    assert not positions.can_accept("TAME", -30001)  # gross
+    positions.gross_limit = 250000
+    assert not positions.can_accept("CRZY", 20001)  # net
+
+
+def test_concurrent_reservations_see_each_other():
+    positions = service(net_limit=25000)
+    assert positions.reserve("CRZY", 10000)
+    assert positions.reserve("CRZY", 10000)
+    assert not positions.reserve("CRZY", 10000)
+    assert positions.position("CRZY") == 20000
+    positions.release("CRZY", 10000)
+    assert positions.position("CRZY") == 10000
+    assert positions.reserve("CRZY", 10000)
+
+
+def test_landed_reservation_is_not_counted_twice():
+    positions = service(net_limit=25000)
+    assert positions.reserve("CRZY", 10000)
+    # The tender lands server-side before confirm()
+    positions._update("CRZY", 10000, 25.0)
+    assert positions.position("CRZY") == 10000
+    assert positions.pending["CRZY"] == 0
+    # A concurrent tender still fits under the net limit
+    assert positions.reserve("CRZY", 10000)
+    positions.confirm("CRZY", 10000)
+    assert positions.position("CRZY") == 20000
+    positions._update("CRZY", 20000, 25.0)
+    positions.confirm("CRZY", 10000)
+    assert positions.position("CRZY") == 20000
+    assert positions.reservations["CRZY"] == []
+
+
+def test_reservations_land_in_order():
+    positions = service()
+    positions.reserve("CRZY", -10000)
+    positions.reserve("CRZY", -10000)
+    # Only the first one is in the server position
+    positions._update("CRZY", -10000, 25.0)
+    assert positions.pending["CRZY"] == -10000
+    assert positions.position("CRZY") == -20000
+    positions._update("CRZY", -20000, 25.0)
+    assert positions.pending["CRZY"] == 0
+    assert positions.position("CRZY") == -20000
+
+
+async def apply_order(positions: PositionService, order: dict):
+    positions.apply_order(order)
+
+
+def test_own_fills_do_not_land_a_reservation():
+    positions = service()
+    positions._update("CRZY", -5000, 25.0)
+    positions.reserve("CRZY", 10000)
+    # Buying back the short moves the position the same way as the tender would
+    asyncio.run(
+        apply_order(positions, {"ticker": "CRZY", "action": "BUY", "quantity_filled": 5000.0})
+    )
+    assert positions.server_position("CRZY") == 0
+    assert positions.pending["CRZY"] == 10000
+    assert positions.position("CRZY") == 10000
+    positions._update("CRZY", 10000, 25.0)
+    assert positions.pending["CRZY"] == 0
+    assert positions.position("CRZY") == 10000
+
+
+def test_release_of_a_tender_that_landed_anyway():
+    positions = service()
+    positions.reserve("CRZY", 10000)
+    positions._update("CRZY", 10000, 25.0)
+    # is_tender_processed timed out, the snapshot already has it
+    positions.release("CRZY", 10000)
+    assert positions.position("CRZY") == 10000
+    assert (positions.net, positions.gross) == (10000, 10000)
+
+
+def test_snapshot_requested_before_a_fill_does_not_overwrite_it():
+    positions = service()
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        positions._update("CRZY", 30000, 25.0, loop.time())
+        requested_at = loop.time()
+        await asyncio.sleep(0.01)
+        positions.apply_order({"ticker": "CRZY", "action": "SELL", "quantity_filled": 10000})
+        # The in-flight snapshot still has the position from before the fill
+        positions._update("CRZY", 30000, 25.1, requested_at)
+        assert positions.server_position("CRZY") == 20000
+        assert positions.last_prices["CRZY"] == 25.1
+        await asyncio.sleep(0.01)
+        positions._update("CRZY", 20000, 25.2, loop.time())
+        assert positions.server_position("CRZY") == 20000
+
+    asyncio.run(main())
+
+
+def test_failed_tender_accept_releases_the_reservation():
+    exchange = MockExchange()
+    exchange._generate_tender("CRZY")
+    tender = exchange.tenders.pop(max(exchange.tenders))
+    auth = {**AUTH, "username": "tender"}
+
+    async def main():
+        get_client(auth, transport=exchange.transport())
+        # Every tender is favourable, the expired one reaches post_tender
+        strategy = Strategy3(StrategyConfig(display_interval=0, min_vwap_margin=-1000), auth)
+        try:
+            # The server answers 404, the tender expired before the accept
+            assert await strategy.process_tenders([tender]) == []
+        finally:
+            await close_client(auth)
+        return strategy.positions
+
+    positions = asyncio.run(main())
+    assert (positions.net, positions.gross) == (0, 0)
+    assert positions.reservations["CRZY"] == []
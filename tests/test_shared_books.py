@@ -0,0 +1,26 @@
+from order_book import OrderBook
+from shared_books import SharedBooks
+
+
+def test_publish_and_snapshot_round_trip():
+    book = OrderBook("CRZY")
+    book.apply(
+        {
+            "bids": [
+                {"price": 10.0, "quantity": 1000.5, "quantity_filled": 0},
+                {"price": 9.9, "quantity": 300, "quantity_filled": 100},
+            ],
+            "asks": [{"price": 10.1, "quantity": 250.25, "quantity_filled": 0}],
+        }
+    )
+    books = SharedBooks.create(["CRZY", "RGLD"], depth=4)
+    try:
+        assert books.snapshot("CRZY") is None
+        books.publish(book)
+        snapshot = books.snapshot("CRZY")
+        assert snapshot.bids() == [(10.0, 1000.5), (9.9, 200)]
+        assert snapshot.asks() == [(10.1, 250.25)]
+        assert snapshot.best_bid() == (10.0, 1000.5)
+        assert books.snapshot("RGLD") is None
+    finally:
+        books.close()
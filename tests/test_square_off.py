@@ -0,0 +1,195 @@
+import asyncio, httpx
+import apis
+from backtest import run_virtual
+from client import close_client, get_client
+from mock_exchange import TRADER_ID, MockExchange
+from models import ClientConfig
+from risk import PositionService
+from securities import SecuritiesSnapshot
+from tick_clock import TickClock
+
+AUTH = {"username": "square", "password": "square", "server": "127.0.0.1", "port": 0}
+
+
+def slow_transport(exchange: MockExchange, orders: list) -> httpx.MockTransport:
+    """Delays /v1/securities responses by 250 ms and orders by 10 ms, so snapshots lag fills."""
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if request.method == "POST" and path == "/v1/orders":
+            orders.append(dict(request.url.params))
+        response = exchange.respond(request)
+        await asyncio.sleep(0.25 if path == "/v1/securities" else 0.01)
+        return response
+
+    return httpx.MockTransport(handler)
+
+
+def test_market_square_off_does_not_oversell_on_lagging_snapshots():
+    exchange = MockExchange()
+    exchange.submit_order("CRZY", "MARKET", 30000, "BUY")
+    assert exchange.positions["CRZY"] == 30000
+    orders = []
+
+    async def main():
+        get_client(AUTH, transport=slow_transport(exchange, orders))
+        securities = SecuritiesSnapshot(AUTH, interval=0.1)
+        positions = PositionService(AUTH, securities=securities)
+        securities.start()
+        positions.start()
+        try:
+            await securities.refresh()
+            # The next poll is taken before the first SELL and lands after the second
+            await asyncio.sleep(0.2)
+            await asyncio.wait_for(
+                apis.market_square_off_ticker(
+                    AUTH, "CRZY", 10000, positions=positions, securities=securities
+                ),
+                timeout=30,
+            )
+        finally:
+            await positions.stop()
+            await securities.stop()
+            await close_client(AUTH)
+        return positions
+
+    positions = run_virtual(main())
+    assert [order["action"] for order in orders] == ["SELL"] * 3
+    assert exchange.positions["CRZY"] == 0
+    assert positions.server_position("CRZY") == 0
+
+
+def test_market_square_off_falls_back_to_positions_when_snapshots_time_out():
+    exchange = MockExchange()
+    exchange.submit_order("CRZY", "MARKET", 30000, "BUY")
+    orders = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if request.method == "POST" and path == "/v1/orders":
+            orders.append(dict(request.url.params))
+        response = exchange.respond(request)
+        # Slower than fresh() waits, every snapshot arrives too late
+        await asyncio.sleep(5 if path == "/v1/securities" else 0.01)
+        return response
+
+    async def main():
+        get_client(AUTH, transport=httpx.MockTransport(handler))
+        securities = SecuritiesSnapshot(AUTH, interval=0.1)
+        positions = PositionService(AUTH, securities=securities)
+        await securities.refresh()
+        securities.start()
+        try:
+            await asyncio.wait_for(
+                apis.market_square_off_ticker(
+                    AUTH, "CRZY", 10000, positions=positions, securities=securities
+                ),
+                timeout=60,
+            )
+        finally:
+            await securities.stop()
+            await close_client(AUTH)
+
+    run_virtual(main())
+    assert [order["action"] for order in orders] == ["SELL"] * 3
+    assert exchange.positions["CRZY"] == 0
+
+
+def test_market_square_off_survives_a_throttled_position_query():
+    exchange = MockExchange()
+    exchange.submit_order("CRZY", "MARKET", 5000, "BUY")
+    throttled = [2]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/v1/securities" and throttled[0]:
+            throttled[0] -= 1
+            return httpx.Response(429, json={"wait": 0})
+        return exchange.respond(request)
+
+    async def main():
+        get_client(AUTH, ClientConfig(max_retries=0), transport=httpx.MockTransport(handler))
+        try:
+            await asyncio.wait_for(apis.market_square_off_ticker(AUTH, "CRZY"), timeout=30)
+        finally:
+            await close_client(AUTH)
+
+    run_virtual(main())
+    assert throttled[0] == 0
+    assert exchange.positions["CRZY"] == 0
+
+
+def test_stop_loss_square_off_reads_the_tick_before_the_clock_polls():
+    exchange = MockExchange()
+    for _ in range(10):
+        exchange.advance_tick()
+
+    async def main():
+        get_client(AUTH, transport=exchange.transport())
+        # Never started, its tick is None until current_tick() polls the case
+        clock = TickClock(AUTH)
+        try:
+            await asyncio.wait_for(
+                apis.stop_loss_square_off_ticker(
+                    AUTH, 1, "CRZY", 30.0, 1000, "SELL", 20.0, square_off_time=5, clock=clock
+                ),
+                timeout=30,
+            )
+        finally:
+            await close_client(AUTH)
+        return clock
+
+    assert run_virtual(main()).tick == exchange.tick
+
+
+def test_trend_adjusted_square_off_reprices_a_partially_filled_child():
+    exchange = MockExchange()
+    exchange.submit_order("CRZY", "MARKET", 5000, "BUY")
+
+    def fill_our_ask(quantity: int):
+        """Another trader lifts the asks up to and including quantity of our resting SELL."""
+        ahead = 0
+        for order in exchange.books["CRZY"].levels("SELL", 1000):
+            if order["trader_id"] == TRADER_ID:
+                exchange.submit_order("CRZY", "LIMIT", ahead + quantity, "BUY", order["price"], "taker")
+                return True
+            ahead += order["quantity"] - order["quantity_filled"]
+        return False
+
+    async def ticks():
+        # Only the tick moves, no noise trades, so every fill is the one below or our own
+        filled = False
+        while True:
+            await asyncio.sleep(1)
+            exchange.tick += 1
+            if not filled and exchange.tick >= 3:
+                filled = fill_our_ask(1500)
+
+    async def main():
+        get_client(AUTH, transport=exchange.transport())
+        ticker = asyncio.create_task(ticks())
+        try:
+            return await asyncio.wait_for(
+                apis.limit_square_off_ticker_trend_adjusted_price(
+                    AUTH, "CRZY", "SELL", 25.0, 5000, square_off_time=20, escalate_ticks=5
+                ),
+                timeout=60,
+            )
+        finally:
+            ticker.cancel()
+            await close_client(AUTH)
+
+    fill = run_virtual(main())
+    children = [order for order in exchange.orders.values() if order["action"] == "SELL"]
+    partially_filled = [
+        order
+        for order in children
+        if order["status"] == "CANCELLED" and 0 < order["quantity_filled"] < order["quantity"]
+    ]
+    # Cancelled after its partial fill and the unfilled rest re-posted at a new price
+    assert partially_filled
+    assert any(
+        order["quantity"] == 3500 and order["price"] != partially_filled[0]["price"]
+        for order in children
+    )
+    assert fill.quantity_filled == sum(order["quantity_filled"] for order in children) == 5000
+    assert exchange.positions["CRZY"] == 0
@@ -0,0 +1,93 @@
+import asyncio, httpx
+from client import close_client, get_client
+from mock_exchange import MockExchange
+from time_sales import TimeSalesIngester, TimeSalesRing
+
+AUTH = {"username": "tas", "password": "tas", "server": "127.0.0.1", "port": 0}
+
+
+def test_ring_rolling_aggregates_and_eviction():
+    ring = TimeSalesRing("CRZY", capacity=2)
+    assert ring.last_price is None and ring.vwap is None
+    ring.append(1, 1, 25.0, 100)
+    ring.append(2, 1, 26.0, 300)
+    assert ring.vwap == (25.0 * 100 + 26.0 * 300) / 400
+    ring.append(3, 2, 27.0, 100)
+    # The first print is evicted from the aggregates
+    assert len(ring) == 2
+    assert ring.volume == 400
+    assert ring.vwap == (26.0 * 300 + 27.0 * 100) / 400
+    assert ring.last_price == 27.0 and ring.last_id == 3
+    assert ring.latest(5) == [(3, 2, 27.0, 100), (2, 1, 26.0, 300)]
+
+
+def test_ring_accepts_float_quantities():
+    ring = TimeSalesRing("CRZY")
+    ring.append(1, 1, 25.0, 100.0)
+    ring.append(2, 1, 25.5, 50.5)
+    assert ring.volume == 150.5
+    assert ring.latest(1) == [(2, 1, 25.5, 50.5)]
+
+
+def test_ingester_seeds_from_latest_page():
+    exchange = MockExchange()
+    for _ in range(100):
+        exchange.advance_tick()
+    prints = exchange.time_and_sales["CRZY"]
+    assert len(prints) > 20
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(dict(request.url.params))
+        return exchange.respond(request)
+
+    async def main():
+        get_client(AUTH, transport=httpx.MockTransport(handler))
+        ingester = TimeSalesIngester(AUTH, ["CRZY"], capacity=64, page_size=10)
+        try:
+            seeded = await ingester.poll("CRZY")
+            first_requests = len(requests)
+            seeded_last = ingester.rings["CRZY"].last_id
+            exchange.advance_tick()
+            exchange.advance_tick()
+            new = await ingester.poll("CRZY")
+            return ingester, seeded, first_requests, seeded_last, new
+        finally:
+            await close_client(AUTH)
+
+    previous = len(prints)
+    ingester, seeded, first_requests, seeded_last, new = asyncio.run(main())
+    # One request for the latest page, not the whole period's history
+    assert first_requests == 1 and "after" not in requests[0]
+    assert seeded == 10
+    assert seeded_last == prints[previous - 1]["id"]
+    # Later polls fetch everything after the seeded cursor without gaps
+    assert new == len(prints) - previous
+    assert ingester.cursors["CRZY"] == prints[-1]["id"]
+
+
+def test_ingester_fills_a_gap_larger_than_a_page():
+    exchange = MockExchange()
+    for _ in range(5):
+        exchange.advance_tick()
+
+    async def main():
+        get_client(AUTH, transport=exchange.transport())
+        ingester = TimeSalesIngester(AUTH, ["CRZY"], capacity=4096, page_size=10)
+        try:
+            await ingester.poll("CRZY")
+            previous = len(exchange.time_and_sales["CRZY"])
+            for _ in range(100):
+                exchange.advance_tick()
+            return ingester, previous, await ingester.poll("CRZY")
+        finally:
+            await close_client(AUTH)
+
+    ingester, previous, new = asyncio.run(main())
+    prints = exchange.time_and_sales["CRZY"]
+    assert len(prints) - previous > 10
+    # The server returns the newest page, the older prints behind it are fetched too
+    assert new == len(prints) - previous
+    assert [p[0] for p in ingester.rings["CRZY"].latest(new)] == [
+        p["id"] for p in reversed(prints[previous:])
+    ]
@@ -0,0 +1,176 @@
+import asyncio, httpx
+import apis
+from client import close_client, get_client
+from mock_exchange import MockExchange
+from models import ClientConfig, OrderRequest
+from records import OrderRecord, from_dict
+from tick_clock import TickClock
+from vwap_models import TradeConfig
+from vwap_strategy import VWAPStrategy
+
+AUTH = {"username": "vwap", "password": "vwap", "server": "127.0.0.1", "port": 0}
+
+
+def flaky_transport(exchange: MockExchange, failures: dict) -> httpx.MockTransport:
+    """Fails the first failures[(method, path prefix)] matching requests with a ConnectError."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        for (method, prefix), remaining in failures.items():
+            if request.method == method and request.url.path.startswith(prefix) and remaining:
+                failures[(method, prefix)] = remaining - 1
+                raise httpx.ConnectError("connection refused", request=request)
+        return exchange.respond(request)
+
+    return httpx.MockTransport(handler)
+
+
+async def run_with_ticks(exchange: MockExchange, coroutine):
+    """Runs coroutine while the exchange and a fast clock advance."""
+
+    async def ticks():
+        while True:
+            await asyncio.sleep(0.01)
+            exchange.advance_tick()
+
+    ticker = asyncio.create_task(ticks())
+    try:
+        return await coroutine
+    finally:
+        ticker.cancel()
+        await close_client(AUTH)
+
+
+def lost_response_transport(exchange: MockExchange, failures: dict) -> httpx.MockTransport:
+    """Handles the first failures[(method, path prefix)] matching requests, then times out."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        response = exchange.respond(request)
+        for (method, prefix), remaining in failures.items():
+            if request.method == method and request.url.path.startswith(prefix) and remaining:
+                failures[(method, prefix)] = remaining - 1
+                raise httpx.ReadTimeout("timed out", request=request)
+        return response
+
+    return httpx.MockTransport(handler)
+
+
+def make_strategy(exchange: MockExchange, failures: dict, transport=flaky_transport) -> VWAPStrategy:
+    # No client retries, the failures must reach the strategy
+    get_client(AUTH, ClientConfig(max_retries=0), transport=transport(exchange, failures))
+    strategy = VWAPStrategy(
+        TradeConfig(
+            **AUTH, ticker="CRZY", number_of_shares_to_fill=1000, number_of_trades=1, action="BUY"
+        ),
+        clock=TickClock(AUTH, interval=0.01),
+    )
+    strategy.trade_size = 1000
+    return strategy
+
+
+def test_execute_trade_retries_a_post_without_response():
+    exchange = MockExchange()
+    failures = {("POST", "/v1/orders"): 1}
+    strategy = make_strategy(exchange, failures)
+
+    async def main():
+        strategy.clock.start()
+        try:
+            return await strategy.execute_trade(0, is_order_detail_allowed=False)
+        finally:
+            await strategy.clock.stop()
+
+    order = asyncio.run(run_with_ticks(exchange, main()))
+    assert failures[("POST", "/v1/orders")] == 0
+    assert order.status == "TRANSACTED"
+    assert strategy.filled_quantity == 1000
+    assert exchange.positions["CRZY"] == 1000
+
+
+def test_execute_trade_does_not_repost_an_order_that_was_placed():
+    exchange = MockExchange()
+    failures = {("POST", "/v1/orders"): 1}
+    strategy = make_strategy(exchange, failures, transport=lost_response_transport)
+
+    async def main():
+        strategy.clock.start()
+        try:
+            return await strategy.execute_trade(0, is_order_detail_allowed=False)
+        finally:
+            await strategy.clock.stop()
+
+    order = asyncio.run(run_with_ticks(exchange, main()))
+    assert failures[("POST", "/v1/orders")] == 0
+    assert order.status == "TRANSACTED"
+    assert len(exchange.orders) == 1
+    assert exchange.positions["CRZY"] == 1000
+
+
+def test_execute_trade_skips_a_throttled_slice():
+    exchange = MockExchange()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "POST":
+            return httpx.Response(429, json={"wait": 0}, headers={"Retry-After": "0"})
+        return exchange.respond(request)
+
+    strategy = make_strategy(exchange, {}, transport=lambda *_: httpx.MockTransport(handler))
+
+    async def main():
+        strategy.clock.start()
+        try:
+            return await strategy.execute_trade(0, is_order_detail_allowed=False)
+        finally:
+            await strategy.clock.stop()
+
+    assert asyncio.run(run_with_ticks(exchange, main())) is None
+    assert strategy.filled_quantity == 0
+
+
+def test_track_fill_keeps_the_last_record_when_a_query_fails():
+    exchange = MockExchange()
+    failures = {("GET", "/v1/orders/"): 2}
+    strategy = make_strategy(exchange, failures)
+
+    async def main():
+        bid = exchange.books["CRZY"].best_bid()
+        order = from_dict(
+            OrderRecord,
+            await apis.post_order(
+                AUTH,
+                OrderRequest(
+                    ticker="CRZY", type="LIMIT", quantity=100, action="BUY", price=bid - 1, dry_run=0
+                ),
+            ),
+        )
+        assert order.status == "OPEN"
+        strategy.clock.start()
+        tracking = asyncio.create_task(strategy.track_fill(order, is_order_detail_allowed=False))
+        await asyncio.sleep(0.1)
+        await apis.cancel_order(AUTH, order.order_id)
+        try:
+            return await tracking
+        finally:
+            await strategy.clock.stop()
+
+    order = asyncio.run(run_with_ticks(exchange, main()))
+    assert failures[("GET", "/v1/orders/")] == 0
+    assert order.status == "CANCELLED"
+
+
+def test_find_order_skips_a_sibling_parents_identical_order():
+    exchange = MockExchange()
+    strategy = make_strategy(exchange, {})
+    sibling = make_strategy(exchange, {})
+    sibling.claimed_orders = strategy.claimed_orders
+    order_details = OrderRequest(ticker="CRZY", type="MARKET", quantity=1000, action="BUY", dry_run=0)
+
+    async def main():
+        try:
+            placed = await sibling.place_order(order_details)
+            return placed, await strategy.find_order(order_details, since_tick=0)
+        finally:
+            await close_client(AUTH)
+
+    placed, found = asyncio.run(main())
+    assert placed["order_id"] in strategy.claimed_orders
+    assert found == {}
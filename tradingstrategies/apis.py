@@ -1,10 +1,14 @@
-import httpx, asyncio, random
-from utility import make_encoded_header
+import httpx, asyncio, random, time
+from collections import deque
+from client import get_client
+from records import CaseRecord, from_dict, loads
 from typing import Optional
 from tradingstrategies.models import (
     AuthConfig,
-    CaseDataResponse,
+    CaseStatus,
     OrderRequest,
+    OrderResponse,
+    ParentOrderFill,
     OHLCParams,
     TimeSalesParams,
     OrderStatus,
@@ -13,25 +17,24 @@ from tradingstrategies.models import (
 
 async def get_current_tick(auth: AuthConfig):
     """Asynchronously gets the current tick from the case status."""
-    case_data = CaseDataResponse.model_validate(await query_case_status(auth))
+    case_data = from_dict(CaseRecord, await query_case_status(auth))
     return case_data.tick
 
 
 async def trading_status(auth: AuthConfig):
     """Asynchronously gets the trading status."""
-    case_data = CaseDataResponse.model_validate(await query_case_status(auth))
-    return case_data.status
+    case_data = from_dict(CaseRecord, await query_case_status(auth))
+    return CaseStatus(case_data.status)
 
 
 async def query_case_status(auth: AuthConfig):
     """Asynchronously queries the case status API."""
-    api_endpoint = f"http://{auth['server']}:{auth['port']}/v1/case"
+    api_endpoint = "/v1/case"
     try:
-        headers = make_encoded_header(auth["username"], auth["password"])
-        async with httpx.AsyncClient() as client:
-            response = await client.get(api_endpoint, headers=headers)
-            response.raise_for_status()
-            return response.json()
+        client = get_client(auth)
+        response = await client.get(api_endpoint)
+        response.raise_for_status()
+        return loads(response.content)
     except httpx.RequestError as e:
         print(f"Error querying case status: {e}")
         return None
@@ -39,13 +42,12 @@ async def query_case_status(auth: AuthConfig):
 
 async def query_trader_info(auth: AuthConfig):
     """Asynchronously queries the trader information API."""
-    api_endpoint = f"http://{auth['server']}:{auth['port']}/v1/trader"
+    api_endpoint = "/v1/trader"
     try:
-        headers = make_encoded_header(auth["username"], auth["password"])
-        async with httpx.AsyncClient() as client:
-            response = await client.get(api_endpoint, headers=headers)
-            response.raise_for_status()
-            return response.json()
+        client = get_client(auth)
+        response = await client.get(api_endpoint)
+        response.raise_for_status()
+        return loads(response.content)
     except httpx.RequestError as e:
         print(f"Error querying trader info: {e}")
         return None
@@ -53,13 +55,12 @@ async def query_trader_info(auth: AuthConfig):
 
 async def query_trading_limits(auth: AuthConfig):
     """Asynchronously queries trading limits."""
-    api_endpoint = f"http://{auth['server']}:{auth['port']}/v1/limits"
+    api_endpoint = "/v1/limits"
     try:
-        headers = make_encoded_header(auth["username"], auth["password"])
-        async with httpx.AsyncClient() as client:
-            response = await client.get(api_endpoint, headers=headers)
-            response.raise_for_status()
-            return response.json()
+        client = get_client(auth)
+        response = await client.get(api_endpoint)
+        response.raise_for_status()
+        return loads(response.content)
     except httpx.RequestError as e:
         print(f"Error querying trading limits: {e}")
         return None
@@ -67,13 +68,12 @@ async def query_trading_limits(auth: AuthConfig):
 
 async def query_recent_news(auth: AuthConfig):
     """Asynchronously queries recent news."""
-    api_endpoint = f"http://{auth['server']}:{auth['port']}/v1/news"
+    api_endpoint = "/v1/news"
     try:
-        headers = make_encoded_header(auth["username"], auth["password"])
-        async with httpx.AsyncClient() as client:
-            response = await client.get(api_endpoint, headers=headers)
-            response.raise_for_status()
-            return response.json()
+        client = get_client(auth)
+        response = await client.get(api_endpoint)
+        response.raise_for_status()
+        return loads(response.content)
     except httpx.RequestError as e:
         print(f"Error querying recent news: {e}")
         return None
@@ -91,15 +91,14 @@ async def query_assets(auth: AuthConfig, ticker: str):
     Returns:
         JSON response from the API if successful, otherwise None.
     """
-    api_endpoint = f"http://{auth['server']}:{auth['port']}/v1/assets"
+    api_endpoint = "/v1/assets"
     # Construct query parameters
     params = {"ticker": ticker}
     try:
-        headers = make_encoded_header(auth["username"], auth["password"])
-        async with httpx.AsyncClient() as client:
-            response = await client.get(api_endpoint, headers=headers, params=params)
-            response.raise_for_status()
-            return response.json()
+        client = get_client(auth)
+        response = await client.get(api_endpoint, params=params)
+        response.raise_for_status()
+        return loads(response.content)
     except httpx.RequestError as e:
         print(f"Error querying assets: {e}")
         return None
@@ -108,13 +107,12 @@ async def query_assets(auth: AuthConfig, ticker: str):
 # NOT WORKING
 async def query_asset_history(auth: AuthConfig):
     """Asynchronously queries asset history."""
-    api_endpoint = f"http://{auth['server']}:{auth['port']}/v1/assets/history"
+    api_endpoint = "/v1/assets/history"
     try:
-        headers = make_encoded_header(auth["username"], auth["password"])
-        async with httpx.AsyncClient() as client:
-            response = await client.get(api_endpoint, headers=headers)
-            response.raise_for_status()
-            return response.json()
+        client = get_client(auth)
+        response = await client.get(api_endpoint)
+        response.raise_for_status()
+        return loads(response.content)
     except httpx.RequestError as e:
         print(f"Error querying asset history: {e}")
         return None
@@ -122,15 +120,14 @@ async def query_asset_history(auth: AuthConfig):
 
 async def query_securities(auth: AuthConfig, ticker: Optional[str] = None):
     """Asynchronously queries available securities."""
-    api_endpoint = f"http://{auth['server']}:{auth['port']}/v1/securities"
+    api_endpoint = "/v1/securities"
     params = {"ticker": ticker} if ticker else {}
 
     try:
-        headers = make_encoded_header(auth["username"], auth["password"])
-        async with httpx.AsyncClient() as client:
-            response = await client.get(api_endpoint, headers=headers, params=params)
-            response.raise_for_status()
-            return response.json()
+        client = get_client(auth)
+        response = await client.get(api_endpoint, params=params)
+        response.raise_for_status()
+        return loads(response.content)
     except httpx.RequestError as e:
         print(f"Error querying securities: {e}")
         return None
@@ -138,15 +135,14 @@ async def query_securities(auth: AuthConfig, ticker: Optional[str] = None):
 
 async def query_security_order_book(auth: AuthConfig, ticker: str, limit: int = 20):
     """Asynchronously queries the order book for securities."""
-    api_endpoint = f"http://{auth['server']}:{auth['port']}/v1/securities/book"
+    api_endpoint = "/v1/securities/book"
     params = {"ticker": ticker, "limit": limit}
 
     try:
-        headers = make_encoded_header(auth["username"], auth["password"])
-        async with httpx.AsyncClient() as client:
-            response = await client.get(api_endpoint, headers=headers, params=params)
-            response.raise_for_status()
-            return response.json()
+        client = get_client(auth)
+        response = await client.get(api_endpoint, params=params)
+        response.raise_for_status()
+        return loads(response.content)
     except httpx.RequestError as e:
         print(f"Error querying order book: {e}")
         return None
@@ -154,15 +150,14 @@ async def query_security_order_book(auth: AuthConfig, ticker: str, limit: int =
 
 async def query_security_ohlc_history(auth: AuthConfig, ohlc_params: OHLCParams):
     """Asynchronously queries security history (OHLC)."""
-    api_endpoint = f"http://{auth['server']}:{auth['port']}/v1/securities/history"
+    api_endpoint = "/v1/securities/history"
     params = ohlc_params.model_dump(exclude_unset=True)
 
     try:
-        headers = make_encoded_header(auth["username"], auth["password"])
-        async with httpx.AsyncClient() as client:
-            response = await client.get(api_endpoint, headers=headers, params=params)
-            response.raise_for_status()
-            return response.json()
+        client = get_client(auth)
+        response = await client.get(api_endpoint, params=params)
+        response.raise_for_status()
+        return loads(response.content)
     except httpx.RequestError as e:
         print(f"Error querying security history: {e}")
         return None
@@ -170,20 +165,51 @@ async def query_security_ohlc_history(auth: AuthConfig, ohlc_params: OHLCParams)
 
 async def query_time_and_sales(auth: AuthConfig, time_sales_params: TimeSalesParams):
     """Asynchronously queries time and sales history for a security."""
-    api_endpoint = f"http://{auth['server']}:{auth['port']}/v1/securities/tas"
+    api_endpoint = "/v1/securities/tas"
     params = time_sales_params.model_dump(exclude_unset=True)
 
     try:
-        headers = make_encoded_header(auth["username"], auth["password"])
-        async with httpx.AsyncClient() as client:
-            response = await client.get(api_endpoint, headers=headers, params=params)
-            response.raise_for_status()
-            return response.json()
+        client = get_client(auth)
+        response = await client.get(api_endpoint, params=params)
+        response.raise_for_status()
+        return loads(response.content)
     except httpx.RequestError as e:
         print(f"Error querying time and sales: {e}")
         return None
 
 
+async def query_time_and_sales_after(
+    auth: AuthConfig,
+    ticker: str,
+    after: int = 0,
+    period: Optional[int] = None,
+    page_size: int = 1000,
+):
+    """
+    Fetches every print after the after cursor, newest first.
+
+    The server returns the newest limit prints after the cursor, so a full
+    page can leave a gap behind it. The request is then repeated with a limit
+    covering every ID between the cursor and the newest print.
+
+    Returns:
+        The prints, or None if a request failed.
+    """
+    limit = page_size
+    while True:
+        params = {"ticker": ticker, "after": after, "limit": limit}
+        if period is not None:
+            params["period"] = period
+        page = await query_time_and_sales(auth, TimeSalesParams(**params))
+        if page is None or len(page) < limit:
+            return page
+        # IDs are unique, at most newest - after prints can be missing
+        newest = max(sale["id"] for sale in page)
+        if limit >= newest - after:
+            return page
+        limit = newest - after + page_size
+
+
 async def query_orders(auth: AuthConfig, status: Optional[OrderStatus] = None):
     """
     Asynchronously fetches a list of orders with the specified status.
@@ -195,15 +221,14 @@ async def query_orders(auth: AuthConfig, status: Optional[OrderStatus] = None):
     Returns:
         The JSON response from the API containing orders if successful, otherwise None.
     """
-    api_endpoint = f"http://{auth['server']}:{auth['port']}/v1/orders"
+    api_endpoint = "/v1/orders"
     params = {"status": status.value} if status else {}
 
     try:
-        headers = make_encoded_header(auth["username"], auth["password"])
-        async with httpx.AsyncClient() as client:
-            response = await client.get(api_endpoint, headers=headers, params=params)
-            response.raise_for_status()
-            return response.json()
+        client = get_client(auth)
+        response = await client.get(api_endpoint, params=params)
+        response.raise_for_status()
+        return loads(response.content)
     except httpx.RequestError as e:
         print(f"Error during API request: {e}")
         return None
@@ -228,7 +253,7 @@ async def post_order(auth: AuthConfig, order_details: OrderRequest):
     Returns:
         JSON response from the API if successful, otherwise None.
     """
-    url = f"http://{auth['server']}:{auth['port']}/v1/orders"
+    url = "/v1/orders"
 
     # Construct query parameters
     params = {
@@ -245,62 +270,158 @@ async def post_order(auth: AuthConfig, order_details: OrderRequest):
         params["price"] = order_details.price
 
     try:
-        headers = make_encoded_header(auth["username"], auth["password"])
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, headers=headers, params=params)
-            response.raise_for_status()
-            return response.json()
+        client = get_client(auth)
+        response = await client.post(url, params=params)
+        response.raise_for_status()
+        return loads(response.content)
     except httpx.RequestError as e:
         print(f"Error placing order: {e}")
         return None
 
 
 async def chunk_order(
-    auth: AuthConfig, order_details: OrderRequest, batch_size: int = 10000
-):
-    quantity = order_details.quantity
-    while True:
-        if quantity >= batch_size:
-            order_details.quantity = batch_size
-            quantity -= batch_size
-        elif quantity > 0 and quantity < batch_size:
-            order_details.quantity = quantity
-            quantity = 0
-        else:
-            break
-        await post_order(auth, order_details)
-        await asyncio.sleep(0.1)
+    auth: AuthConfig,
+    order_details: OrderRequest,
+    batch_size: int = 10000,
+    max_in_flight: int = 4,
+    rate_limit: Optional[float] = None,
+) -> ParentOrderFill:
+    """
+    Sends a parent order as child orders of at most batch_size, concurrently.
+
+    The parent request is not modified. Throttled children are retried by
+    the client, which waits for the server's hint.
+
+    Args:
+        max_in_flight: Most child orders awaiting a response at once.
+        rate_limit: Most child orders sent per second, None for no pacing.
+
+    Returns:
+        The aggregated fills and VWAP of the children once they all completed.
+    """
+    quantities = [batch_size] * (order_details.quantity // batch_size)
+    if order_details.quantity % batch_size:
+        quantities.append(order_details.quantity % batch_size)
+
+    semaphore = asyncio.Semaphore(max_in_flight)
+    loop = asyncio.get_running_loop()
+    next_send = loop.time()
+
+    async def pace():
+        nonlocal next_send
+        if rate_limit is None:
+            return
+        send_at = max(loop.time(), next_send)
+        next_send = send_at + 1 / rate_limit
+        await asyncio.sleep(send_at - loop.time())
+
+    async def send(quantity):
+        child = order_details.model_copy(update={"quantity": quantity})
+        async with semaphore:
+            await pace()
+            return await post_order(auth, child)
+
+    results = await asyncio.gather(
+        *(send(quantity) for quantity in quantities), return_exceptions=True
+    )
+    fill = ParentOrderFill(
+        ticker=order_details.ticker,
+        action=order_details.action,
+        quantity=order_details.quantity,
+    )
+    notional = 0.0
+    for result in results:
+        if isinstance(result, Exception):
+            print(f"Error placing child order of {order_details.ticker}: {result}")
+        elif result:
+            order = OrderResponse.model_validate(result)
+            fill.orders.append(order)
+            fill.quantity_filled += order.quantity_filled
+            notional += order.quantity_filled * (order.vwap or 0)
+    if fill.quantity_filled:
+        fill.vwap = notional / fill.quantity_filled
+    return fill
 
 # Strategy 
-async def market_square_off_all_tickers(auth, batch_size: int = 10000):
-    securities_data = await query_securities(auth)  # Fetch all tickers automatically
-    for security in securities_data:
+async def market_square_off_all_tickers(
+    auth, batch_size: int = 10000, positions=None, securities=None
+):
+    if positions is not None:
+        await positions.refresh()
+        tickers = list(positions.positions)
+    elif securities is not None:
+        await securities.refresh()
+        tickers = list(securities.securities)
+    else:
+        securities_data = await query_securities(auth)  # Fetch all tickers automatically
+        tickers = [security["ticker"] for security in securities_data]
+    for ticker in tickers:
         asyncio.create_task(
-            market_square_off_ticker(auth, security["ticker"], batch_size)
+            market_square_off_ticker(auth, ticker, batch_size, positions, securities)
         )
 
 
 async def market_square_off_ticker(
-    auth: AuthConfig, ticker: str, batch_size: int = 10000
+    auth: AuthConfig,
+    ticker: str,
+    batch_size: int = 10000,
+    positions=None,
+    securities=None,
 ):
-    securities_data = await query_securities(auth, ticker)
-    while int(securities_data[0]["position"]) != 0:
-        if securities_data[0]["position"] > 0:
-            action = "SELL"
-        else:
-            action = "BUY"
+    """
+    Flattens a ticker with MARKET orders of at most batch_size.
 
-        if abs(securities_data[0]["position"]) > batch_size:
-            quantity = batch_size
-        else:
-            quantity = abs(securities_data[0]["position"])
+    Args:
+        positions: Optional PositionService, our fills are applied to it, and
+            without securities the position is tracked from them instead of
+            re-querying securities after every order.
+        securities: Optional SecuritiesSnapshot, the position is read from a
+            snapshot requested after the previous order.
+    """
 
-        order_details = OrderRequest(
-            ticker=ticker, type="MARKET", quantity=quantity, action=action, dry_run=0
-        )
-        await post_order(auth, order_details)
-        await asyncio.sleep(0.1)
+    async def current_position():
+        if securities is not None:
+            # A snapshot requested before the last fill would oversell
+            security = await securities.fresh(ticker)
+            if security is not None:
+                return int(security.position)
+        if positions is not None:
+            return positions.server_position(ticker)
         securities_data = await query_securities(auth, ticker)
+        return int(securities_data[0]["position"]) if securities_data else None
+
+    start = time.perf_counter()
+    first_slice = True
+    while True:
+        try:
+            position = await current_position()
+            if position == 0:
+                break
+            if position is not None:
+                if position > 0:
+                    action = "SELL"
+                else:
+                    action = "BUY"
+
+                if abs(position) > batch_size:
+                    quantity = batch_size
+                else:
+                    quantity = abs(position)
+
+                order_details = OrderRequest(
+                    ticker=ticker, type="MARKET", quantity=quantity, action=action, dry_run=0
+                )
+                order = await post_order(auth, order_details)
+                if first_slice:
+                    get_client(auth).metrics.record_since("first_square_off_slice", start)
+                    first_slice = False
+                if positions is not None:
+                    positions.apply_order(order)
+        except httpx.HTTPStatusError as e:
+            print(f"Error squaring off {ticker}: {e}")
+        if securities is None:
+            # Reading a fresh snapshot already waits for the next poll
+            await asyncio.sleep(0.1)
     print(f"Trade for {ticker} squared off")
 
 # Strategy 
@@ -383,6 +504,209 @@ async def limit_square_off_ticker_randomized_price(
         await asyncio.sleep(0.1)
 
 
+def _price_trend(prices: list) -> float:
+    """Mean of the newer half minus mean of the older half of prices, newest first."""
+    half = len(prices) // 2
+    if half == 0:
+        return 0.0
+    return sum(prices[:half]) / half - sum(prices[half : 2 * half]) / half
+
+
+def _best_price(levels, own_price: Optional[float], own_quantity: float) -> Optional[float]:
+    """Best price of (price, quantity) levels, best first, without our own resting quantity."""
+    for level_price, level_quantity in levels:
+        if level_price == own_price:
+            level_quantity -= own_quantity
+        if level_quantity > 0:
+            return level_price
+    return None
+
+
+async def limit_square_off_ticker_trend_adjusted_price(
+    auth: AuthConfig,
+    ticker: str,
+    action: str,
+    price: float,
+    quantity: int,
+    batch_size: int = 10000,
+    square_off_time: int = 295,
+    escalate_ticks: int = 5,
+    interval: float = 0.2,
+    trend_window: int = 20,
+    clock=None,
+    time_sales=None,
+    book_cache=None,
+    orders=None,
+) -> ParentOrderFill:
+    """
+    Works a square-off as one resting LIMIT child, re-priced as the market moves.
+
+    Every interval the child's fills are read back and a target price is set
+    between our side of the spread (passive) and the opposite side (crossing).
+    Aggression grows with the time used towards the deadline and with a trend
+    against us: the move between the older and newer half of the latest
+    prints, relative to the spread. When the target moves the child is
+    cancelled and the unfilled quantity re-posted at it. escalate_ticks
+    before square_off_time the rest is sent at MARKET.
+
+    Args:
+        price: Tender price, only reported.
+        clock: Optional TickClock, its tick is read instead of polling /v1/case.
+        time_sales: Optional TimeSalesIngester, the trend is read from its prints
+            instead of from the mid prices this function samples.
+        book_cache: Optional OrderBookCache, quotes are read from the shared
+            book instead of a book query every interval.
+        orders: Optional OrderManager, children are recorded so end-of-period
+            cancels see them.
+
+    Returns:
+        The fills and VWAP of every child order.
+    """
+    if time_sales is not None:
+        time_sales.subscribe(ticker)
+    buying = action == "BUY"
+    fill = ParentOrderFill(ticker=ticker, action=action, quantity=quantity)
+    notional = 0.0
+    working = None  # resting child order
+    mids = deque(maxlen=trend_window)  # newest last
+    start = time.perf_counter()
+    start_tick = None
+    print(f"Started trend adjusted square off of {action} {quantity} {ticker} from tender price {price}")
+
+    def settle(order: dict):
+        nonlocal notional
+        order = OrderResponse.model_validate(order)
+        fill.orders.append(order)
+        fill.quantity_filled += order.quantity_filled
+        notional += order.quantity_filled * (order.vwap or 0)
+
+    async def refresh_working():
+        nonlocal working
+        details = await query_order_details(auth, working["order_id"])
+        if details:
+            working = details
+            if orders is not None:
+                orders.record(details)
+        if working["status"] != "OPEN":
+            settle(working)
+            working = None
+
+    async def cancel_working():
+        await cancel_order(auth, working["order_id"])
+        # The child may have filled before the cancel landed, it stays working until it is closed
+        await refresh_working()
+
+    async def quotes():
+        own_price = working["price"] if working else None
+        own_quantity = working["quantity"] - working["quantity_filled"] if working else 0
+        if book_cache is not None:
+            book = await book_cache.book(ticker)
+            if book is None:
+                return None, None
+            bids, asks = book.bids(3), book.asks(3)
+        else:
+            order_book = await query_security_order_book(auth, ticker, 3)
+            if not order_book:
+                return None, None
+            bids = [
+                (entry["price"], entry["quantity"] - entry["quantity_filled"])
+                for entry in order_book["bids"]
+            ]
+            asks = [
+                (entry["price"], entry["quantity"] - entry["quantity_filled"])
+                for entry in order_book["asks"]
+            ]
+        return (
+            _best_price(bids, own_price if buying else None, own_quantity),
+            _best_price(asks, None if buying else own_price, own_quantity),
+        )
+
+    while True:
+        try:
+            if working is not None:
+                await refresh_working()
+            remaining = quantity - fill.quantity_filled
+            if working is not None:
+                remaining -= working["quantity_filled"]
+            if remaining <= 0:
+                break
+
+            current_tick = clock.tick if clock and clock.tick is not None else await get_current_tick(auth)
+            if start_tick is None:
+                start_tick = current_tick
+            escalate_tick = square_off_time - escalate_ticks
+            if current_tick >= escalate_tick:
+                print(f"Escalating square off of {remaining} {ticker} to MARKET at tick {current_tick}")
+                if working is not None:
+                    await cancel_working()
+                    if working is not None:
+                        await asyncio.sleep(interval)
+                        continue
+                    remaining = quantity - fill.quantity_filled
+                if remaining > 0:
+                    market = await chunk_order(
+                        auth,
+                        OrderRequest(
+                            ticker=ticker, type="MARKET", quantity=remaining, action=action, dry_run=0
+                        ),
+                        batch_size,
+                    )
+                    for order in market.orders:
+                        settle(order.model_dump())
+                break
+
+            bid, ask = await quotes()
+            if bid is None or ask is None:
+                await asyncio.sleep(interval)
+                continue
+            mids.append((bid + ask) / 2)
+            prints = time_sales.rings[ticker].latest(trend_window) if time_sales else []
+            if len(prints) >= 4:
+                trend = _price_trend([sale[2] for sale in prints])
+            else:
+                trend = _price_trend(list(reversed(mids)))
+            spread = max(ask - bid, 0.01)
+            urgency = (current_tick - start_tick) / max(1, escalate_tick - start_tick)
+            adverse = trend if buying else -trend
+            aggression = min(1.0, max(0.0, urgency + adverse / spread))
+            passive, crossing = (bid, ask) if buying else (ask, bid)
+            target = round(passive + aggression * (crossing - passive), 2)
+
+            if working is not None and abs(working["price"] - target) >= 0.005:
+                await cancel_working()
+                remaining = quantity - fill.quantity_filled
+            if working is None and remaining > 0:
+                order = await post_order(
+                    auth,
+                    OrderRequest(
+                        ticker=ticker,
+                        type="LIMIT",
+                        quantity=min(remaining, batch_size),
+                        action=action,
+                        price=target,
+                        dry_run=0,
+                    ),
+                )
+                if order:
+                    if start is not None:
+                        get_client(auth).metrics.record_since("first_square_off_slice", start)
+                        start = None
+                    working = order
+                    if orders is not None:
+                        orders.record(order)
+        except httpx.HTTPStatusError as e:
+            print(f"Error squaring off {ticker}: {e}")
+        await asyncio.sleep(interval)
+
+    if fill.quantity_filled:
+        fill.vwap = notional / fill.quantity_filled
+    print(
+        f"Trade for {action} {quantity} {ticker} squared off, filled:{fill.quantity_filled} "
+        f"vwap:{fill.vwap} tender price:{price}"
+    )
+    return fill
+
+
 async def stop_loss_square_off_ticker(
     auth: AuthConfig,
     tender_id: int,
@@ -393,81 +717,112 @@ async def stop_loss_square_off_ticker(
     stoploss_price: float,
     batch_size: int = 5000,
     square_off_time: int = 297,
+    clock=None,
+    time_sales=None,
+    securities=None,
 ):
+    """
+    Squares off a tender position in batches at the profit price, or all at once on stop loss.
+
+    Args:
+        clock: Optional TickClock, its tick is read instead of polling /v1/case every loop.
+        time_sales: Optional TimeSalesIngester, its last print is read instead of
+            querying securities every loop.
+        securities: Optional SecuritiesSnapshot, its last price is used when there
+            is no time & sales print, instead of querying securities every loop.
+    """
+    if time_sales is not None:
+        time_sales.subscribe(ticker)
     print(
         f"Started process for Tender-{tender_id} ticker:{ticker} action:{action } profit_price:{profit_price}"
     )
     await asyncio.sleep(1)
     while quantity > 0:
-        if await get_current_tick(auth) >= square_off_time:
-            print(f"square off time hit, getting out of while loop")
-            break
-        # Get the last price of ticker to make a stop loss decision
-        securities_data = await query_securities(auth, ticker)
-        last_price = securities_data[0]["last"]
-        # print(f"Last price for Tender-{tender_id} ticker:{ticker} action:{action } squareoff:{squareoff_price} last:{last_price}")
-        if action == "SELL":
-            # Stop loss so SELL all remaining quantity that you did BUY earlier
-            if last_price <= stoploss_price:  # For SELL Stop-Loss
-                print(
-                    f"Stop loss triggered for ticker:{ticker} action:{action } quantity:{quantity} stoploss_price:{stoploss_price} last:{last_price}"
-                )
-                order_details = OrderRequest(
-                    ticker=ticker,
-                    type="MARKET",
-                    quantity=quantity,
-                    action=action,
-                    dry_run=0,
-                )
-                await chunk_order(auth=auth, order_details=order_details)
-                quantity = 0
-            # As last_price is larger than squareoff price, sell in batches and keep track of remaining quantity
-            elif last_price >= profit_price:
-                sell_quantity = min(quantity, batch_size)
-                order_details = OrderRequest(
-                    ticker=ticker,
-                    type="MARKET",
-                    quantity=sell_quantity,
-                    action=action,
-                    dry_run=0,
-                )
-                quantity = max(0, quantity - sell_quantity)
-                # print(f"order detail {order_details}")
-                await post_order(auth, order_details)
-                print(
-                    f"Batch {action} {sell_quantity} Tender-{tender_id} ticker{ticker} last_price:{last_price}  profit_price:{profit_price}"
-                )
-        else:
-            # Stop loss so BUY all remaining quantity that you did SELL earlier
-            if last_price >= stoploss_price:
-                print(
-                    f"Stop loss triggered for ticker:{ticker} action:{action } quantity:{quantity} stoploss_price:{stoploss_price} last:{last_price}"
-                )
-                order_details = OrderRequest(
-                    ticker=ticker,
-                    type="MARKET",
-                    quantity=quantity,
-                    action=action,
-                    dry_run=0,
-                )
-                await chunk_order(auth=auth, order_details=order_details)
-                quantity = 0
-            # As last_price is lesser than squareoff price, BUY in batches and keep track of remaining quantity
-            elif last_price <= profit_price:
-                buy_quantity = min(quantity, batch_size)
-                order_details = OrderRequest(
-                    ticker=ticker,
-                    type="MARKET",
-                    quantity=buy_quantity,
-                    action=action,
-                    dry_run=0,
-                )
-                quantity = max(0, quantity - buy_quantity)
-                # print(f"order detail {order_details}")
-                await post_order(auth, order_details)
-                print(
-                    f"Batch {action} {buy_quantity} Tender-{tender_id} ticker {ticker} last_price:{last_price}  profit_price:{profit_price}"
-                )
+        try:
+            current_tick = await clock.current_tick() if clock else await get_current_tick(auth)
+            if current_tick is None:
+                # The clock has not seen the case yet and the poll failed
+                await asyncio.sleep(0.5)
+                continue
+            if current_tick >= square_off_time:
+                print("square off time hit, getting out of while loop")
+                break
+            # Get the last price of ticker to make a stop loss decision
+            last_price = time_sales.last_price(ticker) if time_sales else None
+            if last_price is None and securities is not None:
+                security = await securities.latest(ticker)
+                last_price = security.last if security else None
+            if last_price is None:
+                securities_data = await query_securities(auth, ticker)
+                last_price = securities_data[0]["last"]
+            # print(f"Last price for Tender-{tender_id} ticker:{ticker} action:{action } squareoff:{squareoff_price} last:{last_price}")
+            if action == "SELL":
+                # Stop loss so SELL all remaining quantity that you did BUY earlier
+                if last_price <= stoploss_price:  # For SELL Stop-Loss
+                    print(
+                        f"Stop loss triggered for ticker:{ticker} action:{action } quantity:{quantity} stoploss_price:{stoploss_price} last:{last_price}"
+                    )
+                    order_details = OrderRequest(
+                        ticker=ticker,
+                        type="MARKET",
+                        quantity=quantity,
+                        action=action,
+                        dry_run=0,
+                    )
+                    fill = await chunk_order(auth=auth, order_details=order_details)
+                    # Children that were not accepted are retried next loop
+                    quantity -= int(sum(order.quantity for order in fill.orders))
+                # As last_price is larger than squareoff price, sell in batches and keep track of remaining quantity
+                elif last_price >= profit_price:
+                    sell_quantity = min(quantity, batch_size)
+                    order_details = OrderRequest(
+                        ticker=ticker,
+                        type="MARKET",
+                        quantity=sell_quantity,
+                        action=action,
+                        dry_run=0,
+                    )
+                    # print(f"order detail {order_details}")
+                    await post_order(auth, order_details)
+                    quantity = max(0, quantity - sell_quantity)
+                    print(
+                        f"Batch {action} {sell_quantity} Tender-{tender_id} ticker{ticker} last_price:{last_price}  profit_price:{profit_price}"
+                    )
+            else:
+                # Stop loss so BUY all remaining quantity that you did SELL earlier
+                if last_price >= stoploss_price:
+                    print(
+                        f"Stop loss triggered for ticker:{ticker} action:{action } quantity:{quantity} stoploss_price:{stoploss_price} last:{last_price}"
+                    )
+                    order_details = OrderRequest(
+                        ticker=ticker,
+                        type="MARKET",
+                        quantity=quantity,
+                        action=action,
+                        dry_run=0,
+                    )
+                    fill = await chunk_order(auth=auth, order_details=order_details)
+                    # Children that were not accepted are retried next loop
+                    quantity -= int(sum(order.quantity for order in fill.orders))
+                # As last_price is lesser than squareoff price, BUY in batches and keep track of remaining quantity
+                elif last_price <= profit_price:
+                    buy_quantity = min(quantity, batch_size)
+                    order_details = OrderRequest(
+                        ticker=ticker,
+                        type="MARKET",
+                        quantity=buy_quantity,
+                        action=action,
+                        dry_run=0,
+                    )
+                    # print(f"order detail {order_details}")
+                    await post_order(auth, order_details)
+                    quantity = max(0, quantity - buy_quantity)
+                    print(
+                        f"Batch {action} {buy_quantity} Tender-{tender_id} ticker {ticker} last_price:{last_price}  profit_price:{profit_price}"
+                    )
+        except httpx.HTTPStatusError as e:
+            # Throttled or rejected even after the client's retries, try again next loop
+            print(f"Error squaring off Tender-{tender_id} {ticker}: {e}")
         # print(f"Working on  ticker:{ticker} action:{action } quantity:{quantity} stoploss_price:{stoploss_price} last:{last_price} profit_price:{profit_price}")
         await asyncio.sleep(0.5)
     print(f"Tender-{tender_id} {ticker} was squared off")
@@ -475,13 +830,12 @@ async def stop_loss_square_off_ticker(
 
 async def query_order_details(auth: AuthConfig, order_id: int):
     """Asynchronously queries specific order details."""
-    api_endpoint = f"http://{auth['server']}:{auth['port']}/v1/orders/{order_id}"
+    api_endpoint = f"/v1/orders/{order_id}"
     try:
-        headers = make_encoded_header(auth["username"], auth["password"])
-        async with httpx.AsyncClient() as client:
-            response = await client.get(api_endpoint, headers=headers)
-            response.raise_for_status()
-            return response.json()
+        client = get_client(auth)
+        response = await client.get(api_endpoint)
+        response.raise_for_status()
+        return loads(response.content)
     except httpx.RequestError as e:
         print(f"Error querying order details for {order_id}: {e}")
         return None
@@ -489,46 +843,63 @@ async def query_order_details(auth: AuthConfig, order_id: int):
 
 async def cancel_order(auth: AuthConfig, order_id: int):
     """Asynchronously cancels an open order by ID."""
-    api_endpoint = f"http://{auth['server']}:{auth['port']}/v1/orders/{order_id}"
+    api_endpoint = f"/v1/orders/{order_id}"
     try:
-        headers = make_encoded_header(auth["username"], auth["password"])
-        async with httpx.AsyncClient() as client:
-            response = await client.delete(api_endpoint, headers=headers)
-            response.raise_for_status()
-            return response.json()
+        client = get_client(auth)
+        response = await client.delete(api_endpoint)
+        response.raise_for_status()
+        return loads(response.content)
     except httpx.RequestError as e:
         print(f"Error cancelling order {order_id}: {e}")
         return None
 
 
-async def cancel_all_open_order(auth: AuthConfig):
-    orders = await query_orders(auth, OrderStatus.OPEN)
-    print(f"Open orders are {orders}")
-    while orders:
-        for i, order in enumerate(orders):
+async def cancel_all_open_order(
+    auth: AuthConfig, orders=None, max_concurrency: int = 10
+):
+    """
+    Cancels every open order concurrently, at most max_concurrency at a time.
+
+    Args:
+        orders: Optional OrderManager, its local index is cancelled first and
+            reconciled once, instead of re-querying open orders after each cancel.
+    """
+    if orders is not None:
+        await orders.reconcile()
+        cancelled = await orders.cancel_all()
+        await orders.reconcile()
+        if not orders.open_orders():
+            print(f"Cancelled all {cancelled} open orders")
+            return
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def cancel(order):
+        async with semaphore:
             try:
-                # Attempt to cancel the order
                 await cancel_order(auth, order["order_id"])
-                print(f"Cancelled {i} {order['order_id']} of {len(orders)} orders")
             except Exception as e:
                 print(
-                    f"An error occurred while cancelling the order {i} {order['order_id']} of {len(orders)} orders: {e}"
+                    f"An error occurred while cancelling the order {order['order_id']}: {e}"
                 )
-            await asyncio.sleep(0.1)
-        orders = await query_orders(auth, OrderStatus.OPEN)
+
+    open_orders = await query_orders(auth, OrderStatus.OPEN)
+    while open_orders:
+        print(f"Cancelling {len(open_orders)} open orders")
+        await asyncio.gather(*(cancel(order) for order in open_orders))
+        open_orders = await query_orders(auth, OrderStatus.OPEN)
     print("Cancelled all open orders")
 
 
 async def post_tender(auth: AuthConfig, tender_id: int, price: float):
     """Asynchronously accepts a tender offer with the given price."""
-    api_endpoint = f"http://{auth['server']}:{auth['port']}/v1/tenders/{tender_id}"
+    api_endpoint = f"/v1/tenders/{tender_id}"
     params = {"price": price}
     try:
-        headers = make_encoded_header(auth["username"], auth["password"])
-        async with httpx.AsyncClient() as client:
-            response = await client.post(api_endpoint, headers=headers, params=params)
-            response.raise_for_status()
-            return response.json()
+        client = get_client(auth)
+        response = await client.post(api_endpoint, params=params)
+        response.raise_for_status()
+        return loads(response.content)
     except httpx.RequestError as e:
         print(f"Error posting tender {tender_id}: {e}")
         return None
@@ -536,51 +907,61 @@ async def post_tender(auth: AuthConfig, tender_id: int, price: float):
 
 async def decline_tender(auth: AuthConfig, tender_id: int):
     """Asynchronously declines a tender offer."""
-    api_endpoint = f"http://{auth['server']}:{auth['port']}/v1/tenders/{tender_id}"
+    api_endpoint = f"/v1/tenders/{tender_id}"
     try:
-        headers = make_encoded_header(auth["username"], auth["password"])
-        async with httpx.AsyncClient() as client:
-            response = await client.delete(api_endpoint, headers=headers)
-            response.raise_for_status()
-            return response.json()
+        client = get_client(auth)
+        response = await client.delete(api_endpoint)
+        response.raise_for_status()
+        return loads(response.content)
     except httpx.RequestError as e:
         print(f"Error declining tender {tender_id}: {e}")
         return None
 
 
 async def is_tender_processed(
-    auth: AuthConfig, ticker: str, quantity: int, initial_position: int
+    auth: AuthConfig, ticker: str, quantity: int, initial_position: int, positions=None
 ):
-    """Asynchronously checks if a tender has been processed."""
+    """
+    Asynchronously checks if a tender has been processed.
+
+    Args:
+        positions: Optional PositionService, concurrent checks then share its
+            refreshes instead of each querying securities.
+    """
     processing_count = 0
+    current_position = initial_position
     while processing_count < 5:
         try:
-            securities_data = await query_securities(auth, ticker)
+            if positions is not None:
+                await positions.refresh()
+                current_position = positions.server_position(ticker)
+            else:
+                securities_data = await query_securities(auth, ticker)
+                current_position = securities_data[0]["position"]
             print(
-                f"Checking if tender processed, quantity:{quantity} difference:{abs(abs(initial_position) - abs(securities_data[0]['position']))} initial_position:{initial_position} current_position:{securities_data[0]['position']} "
+                f"Checking if tender processed, quantity:{quantity} difference:{abs(abs(initial_position) - abs(current_position))} initial_position:{initial_position} current_position:{current_position} "
             )
         except Exception as e:
             print(f"An error occurred while querying security {ticker}: {e}")
-        if abs(abs(initial_position) - abs(securities_data[0]["position"])) >= int(
+        if abs(abs(initial_position) - abs(current_position)) >= int(
             0.5 * abs(quantity)
         ):
-            print(f"Tender has been processed")
+            print("Tender has been processed")
             return True
         await asyncio.sleep(0.2)
         processing_count += 1
-    print(f"Tender wasn't processed")
+    print("Tender wasn't processed")
     return False
 
 
 async def query_tenders(auth: AuthConfig):
     """Asynchronously queries all active tenders."""
-    api_endpoint = f"http://{auth['server']}:{auth['port']}/v1/tenders"
+    api_endpoint = "/v1/tenders"
     try:
-        headers = make_encoded_header(auth["username"], auth["password"])
-        async with httpx.AsyncClient() as client:
-            response = await client.get(api_endpoint, headers=headers)
-            response.raise_for_status()
-            return response.json()
+        client = get_client(auth)
+        response = await client.get(api_endpoint)
+        response.raise_for_status()
+        return loads(response.content)
     except httpx.RequestError as e:
         print(f"Error querying tenders: {e}")
         return None
@@ -588,13 +969,12 @@ async def query_tenders(auth: AuthConfig):
 
 async def query_leases(auth: AuthConfig):
     """Asynchronously queries all leased assets."""
-    api_endpoint = f"http://{auth['server']}:{auth['port']}/v1/leases"
+    api_endpoint = "/v1/leases"
     try:
-        headers = make_encoded_header(auth["username"], auth["password"])
-        async with httpx.AsyncClient() as client:
-            response = await client.get(api_endpoint, headers=headers)
-            response.raise_for_status()
-            return response.json()
+        client = get_client(auth)
+        response = await client.get(api_endpoint)
+        response.raise_for_status()
+        return loads(response.content)
     except httpx.RequestError as e:
         print(f"Error querying leases: {e}")
         return None
@@ -602,13 +982,12 @@ async def query_leases(auth: AuthConfig):
 
 async def query_lease_details(auth: AuthConfig, lease_id: int):
     """Asynchronously queries details of a specific lease."""
-    api_endpoint = f"http://{auth['server']}:{auth['port']}/v1/leases/{lease_id}"
+    api_endpoint = f"/v1/leases/{lease_id}"
     try:
-        headers = make_encoded_header(auth["username"], auth["password"])
-        async with httpx.AsyncClient() as client:
-            response = await client.get(api_endpoint, headers=headers)
-            response.raise_for_status()
-            return response.json()
+        client = get_client(auth)
+        response = await client.get(api_endpoint)
+        response.raise_for_status()
+        return loads(response.content)
     except httpx.RequestError as e:
         print(f"Error querying lease details for {lease_id}: {e}")
         return None
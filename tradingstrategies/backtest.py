@@ -0,0 +1,489 @@
+import asyncio, json, os, selectors, sys, time
+from typing import NamedTuple, Optional
+import apis
+from client import close_client, get_client
+from mock_exchange import MARKET_MAKER_ID, TRADER_ID, MockExchange, _Book
+from metrics import METRICS
+from models import AuthConfig
+from recorder import BOOK, CASE, SECURITIES, TENDERS, TIME_SALES, RecordingReader
+from strategy3 import Strategy3
+from strategy3_models import StrategyConfig
+from tick_clock import TickClock
+from time_sales import TimeSalesIngester
+
+BACKTEST_AUTH = {
+    "username": "backtest",
+    "password": "backtest",
+    "server": "backtest",
+    "port": 0,
+}
+
+
+# Virtual time
+
+
+class _VirtualSelector(selectors.DefaultSelector):
+    """Never blocks: when nothing is ready, jumps the loop's clock to its next timer."""
+
+    # Wall seconds another thread gets to wake a loop with no timer before it is deadlocked
+    thread_grace = 1.0
+
+    def __init__(self, loop: "VirtualTimeEventLoop"):
+        super().__init__()
+        self.loop = loop
+
+    def select(self, timeout=None):
+        if timeout is not None:
+            events = super().select(0)
+            if not events:
+                self.loop.virtual_time += timeout
+            return events
+        # No timer: only a worker thread can make progress, wait for it for real
+        events = super().select(None if self.loop.executor_jobs else self.thread_grace)
+        if not events:
+            raise RuntimeError("Virtual time deadlock, no task is ready and no timer is scheduled")
+        return events
+
+
+class VirtualTimeEventLoop(asyncio.SelectorEventLoop):
+    """
+    Event loop whose clock only moves when every task is waiting on a timer.
+
+    asyncio.sleep, wait_for timeouts and the exchange clock all complete as
+    soon as nothing else can run, so a session replays as fast as the code
+    runs. Only in-process transports work, there is no real I/O to wait for.
+    """
+
+    def __init__(self):
+        self.virtual_time = 0.0
+        self.executor_jobs = 0  # run_in_executor calls still running
+        super().__init__(_VirtualSelector(self))
+
+    def time(self) -> float:
+        return self.virtual_time
+
+    def run_in_executor(self, executor, func, *args):
+        future = super().run_in_executor(executor, func, *args)
+        self.executor_jobs += 1
+        future.add_done_callback(self._executor_job_done)
+        return future
+
+    def _executor_job_done(self, future):
+        self.executor_jobs -= 1
+
+
+def run_virtual(coro):
+    """Runs a coroutine to completion on a fresh virtual time loop, like asyncio.run."""
+    with asyncio.Runner(loop_factory=VirtualTimeEventLoop) as runner:
+        return runner.run(coro)
+
+
+# Recorded sessions
+#
+# ReplayExchange replays sessions in memory as (header, frames). load_session
+# reads the JSON lines files record_session writes, or converts a Recorder
+# recording with load_recording. A session file is a header {"tickers",
+# "ticks_per_period", "total_periods"} followed by one frame per tick:
+# {"period", "tick", "books": {ticker: {"bids": [[price, quantity], ...],
+# "asks": [...]}}, "prints": {ticker: [[price, quantity], ...]}, "tenders": [...]}
+
+
+def _levels(orders, depth: int) -> list:
+    """Aggregates resting orders, best first, into at most depth [price, quantity] levels."""
+    levels = []
+    for order in orders:
+        quantity = order["quantity"] - order["quantity_filled"]
+        if levels and levels[-1][0] == order["price"]:
+            levels[-1][1] += quantity
+        elif len(levels) < depth:
+            levels.append([order["price"], quantity])
+        else:
+            break
+    return levels
+
+
+def load_session(path: str):
+    """Returns (header, frames) of a session file, or of the Recorder recording at path."""
+    if os.path.exists(f"{path}.idx"):
+        return load_recording(path)
+    with open(path) as f:
+        header = json.loads(f.readline())
+        frames = [json.loads(line) for line in f if line.strip()]
+    return header, frames
+
+
+def load_recording(path: str, depth: int = 20):
+    """
+    Returns (header, frames) of a Recorder recording (<path>.idx and <path>.dat).
+
+    Each tick's frame holds the last book and tender responses of that tick and
+    the prints not seen in an earlier time and sales response. Tickers without
+    a book response in a tick replay no other traders' liquidity that tick.
+    """
+    header = {"tickers": {}, "ticks_per_period": 0, "total_periods": 1}
+    frames = []
+    last_print = {}  # ticker -> highest print id seen
+    with RecordingReader(path) as reader:
+        for record in reader:
+            if record.status != 200:
+                continue
+            body = record.json()
+            if record.kind == CASE:
+                header["ticks_per_period"] = body["ticks_per_period"]
+                header["total_periods"] = body["total_periods"]
+                continue
+            if record.kind == SECURITIES:
+                for security in body:
+                    header["tickers"].setdefault(security["ticker"], security["last"])
+                continue
+            if record.tick == 0:
+                # Before the case starts
+                continue
+            if not frames or (frames[-1]["period"], frames[-1]["tick"]) != (record.period, record.tick):
+                frames.append(
+                    {"period": record.period, "tick": record.tick, "books": {}, "prints": {}, "tenders": []}
+                )
+            frame = frames[-1]
+            if record.kind == BOOK:
+                frame["books"][record.ticker] = {
+                    "bids": _levels(body["bids"], depth),
+                    "asks": _levels(body["asks"], depth),
+                }
+            elif record.kind == TIME_SALES:
+                seen = last_print.get(record.ticker, 0)
+                new = sorted((sale for sale in body if sale["id"] > seen), key=lambda sale: sale["id"])
+                if new:
+                    last_print[record.ticker] = new[-1]["id"]
+                    frame["prints"].setdefault(record.ticker, []).extend(
+                        [sale["price"], sale["quantity"]] for sale in new
+                    )
+            elif record.kind == TENDERS:
+                frame["tenders"] = body
+    return header, frames
+
+
+def record_mock_session(
+    path: str,
+    seed: int = 0,
+    ticks_per_period: int = 300,
+    tickers: Optional[dict] = None,
+    depth: int = 20,
+):
+    """Runs a MockExchange session without any trader and records it."""
+    exchange = MockExchange(tickers, ticks_per_period, seed=seed, depth=depth)
+    recorded = {ticker: 0 for ticker in exchange.tickers}
+    with open(path, "w") as f:
+        header = {
+            "tickers": exchange.tickers,
+            "ticks_per_period": exchange.ticks_per_period,
+            "total_periods": exchange.total_periods,
+        }
+        f.write(json.dumps(header) + "\n")
+        while True:
+            exchange.advance_tick()
+            if exchange.status != "ACTIVE":
+                break
+            frame = {"period": exchange.period, "tick": exchange.tick, "books": {}, "prints": {}}
+            for ticker, book in exchange.books.items():
+                frame["books"][ticker] = {
+                    "bids": _levels(book.levels("BUY", depth * 10), depth),
+                    "asks": _levels(book.levels("SELL", depth * 10), depth),
+                }
+                prints = exchange.time_and_sales[ticker]
+                frame["prints"][ticker] = [
+                    [sale["price"], sale["quantity"]] for sale in prints[recorded[ticker] :]
+                ]
+                recorded[ticker] = len(prints)
+            frame["tenders"] = list(exchange.tenders.values())
+            f.write(json.dumps(frame) + "\n")
+
+
+async def record_session(
+    auth: AuthConfig, path: str, tickers: list, depth: int = 20, interval: float = 0.05
+):
+    """Records a live case tick by tick until it stops."""
+    clock = TickClock(auth, interval)
+    ingester = TimeSalesIngester(auth, tickers, capacity=4096)
+    case_data = await apis.query_case_status(auth)
+    # Only prints from the recording onwards
+    for ticker in tickers:
+        await ingester.poll(ticker)
+    clock.start()
+    try:
+        with open(path, "w") as f:
+            header = {
+                "tickers": {ticker: ingester.last_price(ticker) for ticker in tickers},
+                "ticks_per_period": case_data["ticks_per_period"],
+                "total_periods": case_data["total_periods"],
+            }
+            f.write(json.dumps(header) + "\n")
+            while clock.status != "STOPPED":
+                await clock.wait_for_tick_change()
+                frame = {"period": clock.period, "tick": clock.tick, "books": {}, "prints": {}}
+                for ticker in tickers:
+                    order_book = await apis.query_security_order_book(auth, ticker, depth * 10)
+                    frame["books"][ticker] = {
+                        "bids": _levels(order_book["bids"], depth),
+                        "asks": _levels(order_book["asks"], depth),
+                    }
+                    new_prints = await ingester.poll(ticker)
+                    frame["prints"][ticker] = [
+                        [price, quantity]
+                        for _, _, price, quantity in reversed(
+                            ingester.rings[ticker].latest(new_prints)
+                        )
+                    ]
+                frame["tenders"] = await apis.query_tenders(auth) or []
+                f.write(json.dumps(frame) + "\n")
+    finally:
+        await clock.stop()
+
+
+# Replay
+
+
+class ReplayExchange(MockExchange):
+    """
+    Replays a recorded session through the mock exchange's matching engine.
+
+    Every tick the recorded book replaces the other traders' liquidity and
+    the recorded prints fill our resting orders they trade through, at our
+    price. Our MARKET orders take the recorded book, so fills see its depth.
+    """
+
+    def __init__(self, header: dict, frames: list):
+        self.frames = frames
+        self._next_frame = 0
+        self._seen_tenders = set()
+        self.arrival_prices = {}  # order_id -> mid price when our order arrived
+        self.tenders_accepted = 0
+        super().__init__(
+            dict(header["tickers"]),
+            header["ticks_per_period"],
+            header.get("total_periods", 1),
+            tender_every=0,
+        )
+        if frames:
+            for ticker in self.tickers:
+                self._load_book(ticker, frames[0]["books"].get(ticker))
+
+    def _refresh_liquidity(self, ticker: str):
+        # Liquidity comes from the recording
+        pass
+
+    def submit_order(
+        self,
+        ticker: str,
+        type: str,
+        quantity: int,
+        action: str,
+        price: Optional[float] = None,
+        trader_id: str = TRADER_ID,
+    ) -> dict:
+        if trader_id == TRADER_ID:
+            book = self.books[ticker]
+            bid, ask = book.best_bid(), book.best_ask()
+            if bid is not None and ask is not None:
+                self.arrival_prices[self._next_order_id] = (bid + ask) / 2
+        return super().submit_order(ticker, type, quantity, action, price, trader_id)
+
+    def accept_tender(self, tender_id: int) -> bool:
+        accepted = super().accept_tender(tender_id)
+        self.tenders_accepted += accepted
+        return accepted
+
+    def _trade_through(self, ticker: str, price: float, quantity: int):
+        """Fills our resting orders that a recorded print traded through."""
+        book = self.books[ticker]
+        for action, prices, crossed in (
+            ("BUY", book.bid_prices[::-1], lambda level: level >= price),
+            ("SELL", list(book.ask_prices), lambda level: level <= price),
+        ):
+            levels = book.side(action)[1]
+            for level_price in prices:
+                if quantity <= 0 or not crossed(level_price):
+                    break
+                for order in list(levels[level_price]):
+                    if order["trader_id"] != TRADER_ID:
+                        continue
+                    traded = min(quantity, order["quantity"] - order["quantity_filled"])
+                    self._fill(order, traded, level_price)
+                    quantity -= traded
+                    if order["quantity_filled"] == order["quantity"]:
+                        book.remove(order)
+                    if quantity <= 0:
+                        break
+
+    def _load_book(self, ticker: str, levels: Optional[dict]):
+        """Replaces the other traders' orders with the recorded levels."""
+        book = self.books[ticker] = _Book()
+        for order in self.orders.values():
+            if order["ticker"] == ticker and order["status"] == "OPEN":
+                book.add(order)
+        if not levels:
+            return
+        for action, side in (("BUY", "bids"), ("SELL", "asks")):
+            for price, quantity in levels[side]:
+                # Crossing levels fill our resting orders before they rest
+                self.submit_order(ticker, "LIMIT", quantity, action, price, MARKET_MAKER_ID)
+
+    def advance_tick(self):
+        """Moves to the next recorded tick, stopping the case after the last one."""
+        if self.status != "ACTIVE":
+            return
+        if self._next_frame >= len(self.frames):
+            self.status = "STOPPED"
+            return
+        frame = self.frames[self._next_frame]
+        self._next_frame += 1
+        self.period, self.tick = frame["period"], frame["tick"]
+        for tender_id in [t for t, v in self.tenders.items() if v["expires"] < self.tick]:
+            del self.tenders[tender_id]
+        for ticker in self.tickers:
+            open_price = self.last[ticker]
+            high = low = open_price
+            for price, quantity in frame["prints"].get(ticker, ()):
+                self._trade_through(ticker, price, quantity)
+                self._print(ticker, price, quantity)
+                high, low = max(high, price), min(low, price)
+            self._load_book(ticker, frame["books"].get(ticker))
+            self.ohlc[ticker].append(
+                {"tick": self.tick, "open": open_price, "high": high, "low": low, "close": self.last[ticker]}
+            )
+        for tender in frame.get("tenders", ()):
+            # Accepted or declined tenders stay gone
+            if tender["tender_id"] not in self._seen_tenders:
+                self._seen_tenders.add(tender["tender_id"])
+                self.tenders[tender["tender_id"]] = dict(tender)
+
+    def market_vwap(self, ticker: str) -> Optional[float]:
+        """VWAP of every print of the session, ours included."""
+        prints = self.time_and_sales[ticker]
+        volume = sum(sale["quantity"] for sale in prints)
+        return sum(sale["price"] * sale["quantity"] for sale in prints) / volume if volume else None
+
+
+class BacktestResult(NamedTuple):
+    pnl: float
+    realized: float
+    unrealized: float
+    positions: dict
+    orders: int
+    tenders_accepted: int
+    fill_rate: Optional[float]  # filled over ordered quantity of our orders
+    slippage: Optional[float]  # average fill cost per share against the arrival mid
+    ticks: int
+    elapsed: float  # wall clock seconds
+
+
+async def backtest(
+    exchange: ReplayExchange,
+    strategy,
+    auths=(BACKTEST_AUTH,),
+    tick_interval: float = 0.1,
+) -> BacktestResult:
+    """
+    Runs strategy() against a replay until the recorded session ends.
+
+    Args:
+        strategy: Coroutine function started as a task, cancelled when the case stops.
+        auths: Credentials the strategy uses, their clients are routed to the replay.
+        tick_interval: Virtual seconds per tick, polling intervals are relative to it.
+    """
+    start = time.perf_counter()
+    # Latencies of this run only
+    METRICS.reset()
+    for auth in auths:
+        await close_client(auth)
+        get_client(auth, transport=exchange.transport())
+    task = asyncio.create_task(strategy())
+    try:
+        await exchange.run_clock(tick_interval)
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        for auth in auths:
+            await close_client(auth)
+    ordered = filled = cost = 0
+    for order in exchange.orders.values():
+        ordered += order["quantity"]
+        filled += order["quantity_filled"]
+        arrival = exchange.arrival_prices.get(order["order_id"])
+        if order["quantity_filled"] and arrival is not None:
+            sign = 1 if order["action"] == "BUY" else -1
+            cost += sign * (order["vwap"] - arrival) * order["quantity_filled"]
+    realized = sum(exchange.realized.values())
+    unrealized = sum(
+        exchange.positions[ticker] * exchange.last[ticker] - exchange.cost[ticker]
+        for ticker in exchange.tickers
+    )
+    return BacktestResult(
+        pnl=realized + unrealized,
+        realized=realized,
+        unrealized=unrealized,
+        positions=dict(exchange.positions),
+        orders=len(exchange.orders),
+        tenders_accepted=exchange.tenders_accepted,
+        fill_rate=filled / ordered if ordered else None,
+        slippage=cost / filled if filled else None,
+        ticks=exchange.tick,
+        elapsed=time.perf_counter() - start,
+    )
+
+
+def backtest_strategy3(
+    session, config: Optional[StrategyConfig] = None, tick_interval: float = 0.1
+) -> BacktestResult:
+    """
+    Replays a session through strategy3.
+
+    Args:
+        session: Path of a recorded session, or its (header, frames).
+        config: Strategy parameters, StrategyConfig.from_env() by default.
+    """
+    config = config or StrategyConfig.from_env()
+    if config.display_interval:
+        config = config.model_copy(update={"display_interval": 0})
+    header, frames = load_session(session) if isinstance(session, str) else session
+    strategy = Strategy3(config, BACKTEST_AUTH)
+    return run_virtual(
+        backtest(ReplayExchange(header, frames), strategy.run, (BACKTEST_AUTH,), tick_interval)
+    )
+
+
+def backtest_vwap(
+    session: str, configs: list, use_volume_profile: bool = False, tick_interval: float = 0.1
+):
+    """
+    Replays a session through VWAPStrategy parents.
+
+    Returns:
+        (BacktestResult, strategies, market VWAP per ticker)
+    """
+    from vwap_strategy import run_vwap_orders
+
+    header, frames = load_session(session)
+    exchange = ReplayExchange(header, frames)
+    strategies = []
+
+    async def strategy():
+        strategies.extend(await run_vwap_orders(configs, use_volume_profile=use_volume_profile))
+        await asyncio.Event().wait()
+
+    auths = [
+        {"username": c.username, "password": c.password, "server": c.server, "port": c.port}
+        for c in configs
+    ]
+    result = run_virtual(backtest(exchange, strategy, auths, tick_interval))
+    return result, strategies, {ticker: exchange.market_vwap(ticker) for ticker in exchange.tickers}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "record":
+        record_mock_session(sys.argv[2], seed=int(sys.argv[3]) if len(sys.argv) > 3 else 0)
+        print(f"Recorded mock session to {sys.argv[2]}")
+    elif len(sys.argv) > 1:
+        result = backtest_strategy3(sys.argv[1])
+        print(result)
+    else:
+        print("usage: backtest.py record <session.jsonl> [seed] | backtest.py <session.jsonl | recording>")
@@ -0,0 +1,45 @@
+import asyncio, sys, time
+import httpx
+import apis
+from client import close_clients
+from stub_server import start_stub_server
+from utility import make_encoded_header
+
+
+async def per_call_client(auth, requests: int):
+    """Old behaviour: a fresh AsyncClient and header for every request."""
+    api_endpoint = f"http://{auth['server']}:{auth['port']}/v1/case"
+    for _ in range(requests):
+        headers = make_encoded_header(auth["username"], auth["password"])
+        async with httpx.AsyncClient() as client:
+            response = await client.get(api_endpoint, headers=headers)
+            response.raise_for_status()
+            response.json()
+
+
+async def pooled_client(auth, requests: int):
+    """New behaviour: every request goes through the shared pooled client."""
+    for _ in range(requests):
+        await apis.query_case_status(auth)
+
+
+async def main(requests: int = 500):
+    server, port = await start_stub_server()
+    auth = {"username": "bench", "password": "bench", "server": "127.0.0.1", "port": port}
+    try:
+        for name, run in (("per-call client", per_call_client), ("pooled client", pooled_client)):
+            start = time.perf_counter()
+            await run(auth, requests)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{name:<16} {requests} requests in {elapsed:.3f}s "
+                f"-> {elapsed / requests * 1e6:.0f} us/request"
+            )
+    finally:
+        await close_clients()
+        server.close()
+        await server.wait_closed()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
@@ -0,0 +1,98 @@
+import json, sys, time
+from mock_exchange import MockExchange
+from models import CaseDataResponse, OrderResponse
+from records import (
+    CaseRecord,
+    OrderRecord,
+    SecurityRecord,
+    decode,
+    decode_list,
+    loads,
+)
+
+
+def sample_responses() -> dict:
+    """Raw JSON bodies of the hot endpoints, taken from a mock session."""
+    exchange = MockExchange(tender_every=1, tender_expiry=50)
+    for _ in range(20):
+        exchange.advance_tick()
+    order = exchange.submit_order("CRZY", "MARKET", 1000, "BUY")
+    book = exchange.handle("GET", "/v1/securities/book", {"ticker": "CRZY"})[1]
+    return {
+        "case": json.dumps(exchange.case()).encode(),
+        "order": json.dumps(order).encode(),
+        "securities": json.dumps([exchange.security("CRZY")]).encode(),
+        "book": json.dumps(book).encode(),
+        "tenders": json.dumps(list(exchange.tenders.values())).encode(),
+    }
+
+
+def decoders(responses: dict) -> list:
+    """
+    (name, response, current decoder, fast decoder, strict decoder)
+
+    The current decoders are what apis.py did before: response.json(), then
+    pydantic validation where the caller used a model, raw dicts elsewhere.
+    The fast decoders are what apis.py and its callers do now, books and
+    tenders are only parsed with loads, so STRICT_DECODING does not apply.
+    """
+
+    return [
+        (
+            "case",
+            responses["case"],
+            lambda body: CaseDataResponse.model_validate(json.loads(body)),
+            lambda body: decode(CaseRecord, body),
+            lambda body: decode(CaseRecord, body, strict=True),
+        ),
+        (
+            "order",
+            responses["order"],
+            lambda body: OrderResponse.model_validate(json.loads(body)),
+            lambda body: decode(OrderRecord, body),
+            lambda body: decode(OrderRecord, body, strict=True),
+        ),
+        (
+            "book",
+            responses["book"],
+            json.loads,
+            loads,
+            loads,
+        ),
+        (
+            "securities",
+            responses["securities"],
+            json.loads,
+            lambda body: decode_list(SecurityRecord, body),
+            lambda body: decode_list(SecurityRecord, body, strict=True),
+        ),
+        (
+            "tenders",
+            responses["tenders"],
+            json.loads,
+            loads,
+            loads,
+        ),
+    ]
+
+
+def per_call(decoder, body: bytes, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        decoder(body)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main(iterations: int = 20000):
+    print(f"{'response':<12}{'bytes':>8}{'current':>12}{'fast':>12}{'strict':>12}  (us/response)")
+    for name, body, current, fast, strict in decoders(sample_responses()):
+        print(
+            f"{name:<12}{len(body):>8}"
+            f"{per_call(current, body, iterations):>12.2f}"
+            f"{per_call(fast, body, iterations):>12.2f}"
+            f"{per_call(strict, body, iterations):>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,211 @@
+import asyncio, httpx, random, time
+from typing import Optional
+from metrics import METRICS, Metrics, endpoint
+from rate_limit import RateLimiter, retry_after
+from utility import make_encoded_header
+from models import AuthConfig, ClientConfig
+
+
+class APIClient:
+    """
+    Long-lived HTTP client for the RIT API.
+
+    Owns one keep-alive connection pool and a pre-built authorization header,
+    so consecutive calls reuse the same TCP connection instead of opening a
+    new one per request.
+
+    Requests are paced by a per-endpoint-class rate limiter that learns from
+    429 responses. Throttled requests, and queries/cancels that fail on the
+    network or with a 5xx, are retried with jittered backoff until
+    retry_deadline. Orders are only retried on 429, which the server rejects
+    before executing them.
+    """
+
+    def __init__(
+        self,
+        auth: AuthConfig,
+        config: Optional[ClientConfig] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        metrics: Optional[Metrics] = None,
+    ):
+        self.config = config or ClientConfig()
+        # Latency of every request by endpoint and status, retries included
+        self.metrics = metrics or METRICS
+        self.base_url = f"http://{auth['server']}:{auth['port']}"
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=make_encoded_header(auth["username"], auth["password"]),
+            limits=httpx.Limits(
+                max_connections=self.config.max_connections,
+                max_keepalive_connections=self.config.max_keepalive_connections,
+                keepalive_expiry=self.config.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(
+                self.config.timeout, connect=self.config.connect_timeout
+            ),
+            transport=transport,
+        )
+        self.limiter = RateLimiter(
+            {
+                "orders": self.config.order_rate,
+                "queries": self.config.query_rate,
+                "cancels": self.config.cancel_rate,
+            },
+            self.config.rate_burst,
+            self.config.throttled_rate,
+        )
+        self._listeners = []  # callback(method, path, params, response)
+        # path -> absolute URL, saves parsing and merging the same paths on every request
+        self._urls = {}
+
+    @property
+    def is_closed(self) -> bool:
+        return self._client.is_closed
+
+    def _url(self, path: str) -> httpx.URL:
+        url = self._urls.get(path)
+        if url is None:
+            if len(self._urls) >= 1024:
+                # Order IDs make paths unbounded
+                self._urls.clear()
+            url = self._urls[path] = self._client.base_url.join(path)
+        return url
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, self.config.retry_backoff * 2**attempt)
+
+    def add_listener(self, callback):
+        """Registers callback(method, path, params, response), called with every response returned."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    async def request(self, method: str, path: str, params=None) -> httpx.Response:
+        """
+        Sends a request, retrying it while it is safe to and the deadline allows.
+
+        Returns:
+            The last response. Raises the transport error if every attempt failed.
+        """
+        start = time.perf_counter()
+        try:
+            response = await self._send(method, path, params)
+        except httpx.TransportError:
+            self.metrics.record_since(f"{endpoint(method, path)} error", start)
+            raise
+        self.metrics.record_since(
+            f"{endpoint(method, path)} {response.status_code}", start
+        )
+        for callback in self._listeners:
+            callback(method, path, params, response)
+        return response
+
+    async def _send(self, method: str, path: str, params=None) -> httpx.Response:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.config.retry_deadline
+        retry_failures = method != "POST"
+        attempt = 0
+        while True:
+            bucket = self.limiter.bucket(method, path)
+            if bucket is not None:
+                await bucket.acquire()
+            try:
+                # An empty dict would still re-parse the URL
+                response = await self._client.request(
+                    method, self._url(path), params=params or None
+                )
+            except httpx.TransportError:
+                if (
+                    not retry_failures
+                    or attempt >= self.config.max_retries
+                    or loop.time() >= deadline
+                ):
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+
+            if response.status_code == 429:
+                wait = retry_after(response)
+                # The bucket holds every request of this class until wait has passed
+                self.limiter.throttled(method, path, wait)
+                if (
+                    attempt >= self.config.max_retries
+                    or loop.time() + wait >= deadline
+                ):
+                    return response
+                await asyncio.sleep(self._backoff(attempt))
+            elif response.status_code >= 500 and retry_failures:
+                if attempt >= self.config.max_retries or loop.time() >= deadline:
+                    return response
+                await asyncio.sleep(self._backoff(attempt))
+            else:
+                if bucket is not None:
+                    bucket.accepted()
+                return response
+            attempt += 1
+
+    async def get(self, path: str, params=None) -> httpx.Response:
+        return await self.request("GET", path, params)
+
+    async def post(self, path: str, params=None) -> httpx.Response:
+        return await self.request("POST", path, params)
+
+    async def delete(self, path: str, params=None) -> httpx.Response:
+        return await self.request("DELETE", path, params)
+
+    async def aclose(self):
+        """Closes every pooled connection."""
+        await self._client.aclose()
+
+
+# One client per (server, port, username, password)
+_clients: dict = {}
+
+
+def auth_key(auth: AuthConfig) -> tuple:
+    """Returns the key identifying the connection pool for the given credentials."""
+    return (auth["server"], str(auth["port"]), auth["username"], auth["password"])
+
+
+def get_client(
+    auth: AuthConfig,
+    config: Optional[ClientConfig] = None,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+    metrics: Optional[Metrics] = None,
+) -> APIClient:
+    """
+    Returns the shared client for the given credentials, creating it on first use.
+
+    Args:
+        auth: AuthConfig model containing authentication details.
+        config: Pool limits and timeouts, only used when the client is created.
+        transport: Optional httpx transport, only used when the client is created.
+        metrics: Latency histograms of the client, the shared METRICS by default,
+            only used when the client is created.
+
+    Returns:
+        The APIClient owning the connection pool for these credentials.
+    """
+    key = auth_key(auth)
+    client = _clients.get(key)
+    if client is None or client.is_closed:
+        client = APIClient(auth, config, transport, metrics)
+        _clients[key] = client
+    return client
+
+
+async def close_client(auth: AuthConfig):
+    """Closes and forgets the client for the given credentials."""
+    client = _clients.pop(auth_key(auth), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def close_clients():
+    """Closes every shared client, call this before the event loop shuts down."""
+    while _clients:
+        _, client = _clients.popitem()
+        await client.aclose()
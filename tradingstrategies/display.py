@@ -0,0 +1,98 @@
+import asyncio
+from rich.console import Console  # type: ignore
+from rich.table import Table  # type: ignore
+from market_depth import MarketDepth
+
+
+# Function to render the Market Depth table
+def render_market_depth(market_depth: MarketDepth) -> Table:
+    table = Table(
+        title=f"Market Depth View - {market_depth.ticker}",
+        show_header=True,
+        header_style="bold cyan",
+    )
+
+    table.add_column("BidVWAP", justify="right")
+    table.add_column("Cum Bid Vol", justify="right")
+    table.add_column("Bid Volume", justify="right")
+    table.add_column("Bid Price", justify="right")
+    table.add_column("Ask Price", justify="right")
+    table.add_column("Ask Volume", justify="right")
+    table.add_column("Cum Ask Vol", justify="right")
+    table.add_column("AskVWAP", justify="right")
+
+    bids, asks = market_depth.bids, market_depth.asks
+    for i in range(max(len(bids), len(asks))):
+        bid_row = (
+            (
+                f"{bids.vwaps[i]:.2f}",
+                f"{bids.cumulative_volumes[i]:.0f}",
+                f"{bids.volumes[i]:.0f}",
+                bids.prices[i],
+            )
+            if i < len(bids)
+            else ("", "", "", "")
+        )
+        ask_row = (
+            (
+                asks.prices[i],
+                f"{asks.volumes[i]:.0f}",
+                f"{asks.cumulative_volumes[i]:.0f}",
+                f"{asks.vwaps[i]:.2f}",
+            )
+            if i < len(asks)
+            else ("", "", "", "")
+        )
+        table.add_row(*(str(cell) for cell in bid_row + ask_row))
+    return table
+
+
+class DepthDisplay:
+    """
+    Optional, rate-limited market depth view.
+
+    update() only stores the latest depth per ticker, so callers on the
+    decision path never wait on rendering. A separate task prints whatever
+    changed at most once per interval, in a worker thread.
+    """
+
+    def __init__(self, console: Console, interval: float = 1.0):
+        self.console = console
+        self.interval = interval
+        self._pending = {}  # ticker -> latest MarketDepth not yet shown
+        self._task = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def update(self, market_depth: MarketDepth):
+        if self.enabled:
+            self._pending[market_depth.ticker] = market_depth
+
+    def _print(self, depths):
+        for market_depth in depths:
+            self.console.print(render_market_depth(market_depth))
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if self._pending:
+                depths = list(self._pending.values())
+                self._pending.clear()
+                await asyncio.to_thread(self._print, depths)
+
+    def start(self):
+        """Starts the render task on the running event loop, unless disabled."""
+        if self.enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
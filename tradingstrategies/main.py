@@ -4,6 +4,7 @@ from vwap_strategy import VWAPStrategy
 from vwap_models import TradeConfig, TradeAction
 from models import OrderStatus, OHLCParams, TimeSalesParams
 import apis
+from client import close_clients
 from dotenv import load_dotenv  # type: ignore
 
 # Load environment variables from .env file
@@ -20,6 +21,7 @@ async def main():
     
     case_data = await apis.query_case_status(auth)
     print(case_data)  # Assuming pretty_print is a function, replace if needed.
+    await close_clients()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -102,4 +104,6 @@ if __name__ == "__main__":
 # )
 
 # vwap = VWAPStrategy(config=config)
-# vwap.start()
+# asyncio.run(vwap.start())
+# # Several parents (tickers/directions) run concurrently on one event loop
+# asyncio.run(run_vwap_orders([config, ...]))
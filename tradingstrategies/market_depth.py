@@ -0,0 +1,113 @@
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+from typing import NamedTuple, Optional
+from order_book import OrderBook
+
+
+class DepthSide:
+    """
+    Price levels of one side of the book with their running totals.
+
+    cumulative_volumes[i] and vwaps[i] describe sweeping levels 0..i, both
+    filled in a single prefix-sum pass.
+    """
+
+    __slots__ = ("prices", "volumes", "cumulative_volumes", "vwaps")
+
+    def __init__(self, levels):
+        self.prices = array("d", (price for price, _ in levels))
+        # Doubles, quantities arrive as floats from the order endpoints
+        self.volumes = array("d", (volume for _, volume in levels))
+        self.cumulative_volumes = array("d", accumulate(self.volumes))
+        notionals = accumulate(p * v for p, v in zip(self.prices, self.volumes))
+        self.vwaps = array(
+            "d",
+            (
+                notional / volume if volume else float("nan")
+                for notional, volume in zip(notionals, self.cumulative_volumes)
+            ),
+        )
+
+    def __len__(self):
+        return len(self.prices)
+
+    def level_for_quantity(self, quantity: int) -> Optional[int]:
+        """Returns the first level whose cumulative volume covers quantity, or None."""
+        level = bisect_left(self.cumulative_volumes, quantity)
+        return level if level < len(self.cumulative_volumes) else None
+
+    def vwap_for_quantity(self, quantity: int) -> Optional[float]:
+        """Returns the VWAP of sweeping the book until quantity is covered, or None."""
+        level = self.level_for_quantity(quantity)
+        return None if level is None else self.vwaps[level]
+
+
+class MarketDepth:
+    """Cumulative volume and VWAP for every depth level of both sides."""
+
+    __slots__ = ("ticker", "bids", "asks")
+
+    def __init__(self, ticker: str, bids, asks):
+        self.ticker = ticker
+        self.bids = DepthSide(bids)
+        self.asks = DepthSide(asks)
+
+    @classmethod
+    def from_order_book(cls, order_book: OrderBook, depth: Optional[int] = None):
+        return cls(order_book.ticker, order_book.bids(depth), order_book.asks(depth))
+
+    def side_for(self, action: str) -> DepthSide:
+        """Returns the bids for a SELL and the asks for a BUY."""
+        return self.bids if action == "SELL" else self.asks
+
+    def vwap_to_fill(self, action: str, quantity: int) -> Optional[float]:
+        """
+        Returns the VWAP of filling quantity against the book.
+
+        Args:
+            action: "SELL" sweeps the bids, "BUY" sweeps the asks.
+            quantity: Number of shares to fill.
+
+        Returns:
+            The VWAP, or None if the visible depth cannot cover quantity.
+        """
+        return self.side_for(action).vwap_for_quantity(quantity)
+
+
+class TenderSignal(NamedTuple):
+    accept: bool
+    vwap: Optional[float]
+
+
+def evaluate_tender(
+    market_depth: MarketDepth, price: float, action: str, quantity: int, margin: float = 0.0
+) -> TenderSignal:
+    """
+    Decides whether a tender is worth taking against the current depth.
+
+    Args:
+        market_depth: Depth snapshot of the tender's ticker.
+        price: Tender price.
+        action: Tender action, "BUY" or "SELL".
+        quantity: Tender quantity.
+        margin: Minimum edge required over the depth VWAP.
+
+    Returns:
+        TenderSignal with the decision and the VWAP to fill quantity, or
+        (False, -1) when the action is unknown or that side of the book is empty.
+    """
+    if action not in ("SELL", "BUY"):
+        return TenderSignal(False, -1)
+    side = market_depth.side_for(action)
+    if not len(side):
+        return TenderSignal(False, -1)
+
+    vwap_at_quantity = side.vwap_for_quantity(quantity)
+    if vwap_at_quantity is None:
+        vwap_at_quantity = side.vwaps[0]
+
+    # For SELL action, we look at bids
+    if action == "SELL":
+        return TenderSignal(price - margin > vwap_at_quantity, vwap_at_quantity)
+    return TenderSignal(price + margin < vwap_at_quantity, vwap_at_quantity)
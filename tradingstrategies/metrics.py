@@ -0,0 +1,190 @@
+import asyncio, json, time
+from typing import Optional
+
+# Each power of two is split into SUB_BUCKETS linear buckets, ~3% relative error
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+
+class LatencyHistogram:
+    """
+    HDR-style log-linear histogram of latencies in microseconds.
+
+    Recording is a bucket index computation and a list increment, memory is
+    bounded by the largest value (about 32 buckets per power of two), and
+    percentiles are read from the bucket counts.
+    """
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = []
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    @staticmethod
+    def _index(value: int) -> int:
+        shift = max(0, value.bit_length() - SUB_BUCKET_BITS - 1)
+        return (shift << SUB_BUCKET_BITS) + (value >> shift)
+
+    @staticmethod
+    def _value(index: int) -> int:
+        """Highest value counted in bucket index."""
+        shift = max(0, (index >> SUB_BUCKET_BITS) - 1)
+        return ((index - (shift << SUB_BUCKET_BITS) + 1) << shift) - 1
+
+    def record(self, seconds: float):
+        value = int(seconds * 1e6)
+        index = self._index(value)
+        counts = self.counts
+        if index >= len(counts):
+            counts.extend([0] * (index + 1 - len(counts)))
+        counts[index] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "LatencyHistogram"):
+        if len(other.counts) > len(self.counts):
+            self.counts.extend([0] * (len(other.counts) - len(self.counts)))
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percent: float) -> int:
+        """Microseconds at or below which percent of the values fall."""
+        if self.count == 0:
+            return 0
+        target = max(1, round(self.count * percent / 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self._value(index), self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        """count, then mean, p50, p90, p99 and max in milliseconds."""
+        if self.count == 0:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean": self.total / self.count / 1000,
+            "p50": self.percentile(50) / 1000,
+            "p90": self.percentile(90) / 1000,
+            "p99": self.percentile(99) / 1000,
+            "max": self.max / 1000,
+        }
+
+
+def endpoint(method: str, path: str) -> str:
+    """Request name with ids replaced, /v1/orders/12 -> GET /v1/orders/{id}."""
+    if path[-1:].isdigit():
+        path = "/".join("{id}" if part.isdigit() else part for part in path.split("/"))
+    return f"{method} {path}"
+
+
+class Metrics:
+    """
+    Latency histograms by name.
+
+    APIClient records every request under "<METHOD> <path> <status>" and the
+    strategies record their stages ("signal", "risk_check", ...). The
+    reporter task prints a summary every interval, dump writes the
+    summaries and bucket counts at the end of a session.
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.started = time.time()
+        self._task = None
+
+    def histogram(self, name: str) -> LatencyHistogram:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram()
+        return histogram
+
+    def record(self, name: str, seconds: float):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def record_since(self, name: str, start: float):
+        """Records the time since start, a time.perf_counter() reading."""
+        self.record(name, time.perf_counter() - start)
+
+    def reset(self):
+        self.histograms = {}
+        self.started = time.time()
+
+    def report(self) -> str:
+        lines = [
+            f"{'latency (ms)':<40}{'count':>8}{'mean':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}"
+        ]
+        for name in sorted(self.histograms):
+            summary = self.histograms[name].summary()
+            if summary["count"]:
+                lines.append(
+                    f"{name:<40}{summary['count']:>8}{summary['mean']:>9.2f}{summary['p50']:>9.2f}"
+                    f"{summary['p90']:>9.2f}{summary['p99']:>9.2f}{summary['max']:>9.2f}"
+                )
+        return "\n".join(lines)
+
+    def dump(self, path: str):
+        """Writes every histogram's summary and raw bucket counts as JSON."""
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "started": self.started,
+                    "ended": time.time(),
+                    "sub_bucket_bits": SUB_BUCKET_BITS,
+                    "histograms": {
+                        name: {**histogram.summary(), "counts": histogram.counts}
+                        for name, histogram in self.histograms.items()
+                    },
+                },
+                f,
+            )
+
+    async def _report(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            print(self.report())
+
+    def start(self, interval: float):
+        """Prints a summary every interval seconds on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._report(interval))
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Shared by every client and strategy in the process
+METRICS = Metrics()
+
+
+def dump_metrics(path: Optional[str] = None, metrics: Optional[Metrics] = None):
+    """Prints the session's latency summary, and writes it to path if given."""
+    metrics = metrics or METRICS
+    print(metrics.report())
+    if path:
+        metrics.dump(path)
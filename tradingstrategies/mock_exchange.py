@@ -0,0 +1,583 @@
+import asyncio, bisect, random, sys, time
+from collections import deque
+from typing import Optional
+import httpx
+from stub_server import start_stub_server
+
+TRADER_ID = "trader"
+MARKET_MAKER_ID = "market_maker"
+
+
+class _Book:
+    """Price-time priority book for one ticker, each price level is a FIFO queue."""
+
+    def __init__(self):
+        self.bid_prices = []  # ascending, best bid is the last element
+        self.ask_prices = []  # ascending, best ask is the first element
+        self.bids = {}  # price -> deque of orders
+        self.asks = {}
+
+    def best_bid(self):
+        return self.bid_prices[-1] if self.bid_prices else None
+
+    def best_ask(self):
+        return self.ask_prices[0] if self.ask_prices else None
+
+    def side(self, action: str):
+        """Returns the (prices, levels) resting on the side an order of this action joins."""
+        return (self.bid_prices, self.bids) if action == "BUY" else (self.ask_prices, self.asks)
+
+    def add(self, order: dict):
+        prices, levels = self.side(order["action"])
+        level = levels.get(order["price"])
+        if level is None:
+            level = levels[order["price"]] = deque()
+            bisect.insort(prices, order["price"])
+        level.append(order)
+
+    def remove(self, order: dict):
+        prices, levels = self.side(order["action"])
+        level = levels.get(order["price"])
+        if level is None:
+            return
+        try:
+            level.remove(order)
+        except ValueError:
+            return
+        if not level:
+            del levels[order["price"]]
+            del prices[bisect.bisect_left(prices, order["price"])]
+
+    def levels(self, action: str, limit: int):
+        """Yields resting orders on one side, best price first."""
+        prices, levels = self.side(action)
+        ordered = reversed(prices) if action == "BUY" else prices
+        count = 0
+        for price in ordered:
+            for order in levels[price]:
+                if count >= limit:
+                    return
+                yield order
+                count += 1
+
+
+class MockExchange:
+    """
+    In-process stand-in for the RIT server.
+
+    Implements the endpoints used by apis.py on top of a price-time priority
+    matching engine. Market makers quote around a random-walk fair value,
+    noise traders print to time & sales, and tenders are generated on a
+    fixed tick schedule. Everything is driven by a seeded RNG, so a given
+    seed replays the same session.
+    """
+
+    def __init__(
+        self,
+        tickers: Optional[dict] = None,
+        ticks_per_period: int = 300,
+        total_periods: int = 1,
+        seed: int = 0,
+        depth: int = 20,
+        tick_size: float = 0.01,
+        tender_every: int = 10,
+        tender_expiry: int = 5,
+        net_limit: int = 100000,
+        gross_limit: int = 250000,
+        order_rate_limit: Optional[int] = None,
+    ):
+        self.tickers = tickers or {"CRZY": 25.0}
+        self.ticks_per_period = ticks_per_period
+        self.total_periods = total_periods
+        self.depth = depth
+        self.tick_size = tick_size
+        self.tender_every = tender_every
+        self.tender_expiry = tender_expiry
+        self.net_limit = net_limit
+        self.gross_limit = gross_limit
+        # Orders accepted per wall-clock second before answering 429, None for no limit
+        self.order_rate_limit = order_rate_limit
+        self._order_times = deque()
+        self.random = random.Random(seed)
+
+        self.period = 1
+        self.tick = 0
+        self.status = "ACTIVE"
+        self.fair_value = dict(self.tickers)
+        self.books = {ticker: _Book() for ticker in self.tickers}
+        self.orders = {}  # order_id -> order
+        self.tenders = {}  # tender_id -> tender
+        self.time_and_sales = {ticker: [] for ticker in self.tickers}
+        self.ohlc = {ticker: [] for ticker in self.tickers}
+        self.positions = {ticker: 0 for ticker in self.tickers}
+        self.cost = {ticker: 0.0 for ticker in self.tickers}
+        self.realized = {ticker: 0.0 for ticker in self.tickers}
+        self.volume = {ticker: 0 for ticker in self.tickers}
+        self.last = dict(self.tickers)
+        self._next_order_id = 1
+        self._next_print_id = 1
+        self._next_tender_id = 1
+        for ticker in self.tickers:
+            self._refresh_liquidity(ticker)
+
+    # Matching engine
+
+    def _round(self, price: float) -> float:
+        return round(round(price / self.tick_size) * self.tick_size, 2)
+
+    def submit_order(
+        self,
+        ticker: str,
+        type: str,
+        quantity: int,
+        action: str,
+        price: Optional[float] = None,
+        trader_id: str = TRADER_ID,
+    ) -> dict:
+        """Matches an order against the book and rests any LIMIT remainder."""
+        order = {
+            "order_id": self._next_order_id,
+            "period": self.period,
+            "tick": self.tick,
+            "trader_id": trader_id,
+            "ticker": ticker,
+            "type": type,
+            "quantity": quantity,
+            "action": action,
+            "price": None if type == "MARKET" else self._round(price),
+            "quantity_filled": 0,
+            "vwap": None,
+            "status": "OPEN",
+        }
+        self._next_order_id += 1
+        if trader_id == TRADER_ID:
+            self.orders[order["order_id"]] = order
+
+        book = self.books[ticker]
+        opposite = "SELL" if action == "BUY" else "BUY"
+        prices, levels = book.side(opposite)
+        while order["quantity_filled"] < quantity and prices:
+            best = prices[-1] if opposite == "BUY" else prices[0]
+            if type == "LIMIT" and (
+                (action == "BUY" and best > order["price"])
+                or (action == "SELL" and best < order["price"])
+            ):
+                break
+            level = levels[best]
+            resting = level[0]
+            traded = min(
+                quantity - order["quantity_filled"],
+                resting["quantity"] - resting["quantity_filled"],
+            )
+            self._fill(resting, traded, best)
+            self._fill(order, traded, best)
+            self._print(ticker, best, traded)
+            if resting["quantity_filled"] == resting["quantity"]:
+                book.remove(resting)
+
+        if order["quantity_filled"] == quantity or type == "MARKET":
+            # Unfilled MARKET remainder is dropped, as the exchange does
+            order["status"] = "TRANSACTED"
+        else:
+            book.add(order)
+        return order
+
+    def _fill(self, order: dict, quantity: int, price: float):
+        filled = order["quantity_filled"]
+        previous = (order["vwap"] or 0.0) * filled
+        order["quantity_filled"] = filled + quantity
+        order["vwap"] = round((previous + quantity * price) / order["quantity_filled"], 4)
+        if order["quantity_filled"] == order["quantity"]:
+            order["status"] = "TRANSACTED"
+        if order["trader_id"] == TRADER_ID:
+            signed = quantity if order["action"] == "BUY" else -quantity
+            self._apply_position(order["ticker"], signed, price)
+
+    def _apply_position(self, ticker: str, signed_quantity: int, price: float):
+        position = self.positions[ticker]
+        if position == 0 or (position > 0) == (signed_quantity > 0):
+            self.cost[ticker] += signed_quantity * price
+        else:
+            closed = min(abs(signed_quantity), abs(position))
+            average = self.cost[ticker] / position
+            direction = 1 if position > 0 else -1
+            self.realized[ticker] += closed * (price - average) * direction
+            self.cost[ticker] -= closed * average * direction
+            remainder = abs(signed_quantity) - closed
+            if remainder:
+                self.cost[ticker] = remainder * price * (1 if signed_quantity > 0 else -1)
+        self.positions[ticker] = position + signed_quantity
+
+    def _print(self, ticker: str, price: float, quantity: int):
+        self.time_and_sales[ticker].append(
+            {
+                "id": self._next_print_id,
+                "period": self.period,
+                "tick": self.tick,
+                "price": price,
+                "quantity": quantity,
+            }
+        )
+        self._next_print_id += 1
+        self.last[ticker] = price
+        self.volume[ticker] += quantity
+
+    def cancel_order(self, order_id: int) -> bool:
+        order = self.orders.get(order_id)
+        if order is None or order["status"] != "OPEN":
+            return False
+        self.books[order["ticker"]].remove(order)
+        order["status"] = "CANCELLED"
+        return True
+
+    # Session simulation
+
+    def _refresh_liquidity(self, ticker: str):
+        """Random-walks the fair value and tops both sides back up to full depth."""
+        fair = self.fair_value[ticker] * (1 + self.random.gauss(0, 0.001))
+        self.fair_value[ticker] = fair
+        book = self.books[ticker]
+        for action, prices, sign in (
+            ("BUY", book.bid_prices, -1),
+            ("SELL", book.ask_prices, 1),
+        ):
+            level = 1
+            while len(prices) < self.depth:
+                price = self._round(fair + sign * level * self.tick_size * 2)
+                level += 1
+                if price in book.side(action)[1]:
+                    continue
+                self.submit_order(
+                    ticker,
+                    "LIMIT",
+                    self.random.randrange(500, 5001, 100),
+                    action,
+                    price,
+                    MARKET_MAKER_ID,
+                )
+
+    def _noise_trade(self, ticker: str):
+        self.submit_order(
+            ticker,
+            "MARKET",
+            self.random.randrange(100, 3001, 100),
+            self.random.choice(("BUY", "SELL")),
+            trader_id=MARKET_MAKER_ID,
+        )
+
+    def _generate_tender(self, ticker: str):
+        action = self.random.choice(("BUY", "SELL"))
+        edge = self.random.uniform(-0.05, 0.3)
+        fair = self.fair_value[ticker]
+        tender = {
+            "tender_id": self._next_tender_id,
+            "period": self.period,
+            "tick": self.tick,
+            "expires": self.tick + self.tender_expiry,
+            "caption": f"Institution wants to {'SELL' if action == 'BUY' else 'BUY'} {ticker}",
+            "quantity": self.random.randrange(5000, 50001, 1000),
+            "action": action,
+            "is_fixed_bid": True,
+            "price": self._round(fair - edge if action == "BUY" else fair + edge),
+            "ticker": ticker,
+        }
+        self.tenders[tender["tender_id"]] = tender
+        self._next_tender_id += 1
+
+    def advance_tick(self):
+        """Advances the case by one tick and runs the market for it."""
+        if self.status != "ACTIVE":
+            return
+        if self.tick >= self.ticks_per_period:
+            if self.period >= self.total_periods:
+                self.status = "STOPPED"
+                return
+            self.period += 1
+            self.tick = 0
+        self.tick += 1
+        for tender_id in [t for t, v in self.tenders.items() if v["expires"] < self.tick]:
+            del self.tenders[tender_id]
+        for ticker in self.tickers:
+            open_price = self.last[ticker]
+            high = low = open_price
+            for _ in range(self.random.randint(1, 4)):
+                self._noise_trade(ticker)
+                high, low = max(high, self.last[ticker]), min(low, self.last[ticker])
+            self._refresh_liquidity(ticker)
+            self.ohlc[ticker].append(
+                {
+                    "tick": self.tick,
+                    "open": open_price,
+                    "high": high,
+                    "low": low,
+                    "close": self.last[ticker],
+                }
+            )
+            if self.tender_every and self.tick % self.tender_every == 0:
+                self._generate_tender(ticker)
+
+    async def run_clock(self, tick_interval: float = 1.0):
+        """Advances ticks on the wall clock until the case stops."""
+        while self.status == "ACTIVE":
+            await asyncio.sleep(tick_interval)
+            self.advance_tick()
+
+    def accept_tender(self, tender_id: int) -> bool:
+        tender = self.tenders.pop(tender_id, None)
+        if tender is None:
+            return False
+        signed = tender["quantity"] if tender["action"] == "BUY" else -tender["quantity"]
+        self._apply_position(tender["ticker"], signed, tender["price"])
+        return True
+
+    # Endpoint payloads
+
+    def case(self) -> dict:
+        return {
+            "name": "MOCK",
+            "period": self.period,
+            "tick": self.tick,
+            "ticks_per_period": self.ticks_per_period,
+            "total_periods": self.total_periods,
+            "status": self.status,
+            "is_enforce_trading_limits": True,
+        }
+
+    def security(self, ticker: str) -> dict:
+        book = self.books[ticker]
+        bid, ask = book.best_bid(), book.best_ask()
+        position = self.positions[ticker]
+        unrealized = position * self.last[ticker] - self.cost[ticker]
+        return {
+            "ticker": ticker,
+            "type": "STOCK",
+            "size": 1,
+            "position": position,
+            "vwap": round(self.cost[ticker] / position, 4) if position else 0,
+            "nlv": position * self.last[ticker],
+            "last": self.last[ticker],
+            "bid": bid or 0,
+            "bid_size": sum(o["quantity"] - o["quantity_filled"] for o in book.bids[bid]) if bid else 0,
+            "ask": ask or 0,
+            "ask_size": sum(o["quantity"] - o["quantity_filled"] for o in book.asks[ask]) if ask else 0,
+            "volume": self.volume[ticker],
+            "unrealized": round(unrealized, 2),
+            "realized": round(self.realized[ticker], 2),
+            "currency": "CAD",
+            "is_tradeable": True,
+        }
+
+    def limits(self) -> list:
+        net = sum(self.positions.values())
+        gross = sum(abs(p) for p in self.positions.values())
+        return [
+            {
+                "name": "LIMIT-STOCK",
+                "gross": gross,
+                "net": net,
+                "gross_limit": self.gross_limit,
+                "net_limit": self.net_limit,
+                "gross_fine": 0,
+                "net_fine": 0,
+            }
+        ]
+
+    def handle(self, method: str, path: str, params: dict):
+        """
+        Routes one API request.
+
+        Args:
+            method: HTTP method.
+            path: Request path, e.g. /v1/orders/12.
+            params: Query parameters as strings.
+
+        Returns:
+            A (status code, JSON payload) tuple.
+        """
+        parts = path.strip("/").split("/")
+        if not parts or parts[0] != "v1" or len(parts) < 2:
+            return _error(404, "NOT_FOUND", path)
+        resource, rest = parts[1], parts[2:]
+        try:
+            if resource == "case" and method == "GET":
+                return 200, self.case()
+            if resource == "trader" and method == "GET":
+                return 200, {"trader_id": TRADER_ID, "first_name": "Mock", "last_name": "Trader", "nlv": sum(self.security(t)["nlv"] for t in self.tickers)}
+            if resource == "limits" and method == "GET":
+                return 200, self.limits()
+            if resource == "news" and method == "GET":
+                return 200, []
+            if resource == "securities":
+                return self._handle_securities(rest, params)
+            if resource == "orders":
+                return self._handle_orders(method, rest, params)
+            if resource == "tenders":
+                return self._handle_tenders(method, rest)
+            if resource == "leases" and method == "GET":
+                return (200, []) if not rest else _error(404, "NOT_FOUND", "Lease not found")
+        except (KeyError, ValueError) as e:
+            return _error(400, "BAD_REQUEST", f"Invalid request: {e}")
+        return _error(404, "NOT_FOUND", path)
+
+    def _handle_securities(self, rest: list, params: dict):
+        ticker = params.get("ticker")
+        if ticker is not None and ticker not in self.tickers:
+            return _error(400, "BAD_REQUEST", f"Unknown ticker {ticker}")
+        if not rest:
+            tickers = [ticker] if ticker else list(self.tickers)
+            return 200, [self.security(t) for t in tickers]
+        limit = int(params.get("limit", 20))
+        if rest == ["book"]:
+            book = self.books[ticker]
+            return 200, {
+                "bids": [dict(o) for o in book.levels("BUY", limit)],
+                "asks": [dict(o) for o in book.levels("SELL", limit)],
+            }
+        if rest == ["tas"]:
+            prints = self.time_and_sales[ticker]
+            period = int(params.get("period", self.period))
+            prints = prints[
+                bisect.bisect_left(prints, period, key=lambda p: p["period"]) : bisect.bisect_right(
+                    prints, period, key=lambda p: p["period"]
+                )
+            ]
+            # Newest prints after the cursor first, as the RIT API returns them
+            start = bisect.bisect_right(prints, int(params.get("after", 0)), key=lambda p: p["id"])
+            return 200, prints[start:][::-1][:limit]
+        if rest == ["history"]:
+            return 200, self.ohlc[ticker][::-1][:limit]
+        return _error(404, "NOT_FOUND", "/".join(rest))
+
+    def _handle_orders(self, method: str, rest: list, params: dict):
+        if not rest and method == "GET":
+            status = params.get("status")
+            return 200, [
+                dict(o) for o in self.orders.values() if status is None or o["status"] == status
+            ]
+        if not rest and method == "POST":
+            wait = self._throttle_wait()
+            if wait:
+                return 429, {
+                    "code": "TOO_MANY_REQUESTS",
+                    "message": "Order rate limit exceeded",
+                    "wait": wait,
+                }
+            if int(params.get("dry_run", 0)):
+                return _error(400, "BAD_REQUEST", "dry_run is not supported by the mock exchange")
+            if self.status != "ACTIVE":
+                return _error(400, "CASE_INACTIVE", "Case is not active")
+            order_type, action = params["type"], params["action"]
+            quantity = int(float(params["quantity"]))
+            if order_type not in ("MARKET", "LIMIT") or action not in ("BUY", "SELL") or quantity <= 0:
+                return _error(400, "BAD_REQUEST", "Invalid order parameters")
+            price = float(params["price"]) if order_type == "LIMIT" else None
+            if params["ticker"] not in self.tickers:
+                return _error(400, "BAD_REQUEST", f"Unknown ticker {params['ticker']}")
+            return 200, dict(self.submit_order(params["ticker"], order_type, quantity, action, price))
+        order_id = int(rest[0])
+        if order_id not in self.orders:
+            return _error(404, "NOT_FOUND", f"Order {order_id} not found")
+        if method == "GET":
+            return 200, dict(self.orders[order_id])
+        if method == "DELETE":
+            return 200, {"success": self.cancel_order(order_id)}
+        return _error(404, "NOT_FOUND", "orders")
+
+    def _throttle_wait(self) -> float:
+        """Returns how long an order must wait under order_rate_limit, 0 if it is accepted."""
+        if self.order_rate_limit is None:
+            return 0.0
+        now = time.monotonic()
+        while self._order_times and now - self._order_times[0] >= 1.0:
+            self._order_times.popleft()
+        if len(self._order_times) >= self.order_rate_limit:
+            return round(1.0 - (now - self._order_times[0]), 3) or 0.001
+        self._order_times.append(now)
+        return 0.0
+
+    def _handle_tenders(self, method: str, rest: list):
+        if not rest and method == "GET":
+            return 200, [dict(t) for t in self.tenders.values()]
+        tender_id = int(rest[0])
+        if tender_id not in self.tenders:
+            return _error(404, "NOT_FOUND", f"Tender {tender_id} not found")
+        if method == "POST":
+            return 200, {"success": self.accept_tender(tender_id)}
+        if method == "DELETE":
+            return 200, {"success": self.tenders.pop(tender_id, None) is not None}
+        return _error(404, "NOT_FOUND", "tenders")
+
+    def respond(self, request: httpx.Request) -> httpx.Response:
+        """Serves one httpx request, for transports that also inject failures or delays."""
+        status, payload = self.handle(request.method, request.url.path, dict(request.url.params))
+        return httpx.Response(status, json=payload)
+
+    def transport(self) -> httpx.MockTransport:
+        """Returns an httpx transport that serves requests from this exchange in-process."""
+        return httpx.MockTransport(self.respond)
+
+
+def _error(status: int, code: str, message: str):
+    return status, {"code": code, "message": message}
+
+
+async def load_test(exchange: MockExchange, orders: int = 5000, ticker: Optional[str] = None):
+    """Posts orders through apis.py over the in-process transport and reports throughput."""
+    import apis
+    from client import get_client, close_client
+    from models import OrderRequest
+
+    ticker = ticker or next(iter(exchange.tickers))
+    rng = random.Random(1)
+    start = time.perf_counter()
+    for i in range(orders):
+        exchange.submit_order(
+            ticker,
+            "LIMIT",
+            rng.randrange(100, 1001, 100),
+            rng.choice(("BUY", "SELL")),
+            exchange.fair_value[ticker] + rng.uniform(-0.1, 0.1),
+        )
+        if i % 100 == 0:
+            exchange.advance_tick()
+    elapsed = time.perf_counter() - start
+    print(f"matching engine: {orders} orders in {elapsed:.3f}s -> {orders / elapsed:.0f} orders/s")
+
+    auth = {"username": "load", "password": "test", "server": "mock", "port": 0}
+    get_client(auth, transport=exchange.transport())
+    start = time.perf_counter()
+    for i in range(orders):
+        action = rng.choice(("BUY", "SELL"))
+        mid = exchange.fair_value[ticker]
+        await apis.post_order(
+            auth,
+            OrderRequest(
+                ticker=ticker,
+                type="LIMIT",
+                quantity=rng.randrange(100, 1001, 100),
+                action=action,
+                price=round(mid + rng.uniform(-0.1, 0.1), 2),
+            ),
+        )
+        if i % 100 == 0:
+            exchange.advance_tick()
+    elapsed = time.perf_counter() - start
+    await close_client(auth)
+    print(f"apis.post_order: {orders} orders in {elapsed:.3f}s -> {orders / elapsed:.0f} orders/s")
+
+
+async def serve(host: str = "127.0.0.1", port: int = 16621, tick_interval: float = 1.0, seed: int = 0):
+    """Serves a mock exchange on localhost and advances it on the wall clock."""
+    exchange = MockExchange(seed=seed)
+    server, port = await start_stub_server(exchange.handle, host, port)
+    print(f"Mock exchange listening on http://{host}:{port}")
+    async with server:
+        await exchange.run_clock(tick_interval)
+    print("Case stopped")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        asyncio.run(load_test(MockExchange(), int(sys.argv[2]) if len(sys.argv) > 2 else 5000))
+    else:
+        asyncio.run(serve(port=int(sys.argv[1]) if len(sys.argv) > 1 else 16621))
@@ -17,6 +17,33 @@ class AuthConfig(BaseModel):
         return getattr(self, item)
 
 
+class ClientConfig(BaseModel):
+    """
+    Represents connection pool and timeout settings for the API client.
+    """
+
+    max_connections: int = Field(20, title="Max Open Connections", gt=0)
+    max_keepalive_connections: int = Field(
+        10, title="Max Idle Keep-Alive Connections", ge=0
+    )
+    keepalive_expiry: float = Field(30.0, title="Idle Connection Expiry (seconds)")
+    timeout: float = Field(5.0, title="Request Timeout (seconds)", gt=0)
+    connect_timeout: float = Field(2.0, title="Connect Timeout (seconds)", gt=0)
+    # Requests per second by endpoint class, None paces only once throttled
+    order_rate: Optional[float] = Field(None, title="Order Rate Limit (per second)")
+    query_rate: Optional[float] = Field(None, title="Query Rate Limit (per second)")
+    cancel_rate: Optional[float] = Field(None, title="Cancel Rate Limit (per second)")
+    rate_burst: int = Field(5, title="Requests Allowed in a Burst", gt=0)
+    throttled_rate: float = Field(
+        10.0, title="Rate After the First 429 (per second)", gt=0
+    )
+    max_retries: int = Field(5, title="Retries of a Throttled or Failed Request", ge=0)
+    retry_deadline: float = Field(
+        3.0, title="Give Up Retrying After (seconds)", gt=0
+    )
+    retry_backoff: float = Field(0.05, title="Base Retry Backoff (seconds)", gt=0)
+
+
 class OrderRequest(BaseModel):
     """
     Represents an order request to be sent to the API.
@@ -64,6 +91,21 @@ class OrderResponse(BaseModel):
     )
 
 
+class ParentOrderFill(BaseModel):
+    """
+    Aggregated fills of a parent order that was sent as child orders.
+    """
+
+    ticker: str = Field(..., title="Ticker Symbol")
+    action: Literal["BUY", "SELL"] = Field(..., title="Order Action")
+    quantity: int = Field(..., title="Parent Order Quantity")
+    quantity_filled: float = Field(0, title="Quantity Filled Across Children")
+    vwap: Optional[float] = Field(None, title="Volume-Weighted Avg Fill Price")
+    orders: list[OrderResponse] = Field(
+        default_factory=list, title="Child Order Responses"
+    )
+
+
 class OHLCParams(BaseModel):
     """
     Represents parameters for retrieving OHLC history for a security.
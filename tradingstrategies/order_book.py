@@ -0,0 +1,187 @@
+import asyncio, bisect
+from array import array
+from typing import Optional
+import apis
+from models import AuthConfig
+
+
+class OrderBook:
+    """
+    Aggregated price levels for one ticker.
+
+    Prices are kept in ascending sorted arrays (best bid at the end, best ask
+    at the start) and quantities in a dict keyed by price, so the best level is
+    O(1), locating a price is O(log n) and a poll only touches the levels that
+    changed since the previous one.
+    """
+
+    def __init__(self, ticker: str):
+        self.ticker = ticker
+        self.bid_prices = array("d")
+        self.ask_prices = array("d")
+        self.bid_quantities = {}  # price -> open quantity
+        self.ask_quantities = {}
+        self.sequence = 0  # number of polls applied
+
+    @staticmethod
+    def _aggregate(entries) -> dict:
+        levels = {}
+        for entry in entries:
+            quantity = entry["quantity"] - entry.get("quantity_filled", 0)
+            if quantity > 0:
+                levels[entry["price"]] = levels.get(entry["price"], 0) + quantity
+        return levels
+
+    @staticmethod
+    def _apply_side(prices: array, quantities: dict, levels: dict) -> int:
+        changed = 0
+        for price in [p for p in quantities if p not in levels]:
+            del quantities[price]
+            del prices[bisect.bisect_left(prices, price)]
+            changed += 1
+        for price, quantity in levels.items():
+            previous = quantities.get(price)
+            if previous is None:
+                prices.insert(bisect.bisect_left(prices, price), price)
+            elif previous == quantity:
+                continue
+            quantities[price] = quantity
+            changed += 1
+        return changed
+
+    def apply(self, order_book: dict) -> int:
+        """
+        Applies a /v1/securities/book response as a diff against the current levels.
+
+        Args:
+            order_book: JSON response with "bids" and "asks" order lists.
+
+        Returns:
+            Number of price levels that were added, removed or resized.
+        """
+        changed = self._apply_side(
+            self.bid_prices, self.bid_quantities, self._aggregate(order_book["bids"])
+        )
+        changed += self._apply_side(
+            self.ask_prices, self.ask_quantities, self._aggregate(order_book["asks"])
+        )
+        self.sequence += 1
+        return changed
+
+    def best_bid(self):
+        """Returns (price, quantity) of the best bid or None."""
+        if not self.bid_prices:
+            return None
+        price = self.bid_prices[-1]
+        return price, self.bid_quantities[price]
+
+    def best_ask(self):
+        """Returns (price, quantity) of the best ask or None."""
+        if not self.ask_prices:
+            return None
+        price = self.ask_prices[0]
+        return price, self.ask_quantities[price]
+
+    def bid_level(self, level: int):
+        """Returns (price, quantity) of the n-th best bid, 0 being the best."""
+        price = self.bid_prices[-1 - level]
+        return price, self.bid_quantities[price]
+
+    def ask_level(self, level: int):
+        """Returns (price, quantity) of the n-th best ask, 0 being the best."""
+        price = self.ask_prices[level]
+        return price, self.ask_quantities[price]
+
+    def bid_level_of(self, price: float) -> int:
+        """Returns how many bid levels are strictly better than price."""
+        return len(self.bid_prices) - bisect.bisect_right(self.bid_prices, price)
+
+    def ask_level_of(self, price: float) -> int:
+        """Returns how many ask levels are strictly better than price."""
+        return bisect.bisect_left(self.ask_prices, price)
+
+    def bids(self, depth: Optional[int] = None) -> list:
+        """Returns up to depth (price, quantity) bid levels, best first."""
+        prices = self.bid_prices[::-1] if depth is None else self.bid_prices[: -depth - 1 : -1]
+        return [(price, self.bid_quantities[price]) for price in prices]
+
+    def asks(self, depth: Optional[int] = None) -> list:
+        """Returns up to depth (price, quantity) ask levels, best first."""
+        prices = self.ask_prices if depth is None else self.ask_prices[:depth]
+        return [(price, self.ask_quantities[price]) for price in prices]
+
+
+class OrderBookCache:
+    """
+    Shared order books kept up to date by a single background poller.
+
+    Strategies call book(ticker) to read the latest snapshot instead of issuing
+    their own /v1/securities/book request. The first read of a ticker fetches
+    it once and subscribes it to the poller.
+    """
+
+    def __init__(self, auth: AuthConfig, depth: int = 20, interval: float = 0.2):
+        self.auth = auth
+        self.depth = depth
+        self.interval = interval
+        self.books = {}  # ticker -> OrderBook
+        self._listeners = []
+        self._updated = asyncio.Event()
+        self._task = None
+
+    async def refresh(self, ticker: str) -> Optional[OrderBook]:
+        """Fetches one ticker and applies it to its cached book."""
+        order_book = await apis.query_security_order_book(self.auth, ticker, self.depth)
+        if order_book is None:
+            return self.books.get(ticker)
+        book = self.books.get(ticker)
+        if book is None:
+            book = self.books[ticker] = OrderBook(ticker)
+        book.apply(order_book)
+        for callback in self._listeners:
+            callback(book)
+        return book
+
+    def on_update(self, callback):
+        """Registers callback(book), called with every book applied."""
+        self._listeners.append(callback)
+
+    async def book(self, ticker: str) -> Optional[OrderBook]:
+        """Returns the cached book for ticker, fetching and subscribing it on first use."""
+        book = self.books.get(ticker)
+        if book is None:
+            book = await self.refresh(ticker)
+        return book
+
+    async def wait_for_update(self):
+        """Waits until the next poll has been applied."""
+        self._updated.clear()
+        await self._updated.wait()
+
+    async def _poll(self):
+        while True:
+            if self.books:
+                results = await asyncio.gather(
+                    *(self.refresh(ticker) for ticker in list(self.books)),
+                    return_exceptions=True,
+                )
+                for result in results:
+                    if isinstance(result, Exception):
+                        print(f"Error refreshing order book: {result}")
+                self._updated.set()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Starts the background poller on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._poll())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
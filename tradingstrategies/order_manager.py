@@ -0,0 +1,159 @@
+import asyncio
+from dataclasses import replace
+from typing import Optional
+import apis
+from models import AuthConfig, OrderRequest, OrderStatus
+from records import OrderRecord, from_dict
+
+
+class OrderManager:
+    """
+    In-memory index of our orders by order_id, ticker and status.
+
+    Every order response we post is recorded, and a reconcile against
+    /v1/orders?status=OPEN only looks up the orders that left the open set,
+    so open orders and open quantity per ticker are answered locally.
+    """
+
+    def __init__(
+        self, auth: AuthConfig, max_concurrency: int = 10, interval: float = 0.5
+    ):
+        self.auth = auth
+        self.max_concurrency = max_concurrency
+        self.interval = interval
+        self.orders = {}  # order_id -> OrderRecord
+        self.by_ticker = {}  # ticker -> set of order IDs
+        self.by_status = {status.value: set() for status in OrderStatus}
+        self.open_quantities = {}  # (ticker, action) -> unfilled quantity of OPEN orders
+        self._reconciling = None
+        self._task = None
+
+    def _add_open(self, order: OrderRecord, sign: int):
+        key = (order.ticker, order.action)
+        self.open_quantities[key] = self.open_quantities.get(key, 0) + sign * (
+            order.quantity - order.quantity_filled
+        )
+
+    def record(self, order) -> Optional[OrderRecord]:
+        """Adds or updates an order from an API response, returns the indexed OrderRecord."""
+        if not order:
+            return None
+        if not isinstance(order, OrderRecord):
+            order = from_dict(OrderRecord, order)
+        previous = self.orders.get(order.order_id)
+        if previous is not None:
+            self.by_status[previous.status].discard(order.order_id)
+            if previous.status == "OPEN":
+                self._add_open(previous, -1)
+        self.orders[order.order_id] = order
+        self.by_ticker.setdefault(order.ticker, set()).add(order.order_id)
+        self.by_status[order.status].add(order.order_id)
+        if order.status == "OPEN":
+            self._add_open(order, 1)
+        return order
+
+    def _mark_cancelled(self, order_id: int):
+        order = self.orders.get(order_id)
+        if order is not None and order.status == "OPEN":
+            self.record(replace(order, status="CANCELLED"))
+
+    def open_orders(self, ticker: Optional[str] = None) -> list:
+        open_ids = self.by_status["OPEN"]
+        if ticker is not None:
+            open_ids = open_ids & self.by_ticker.get(ticker, set())
+        return [self.orders[order_id] for order_id in open_ids]
+
+    def open_quantity(self, ticker: str, action: Optional[str] = None) -> float:
+        """Unfilled quantity of our OPEN orders, for one side or both."""
+        if action is not None:
+            return self.open_quantities.get((ticker, action), 0)
+        return self.open_quantities.get((ticker, "BUY"), 0) + self.open_quantities.get(
+            (ticker, "SELL"), 0
+        )
+
+    async def post(self, order_details: OrderRequest) -> Optional[OrderRecord]:
+        """Places an order and records the response."""
+        return self.record(await apis.post_order(self.auth, order_details))
+
+    async def cancel(self, order_id: int) -> bool:
+        response = await apis.cancel_order(self.auth, order_id)
+        if response and response.get("success"):
+            # Filled quantity is corrected by the next reconcile
+            self._mark_cancelled(order_id)
+            return True
+        return False
+
+    async def cancel_all(self, ticker: Optional[str] = None) -> int:
+        """
+        Cancels every open order we know of, at most max_concurrency at a time.
+
+        Returns:
+            The number of orders cancelled.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def cancel(order_id):
+            async with semaphore:
+                return await self.cancel(order_id)
+
+        results = await asyncio.gather(
+            *(cancel(order.order_id) for order in self.open_orders(ticker)),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"Error cancelling order: {result}")
+        return sum(result is True for result in results)
+
+    async def _reconcile(self):
+        open_orders = await apis.query_orders(self.auth, OrderStatus.OPEN)
+        if open_orders is None:
+            return
+        open_ids = set()
+        for order in open_orders:
+            open_ids.add(order["order_id"])
+            self.record(order)
+
+        # Only orders that left the open set need a lookup
+        closed_ids = self.by_status["OPEN"] - open_ids
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def lookup(order_id):
+            async with semaphore:
+                self.record(await apis.query_order_details(self.auth, order_id))
+
+        results = await asyncio.gather(
+            *(lookup(order_id) for order_id in closed_ids), return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"Error querying order details: {result}")
+
+    async def reconcile(self):
+        """Syncs the index with the server, concurrent callers share one pass."""
+        if self._reconciling is None or self._reconciling.done():
+            self._reconciling = asyncio.ensure_future(self._reconcile())
+        await asyncio.shield(self._reconciling)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.reconcile()
+            except Exception as e:
+                print(f"Error reconciling orders: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Starts the background reconcile on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
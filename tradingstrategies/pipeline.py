@@ -0,0 +1,353 @@
+import asyncio, math, multiprocessing, os, signal, struct, sys, threading, time
+import multiprocessing.connection
+from typing import NamedTuple, Optional
+import apis
+from client import close_client
+from models import AuthConfig, OrderRequest
+from securities import SecuritiesSnapshot
+from shm import SeqlockSlots
+from tick_clock import TickClock
+
+# period, tick, position, last, bid, bid_size, ask, ask_size, volume, vwap
+QUOTE = struct.Struct("<qq8d")
+
+
+class Quote(NamedTuple):
+    ticker: str
+    sequence: int  # seqlock sequence of the slot, grows by 2 per snapshot
+    period: int
+    tick: int
+    position: float
+    last: float
+    bid: float
+    bid_size: float
+    ask: float
+    ask_size: float
+    volume: float
+    vwap: float  # nan when the server reports none
+
+
+class OrderIntent(NamedTuple):
+    """An order the decision process wants sent, plain values only."""
+
+    intent_id: int
+    ticker: str
+    type: str
+    quantity: int
+    action: str
+    price: Optional[float] = None
+
+
+class SharedMarket:
+    """
+    Latest quote of every ticker in shared memory, one seqlock slot per ticker.
+
+    The market data process publishes each /v1/securities snapshot, readers
+    in other processes take consistent copies without any request. Books
+    are shared by shared_books.py, time and sales prints are not shared.
+    """
+
+    def __init__(self, slots: SeqlockSlots, tickers: list):
+        self.slots = slots
+        self.tickers = list(tickers)
+        self.index = {ticker: slot for slot, ticker in enumerate(self.tickers)}
+
+    @classmethod
+    def create(cls, tickers: list, name: Optional[str] = None):
+        return cls(SeqlockSlots.create(len(tickers), QUOTE.size, name), tickers)
+
+    @classmethod
+    def attach(cls, name: str, tickers: list):
+        return cls(SeqlockSlots.attach(name), tickers)
+
+    @property
+    def name(self) -> str:
+        return self.slots.name
+
+    def publish(self, securities: dict, period: int, tick: int):
+        """Writes a SecuritiesSnapshot update, tickers outside the layout are skipped."""
+        for ticker, security in securities.items():
+            slot = self.index.get(ticker)
+            if slot is None:
+                continue
+            self.slots.write(
+                slot,
+                QUOTE,
+                period,
+                tick,
+                security.position,
+                security.last,
+                security.bid,
+                security.bid_size,
+                security.ask,
+                security.ask_size,
+                security.volume,
+                math.nan if security.vwap is None else security.vwap,
+            )
+
+    def versions(self) -> tuple:
+        """Sequence of every slot, cheap to compare for changes."""
+        return tuple(self.slots.sequence(slot) for slot in range(len(self.tickers)))
+
+    def quote(self, ticker: str) -> Quote:
+        sequence, values = self.slots.read(self.index[ticker], QUOTE)
+        return Quote(ticker, sequence, *values)
+
+    def snapshot(self) -> dict:
+        return {ticker: self.quote(ticker) for ticker in self.tickers}
+
+    def close(self):
+        self.slots.close()
+
+
+class FlattenDecision:
+    """
+    Reference decision: flattens every position from flatten_tick on.
+
+    Sends MARKET slices of at most slice_size, one per ticker at a time. After
+    a report it waits for two more snapshots of that ticker, so the position
+    it acts on includes the slice.
+    """
+
+    def __init__(self, flatten_tick: int = 0, slice_size: int = 10000):
+        self.flatten_tick = flatten_tick
+        self.slice_size = slice_size
+        self.next_id = 1
+        self.in_flight = set()  # tickers with a slice awaiting its report
+        self.settled_after = {}  # ticker -> quote sequence the next decision must exceed
+        self.last_sequence = {}
+
+    def on_market(self, quotes: dict) -> list:
+        intents = []
+        for ticker, quote in quotes.items():
+            self.last_sequence[ticker] = quote.sequence
+            if (
+                quote.tick < self.flatten_tick
+                or quote.position == 0
+                or ticker in self.in_flight
+                or quote.sequence <= self.settled_after.get(ticker, 0)
+            ):
+                continue
+            intents.append(
+                OrderIntent(
+                    self.next_id,
+                    ticker,
+                    "MARKET",
+                    int(min(abs(quote.position), self.slice_size)),
+                    "SELL" if quote.position > 0 else "BUY",
+                )
+            )
+            self.next_id += 1
+            self.in_flight.add(ticker)
+        return intents
+
+    def on_report(self, intent: OrderIntent, order: Optional[dict], error: Optional[str]) -> list:
+        if error:
+            print(f"Order {intent} failed: {error}")
+        self.in_flight.discard(intent.ticker)
+        self.settled_after[intent.ticker] = self.last_sequence.get(intent.ticker, 0) + 2
+        return []
+
+
+def _ignore_interrupt():
+    # Ctrl+C reaches the whole process group, the parent stops the workers through the stop event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _market_data_main(auth: AuthConfig, market_name: str, tickers: list, interval: float, stop):
+    """Market data process: polls case and securities, publishes quotes to shared memory."""
+    _ignore_interrupt()
+    market = SharedMarket.attach(market_name, tickers)
+
+    async def main():
+        clock = TickClock(auth, interval)
+        securities = SecuritiesSnapshot(auth, interval)
+        securities.on_update(
+            lambda snapshot: market.publish(snapshot, clock.period or 0, clock.tick or 0)
+        )
+        clock.start()
+        securities.start()
+        try:
+            while not stop.is_set():
+                if clock.status == "STOPPED":
+                    print("Case stopped, stopping the pipeline")
+                    stop.set()
+                    break
+                await asyncio.sleep(interval)
+        finally:
+            await securities.stop()
+            await clock.stop()
+            await close_client(auth)
+
+    try:
+        asyncio.run(main())
+    finally:
+        market.close()
+
+
+def _decision_main(market_name: str, tickers: list, decision, intents, reports, stop, poll: float):
+    """Decision process: reacts to new snapshots and reports, emits OrderIntents."""
+    _ignore_interrupt()
+    market = SharedMarket.attach(market_name, tickers)
+    versions = None
+    try:
+        while not stop.is_set():
+            busy = False
+            while not reports.empty():
+                for intent in decision.on_report(*reports.get()) or ():
+                    intents.put(intent)
+                busy = True
+            current = market.versions()
+            if current != versions:
+                versions = current
+                for intent in decision.on_market(market.snapshot()) or ():
+                    intents.put(intent)
+                busy = True
+            if not busy:
+                time.sleep(poll)
+    finally:
+        # Tells the execution process to finish the orders in flight and exit
+        intents.put(None)
+        market.close()
+
+
+def _execution_main(auth: AuthConfig, intents, reports, max_in_flight: int):
+    """Execution process: owns the HTTP pool, sends every intent and reports the response."""
+    _ignore_interrupt()
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        pending = asyncio.Queue()
+
+        def pump():
+            # Blocking queue reads stay off the event loop
+            while True:
+                intent = intents.get()
+                loop.call_soon_threadsafe(pending.put_nowait, intent)
+                if intent is None:
+                    return
+
+        threading.Thread(target=pump, name="intents", daemon=True).start()
+        semaphore = asyncio.Semaphore(max_in_flight)
+        tasks = set()
+
+        async def send(intent: OrderIntent):
+            async with semaphore:
+                try:
+                    # Intents are already checked values, skip validation on the order path
+                    order = await apis.post_order(
+                        auth,
+                        OrderRequest.model_construct(
+                            ticker=intent.ticker,
+                            type=intent.type,
+                            quantity=intent.quantity,
+                            action=intent.action,
+                            price=intent.price,
+                            dry_run=0,
+                        ),
+                    )
+                    reports.put((intent, order, None))
+                except Exception as e:
+                    reports.put((intent, None, str(e)))
+
+        while (intent := await pending.get()) is not None:
+            task = asyncio.create_task(send(intent))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+        await close_client(auth)
+
+    asyncio.run(main())
+
+
+def _supervise(processes: list, stop, intents):
+    """Joins the processes, stopping the others as soon as one exits with an error."""
+    running = list(processes)
+    while running:
+        ready = multiprocessing.connection.wait([process.sentinel for process in running])
+        for process in [process for process in running if process.sentinel in ready]:
+            process.join()
+            running.remove(process)
+            if process.exitcode:
+                print(f"{process.name} process exited with {process.exitcode}, stopping the pipeline")
+                # Market data and decision watch the event, execution waits for the sentinel
+                stop.set()
+                intents.put(None)
+
+
+async def _tickers(auth: AuthConfig) -> list:
+    try:
+        return [security["ticker"] for security in await apis.query_securities(auth)]
+    finally:
+        await close_client(auth)
+
+
+def run_pipeline(
+    auth: AuthConfig,
+    decision,
+    interval: float = 0.1,
+    max_in_flight: int = 4,
+    poll: float = 0.001,
+):
+    """
+    Runs market data, decision and execution in three processes until the case stops.
+
+    The market data process publishes quotes to shared memory, the decision
+    process reads them without any request and sends OrderIntents over a
+    queue to the execution process, the only one posting orders. Rendering,
+    validation and printing in one process never delay another's work.
+
+    Args:
+        decision: Picklable object with on_market(quotes) and
+            on_report(intent, order, error), both returning OrderIntents to send.
+        interval: Case and securities poll interval of the market data process.
+        poll: Sleep of the decision process when nothing changed.
+    """
+    tickers = asyncio.run(_tickers(auth))
+    market = SharedMarket.create(tickers)
+    context = multiprocessing.get_context("spawn")
+    stop = context.Event()
+    intents = context.SimpleQueue()
+    reports = context.SimpleQueue()
+    processes = [
+        context.Process(
+            target=_market_data_main,
+            args=(auth, market.name, tickers, interval, stop),
+            name="market-data",
+        ),
+        context.Process(
+            target=_decision_main,
+            args=(market.name, tickers, decision, intents, reports, stop, poll),
+            name="decision",
+        ),
+        context.Process(
+            target=_execution_main,
+            args=(auth, intents, reports, max_in_flight),
+            name="execution",
+        ),
+    ]
+    for process in processes:
+        process.start()
+    try:
+        _supervise(processes, stop, intents)
+    except KeyboardInterrupt:
+        stop.set()
+        for process in processes:
+            process.join()
+    finally:
+        market.close()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv  # type: ignore
+
+    load_dotenv()
+    run_pipeline(
+        {
+            "username": os.getenv("USERNAME"),
+            "password": os.getenv("PASSWORD"),
+            "server": os.getenv("SERVER"),
+            "port": os.getenv("PORT"),
+        },
+        FlattenDecision(int(sys.argv[1]) if len(sys.argv) > 1 else 0),
+    )
@@ -0,0 +1,74 @@
+import cProfile, contextlib, os, sys, threading, time
+from collections import Counter
+from typing import Optional
+
+
+class SamplingProfiler:
+    """
+    Samples the call stack of one thread from a background thread.
+
+    Stacks are counted in the collapsed format of flamegraph.pl and
+    speedscope ("outer;inner;leaf count" per line), so the output of a
+    session is one write_collapsed call away from a flame graph.
+    """
+
+    def __init__(self, interval: float = 0.001, thread_id: Optional[int] = None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.stacks = Counter()
+        self.samples = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._sample, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def write_collapsed(self, path: str):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+@contextlib.contextmanager
+def profile_session(directory: str, name: str = "session", interval: float = 0.001):
+    """
+    Profiles the block with cProfile and the sampling profiler.
+
+    Writes <directory>/<name>-<timestamp>.prof (pstats, snakeviz) and
+    .collapsed (flamegraph.pl, speedscope) when the block exits, also when
+    it is cancelled.
+    """
+    os.makedirs(directory, exist_ok=True)
+    prefix = os.path.join(directory, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}")
+    profile = cProfile.Profile()
+    sampler = SamplingProfiler(interval)
+    sampler.start()
+    profile.enable()
+    try:
+        yield prefix
+    finally:
+        profile.disable()
+        sampler.stop()
+        profile.dump_stats(f"{prefix}.prof")
+        sampler.write_collapsed(f"{prefix}.collapsed")
+        print(f"Profile written to {prefix}.prof and {prefix}.collapsed ({sampler.samples} samples)")
@@ -0,0 +1,129 @@
+import asyncio
+from typing import Optional
+import httpx
+
+
+def retry_after(response: httpx.Response, default: float = 0.5) -> float:
+    """Seconds to wait before retrying a throttled (429) request."""
+    try:
+        return float(response.json()["wait"])
+    except Exception:
+        pass
+    try:
+        return float(response.headers["Retry-After"])
+    except Exception:
+        return default
+
+
+def endpoint_class(method: str, path: str) -> str:
+    """Groups a request into the rate limit class it counts against."""
+    if method == "DELETE" or path.startswith("/v1/commands/cancel"):
+        return "cancels"
+    if method == "POST" and path.startswith("/v1/orders"):
+        return "orders"
+    return "queries"
+
+
+class TokenBucket:
+    """
+    Token bucket whose rate adapts to the server's throttling.
+
+    Starts at rate requests per second. A 429 halves the rate and holds every
+    caller until the server's wait hint has passed, and each accepted request
+    adds increase back, up to max_rate (the starting rate by default), so the
+    bucket settles just under the rate the server allows and a burst after a
+    quiet stretch never outruns it.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        max_rate: Optional[float] = None,
+        min_rate: float = 1.0,
+        increase: float = 0.5,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_rate = rate if max_rate is None else max_rate
+        self.min_rate = min_rate
+        self.increase = increase
+        self.tokens = float(burst)
+        # Event loop time, so refills and sleeps share one clock, set on first use
+        self.updated = None
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        if self.updated is not None:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """Waits for a token, callers are served in arrival order."""
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            while True:
+                blocked_until = self.blocked_until
+                if now < blocked_until:
+                    await asyncio.sleep(blocked_until - now)
+                    # Timers may fire a rounding error early, the hold is over unless extended
+                    now = max(loop.time(), blocked_until)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                ready_at = now + (1 - self.tokens) / self.rate
+                await asyncio.sleep(ready_at - now)
+                now = max(loop.time(), ready_at)
+                if self.blocked_until == blocked_until:
+                    self._refill(now)
+                    # One token has accrued by ready_at, rounding must not leave 0.999...
+                    self.tokens = max(self.tokens, 1.0) - 1
+                    return
+
+    def accepted(self):
+        self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def throttled(self, wait: float):
+        """Backs off after a 429 with the server's wait hint in seconds."""
+        self.rate = max(self.min_rate, self.rate / 2)
+        now = asyncio.get_running_loop().time()
+        self._refill(now)
+        self.tokens = 0.0
+        self.blocked_until = max(self.blocked_until, now + wait)
+
+
+class RateLimiter:
+    """
+    One adaptive token bucket per endpoint class.
+
+    A class without a configured rate is not paced until the server first
+    throttles it, then it gets a bucket starting at throttled_rate.
+    """
+
+    def __init__(self, rates: dict, burst: int = 1, throttled_rate: float = 10.0):
+        self.burst = burst
+        self.throttled_rate = throttled_rate
+        self.buckets = {
+            name: TokenBucket(rate, burst)
+            for name, rate in rates.items()
+            if rate is not None
+        }
+
+    def bucket(self, method: str, path: str) -> Optional[TokenBucket]:
+        return self.buckets.get(endpoint_class(method, path))
+
+    def throttled(self, method: str, path: str, wait: float) -> TokenBucket:
+        """Records a 429 for the request's class, returns its bucket."""
+        name = endpoint_class(method, path)
+        bucket = self.buckets.get(name)
+        if bucket is None:
+            # Halved to throttled_rate below, the rate it may recover to
+            bucket = self.buckets[name] = TokenBucket(
+                self.throttled_rate * 2, self.burst, max_rate=self.throttled_rate
+            )
+        bucket.throttled(wait)
+        return bucket
@@ -0,0 +1,246 @@
+import asyncio, mmap, os, queue, struct, sys, threading, time
+from bisect import bisect_left
+from typing import NamedTuple, Optional
+from client import get_client
+from models import AuthConfig
+from records import loads
+
+# Record kinds, by the GET endpoint whose responses they hold
+CASE, SECURITIES, BOOK, TIME_SALES, TENDERS = 1, 2, 3, 4, 5
+KINDS = {
+    "/v1/case": CASE,
+    "/v1/securities": SECURITIES,
+    "/v1/securities/book": BOOK,
+    "/v1/securities/tas": TIME_SALES,
+    "/v1/tenders": TENDERS,
+}
+KIND_NAMES = {kind: path for path, kind in KINDS.items()}
+
+MAGIC = b"RITREC01"
+# timestamp, period, tick, kind, status, ticker, payload offset, payload length
+INDEX = struct.Struct("<dHHHH8sQI")
+
+
+class Record(NamedTuple):
+    timestamp: float  # wall clock seconds when the response arrived
+    period: int
+    tick: int
+    kind: int
+    status: int  # HTTP status code
+    ticker: str  # ticker query parameter, "" for unfiltered requests
+    payload: memoryview  # raw response body, a view into the mapped data file
+
+    def json(self):
+        # The parser needs bytes, this is the only copy of the payload
+        return loads(bytes(self.payload))
+
+
+class Recorder:
+    """
+    Records every case, securities, book, time and sales and tender response.
+
+    Listens on the shared APIClient of auth, so it captures whatever the
+    strategy requests without extra queries. Responses are queued and
+    written by a background thread to two append-only files:
+
+        <path>.idx  MAGIC, then one fixed-width INDEX record per response
+        <path>.dat  the raw response bodies back to back
+
+    Records are stamped with the period and tick of the latest case response.
+    An existing recording at path is replaced when the recorder first starts,
+    readers bisect on (period, tick) and a second session would restart them.
+    """
+
+    def __init__(self, auth: AuthConfig, path: str):
+        self.auth = auth
+        self.path = path
+        self.period = 0
+        self.tick = 0
+        self.recorded = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        # Restarting after stop() appends to this recorder's own files
+        self._mode = "wb"
+
+    def record(self, method: str, path: str, params, response):
+        """APIClient listener, queues a copy of the response for the writer."""
+        kind = KINDS.get(path)
+        if method != "GET" or kind is None:
+            return
+        content = response.content
+        if kind == CASE and response.status_code == 200:
+            case = loads(content)
+            self.period, self.tick = case["period"], case["tick"]
+        ticker = (params or {}).get("ticker") or ""
+        self._queue.put(
+            (
+                time.time(),
+                self.period,
+                self.tick,
+                kind,
+                response.status_code,
+                ticker.encode()[:8],
+                content,
+            )
+        )
+        self.recorded += 1
+
+    def _write(self, mode: str):
+        with open(f"{self.path}.idx", mode) as index, open(f"{self.path}.dat", mode) as data:
+            if index.tell() == 0:
+                index.write(MAGIC)
+            offset = data.tell()
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                *fields, content = item
+                index.write(INDEX.pack(*fields, offset, len(content)))
+                data.write(content)
+                offset += len(content)
+                if self._queue.empty():
+                    # Flush the data before the index so readers never see a record without its payload
+                    data.flush()
+                    index.flush()
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Starts the writer thread and listens on the client of auth."""
+        if not self.is_running:
+            self._thread = threading.Thread(
+                target=self._write, args=(self._mode,), name="recorder", daemon=True
+            )
+            self._thread.start()
+            self._mode = "ab"
+        get_client(self.auth).add_listener(self.record)
+
+    async def stop(self):
+        """Stops listening and waits for the writer to drain the queue."""
+        get_client(self.auth).remove_listener(self.record)
+        if self._thread is not None:
+            self._queue.put(None)
+            await asyncio.to_thread(self._thread.join)
+            self._thread = None
+
+
+class RecordingReader:
+    """
+    Zero-copy reader of a recording.
+
+    Both files are memory-mapped, records are decoded from the index on
+    access and their payloads are views into the data file. Indexing and
+    seek_tick only see the records written when the reader was opened.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._files = []
+        self._maps = []
+        self.index = self._map(f"{path}.idx")
+        self.data = self._map(f"{path}.dat")
+        if self.index[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path}.idx is not a recording")
+        # A record may be partially written if the recorder is still running
+        self.count = (len(self.index) - len(MAGIC)) // INDEX.size
+        self._keys = None
+
+    def _map(self, path: str) -> memoryview:
+        f = open(path, "rb")
+        self._files.append(f)
+        if os.fstat(f.fileno()).st_size == 0:
+            return memoryview(b"")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        return memoryview(mapped)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, i: int) -> Record:
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        timestamp, period, tick, kind, status, ticker, offset, length = INDEX.unpack_from(
+            self.index, len(MAGIC) + i * INDEX.size
+        )
+        return Record(
+            timestamp,
+            period,
+            tick,
+            kind,
+            status,
+            ticker.rstrip(b"\0").decode(),
+            self.data[offset : offset + length],
+        )
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+    def _tick_keys(self) -> list:
+        if self._keys is None:
+            self._keys = [
+                INDEX.unpack_from(self.index, len(MAGIC) + i * INDEX.size)[1:3]
+                for i in range(self.count)
+            ]
+        return self._keys
+
+    def seek_tick(self, tick: int, period: Optional[int] = None) -> int:
+        """Returns the position of the first record at or after tick of period (the first period by default)."""
+        keys = self._tick_keys()
+        if period is None:
+            period = keys[0][0] if keys else 0
+        return bisect_left(keys, (period, tick))
+
+    def records(
+        self,
+        kind: Optional[int] = None,
+        ticker: Optional[str] = None,
+        start_tick: int = 0,
+        end_tick: Optional[int] = None,
+        period: Optional[int] = None,
+    ):
+        """Yields the records of kind and ticker from start_tick up to, not including, end_tick."""
+        for i in range(self.seek_tick(start_tick, period), self.count):
+            record = self[i]
+            if period is not None and record.period != period:
+                break
+            if end_tick is not None and record.tick >= end_tick:
+                break
+            if (kind is None or record.kind == kind) and (ticker is None or record.ticker == ticker):
+                yield record
+
+    def close(self):
+        self.index.release()
+        self.data.release()
+        for mapped in self._maps:
+            try:
+                mapped.close()
+            except BufferError:
+                # A payload view is still alive, the map closes when it is collected
+                pass
+        for f in self._files:
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: recorder.py <recording> [tick]")
+        sys.exit(1)
+    with RecordingReader(sys.argv[1]) as reader:
+        tick = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+        for record in reader.records(start_tick=tick, end_tick=tick + 1 if len(sys.argv) > 2 else None):
+            print(
+                f"period:{record.period} tick:{record.tick} {KIND_NAMES[record.kind]} "
+                f"{record.ticker} status:{record.status} bytes:{len(record.payload)}"
+            )
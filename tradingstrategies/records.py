@@ -0,0 +1,130 @@
+import os
+from dataclasses import dataclass, fields
+from typing import Optional, Union
+from pydantic_core import from_json
+
+
+# Validates every decoded record with pydantic, for debugging a server that
+# sends something unexpected. Off by default, the fast path trusts the API.
+STRICT_DECODING = os.getenv("STRICT_DECODING", "0").lower() in ("1", "true", "yes")
+
+
+@dataclass(slots=True)
+class CaseRecord:
+    name: str
+    period: int
+    tick: int
+    ticks_per_period: int
+    total_periods: int
+    status: str
+    is_enforce_trading_limits: bool
+
+
+@dataclass(slots=True)
+class SecurityRecord:
+    ticker: str
+    type: str
+    position: float
+    vwap: float
+    nlv: float
+    last: float
+    bid: float
+    bid_size: float
+    ask: float
+    ask_size: float
+    volume: float
+    unrealized: float
+    realized: float
+
+
+@dataclass(slots=True)
+class OrderRecord:
+    order_id: int
+    period: int
+    tick: int
+    trader_id: str
+    ticker: str
+    type: str
+    quantity: float
+    action: str
+    price: Optional[float]
+    quantity_filled: float
+    vwap: Optional[float]
+    status: str
+
+
+@dataclass(slots=True)
+class TenderRecord:
+    tender_id: int
+    period: int
+    tick: int
+    expires: int
+    caption: str
+    quantity: float
+    action: str
+    is_fixed_bid: bool
+    price: Optional[float]
+    ticker: str
+
+
+# Order book entries are resting orders
+BookLevel = OrderRecord
+
+
+# record type -> field names, in constructor order
+_FIELDS = {}
+# record type -> pydantic TypeAdapter, built on first strict decode
+_ADAPTERS = {}
+
+
+def loads(content: Union[bytes, str]):
+    """Parses a JSON response body, several times faster than json.loads."""
+    return from_json(content)
+
+
+def _field_names(record_type) -> tuple:
+    names = _FIELDS.get(record_type)
+    if names is None:
+        names = _FIELDS[record_type] = tuple(field.name for field in fields(record_type))
+    return names
+
+
+def _validate(record_type, item: dict):
+    from pydantic import TypeAdapter
+
+    adapter = _ADAPTERS.get(record_type)
+    if adapter is None:
+        adapter = _ADAPTERS[record_type] = TypeAdapter(record_type)
+    return adapter.validate_python(item)
+
+
+def from_dict(record_type, item: Optional[dict], strict: Optional[bool] = None):
+    """
+    Builds a record from one decoded JSON object.
+
+    Missing keys become None, unknown keys are ignored. With strict (default
+    STRICT_DECODING) the object is validated with pydantic instead.
+    """
+    if item is None:
+        return None
+    if strict if strict is not None else STRICT_DECODING:
+        return _validate(record_type, item)
+    return record_type(*map(item.get, _field_names(record_type)))
+
+
+def decode(record_type, content: Union[bytes, str, dict], strict: Optional[bool] = None):
+    """Decodes a JSON object, raw or already parsed, into one record."""
+    if isinstance(content, (bytes, str)):
+        content = loads(content)
+    return from_dict(record_type, content, strict)
+
+
+def decode_list(
+    record_type, content: Union[bytes, str, list], strict: Optional[bool] = None
+) -> list:
+    """Decodes a JSON array, raw or already parsed, into a list of records."""
+    if isinstance(content, (bytes, str)):
+        content = loads(content)
+    if content is None:
+        return []
+    return [from_dict(record_type, item, strict) for item in content]
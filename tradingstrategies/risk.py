@@ -0,0 +1,201 @@
+import asyncio
+from typing import Optional
+import apis
+from models import AuthConfig
+
+
+class PositionService:
+    """
+    Positions and net/gross exposure shared by every strategy task.
+
+    Refreshed from /v1/securities in the background, or from a shared
+    SecuritiesSnapshot, and updated locally from our own fills and tender
+    reservations in between, with running net and gross totals so a limit
+    check is O(1) and needs no request.
+    """
+
+    def __init__(
+        self,
+        auth: AuthConfig,
+        interval: float = 0.5,
+        net_limit: int = 100000,
+        gross_limit: int = 250000,
+        securities=None,
+    ):
+        self.auth = auth
+        self.interval = interval
+        # Used until /v1/limits has been read
+        self.net_limit = net_limit
+        self.gross_limit = gross_limit
+        self.server_positions = {}  # ticker -> last reported position plus our fills since
+        self.pending = {}  # ticker -> reserved quantity not yet seen by the server
+        # ticker -> [quantity, expected position before it lands, landed] per reservation
+        self.reservations = {}
+        self.positions = {}  # ticker -> server position plus pending reservations
+        self.net = 0
+        self.gross = 0
+        self.last_prices = {}  # ticker -> last price from the latest refresh
+        # ticker -> loop time of our latest fill, older snapshots must not overwrite it
+        self.filled_at = {}
+        self._refreshing = None
+        self._task = None
+        # With a SecuritiesSnapshot, positions follow its snapshots instead of own polls
+        self.securities = securities
+        if securities is not None:
+            securities.on_update(self._apply_snapshot)
+
+    def _set_position(self, ticker: str, position: int):
+        previous = self.positions.get(ticker, 0)
+        self.positions[ticker] = position
+        self.net += position - previous
+        self.gross += abs(position) - abs(previous)
+
+    def position(self, ticker: str) -> int:
+        """Position including pending tender reservations."""
+        return self.positions.get(ticker, 0)
+
+    def server_position(self, ticker: str) -> int:
+        """Position as last reported by the server plus our own fills since."""
+        return self.server_positions.get(ticker, 0)
+
+    def exposure_after(self, ticker: str, quantity: int):
+        """Returns (net, gross) if a signed quantity of ticker were added."""
+        position = self.positions.get(ticker, 0)
+        return (
+            self.net + quantity,
+            self.gross - abs(position) + abs(position + quantity),
+        )
+
+    def can_accept(self, ticker: str, quantity: int) -> bool:
+        net, gross = self.exposure_after(ticker, quantity)
+        return abs(net) <= self.net_limit and gross <= self.gross_limit
+
+    def _settle(self, ticker: str):
+        """Marks reservations the server position already reflects, recomputes pending."""
+        position = self.server_position(ticker)
+        pending = 0
+        for reservation in self.reservations.get(ticker, ()):
+            quantity, base, landed = reservation
+            if not landed and (position - base) * quantity >= quantity * quantity:
+                # Moved by the whole quantity from the expected base, it is in position now
+                reservation[2] = landed = True
+            if not landed:
+                pending += quantity
+        self.pending[ticker] = pending
+        self._set_position(ticker, position + pending)
+
+    def reserve(self, ticker: str, quantity: int) -> bool:
+        """Checks the limits and reserves a signed quantity in one step, without awaiting."""
+        if not self.can_accept(ticker, quantity):
+            return False
+        # Earlier reservations are expected to land first
+        self.reservations.setdefault(ticker, []).append([quantity, self.position(ticker), False])
+        self._settle(ticker)
+        return True
+
+    def _drop(self, ticker: str, quantity: int, landed_first: bool):
+        reservations = self.reservations.get(ticker, [])
+        for landed in (landed_first, not landed_first):
+            for index, reservation in enumerate(reservations):
+                if reservation[0] == quantity and reservation[2] == landed:
+                    del reservations[index]
+                    self._settle(ticker)
+                    return
+
+    def release(self, ticker: str, quantity: int):
+        """Drops a reservation that was not filled."""
+        self._drop(ticker, quantity, landed_first=False)
+
+    def confirm(self, ticker: str, quantity: int):
+        """Drops a reservation the server position now includes."""
+        self._drop(ticker, quantity, landed_first=True)
+
+    def apply_fill(self, ticker: str, quantity: int):
+        """Applies a signed fill of our own until the next refresh confirms it."""
+        self.server_positions[ticker] = self.server_position(ticker) + quantity
+        self.filled_at[ticker] = asyncio.get_running_loop().time()
+        # Our fills are not tenders landing, pending reservations now expect them in the base
+        for reservation in self.reservations.get(ticker, ()):
+            if not reservation[2]:
+                reservation[1] += quantity
+        self._settle(ticker)
+
+    def apply_order(self, order: Optional[dict]):
+        """Applies the filled part of an order response from post_order."""
+        if not order or not order.get("quantity_filled"):
+            return
+        filled = int(order["quantity_filled"])
+        self.apply_fill(order["ticker"], filled if order["action"] == "BUY" else -filled)
+
+    def _update(
+        self, ticker: str, position: int, last_price: float, requested_at: Optional[float] = None
+    ):
+        self.last_prices[ticker] = last_price
+        filled_at = self.filled_at.get(ticker)
+        if requested_at is not None and filled_at is not None and requested_at <= filled_at:
+            # Requested before our latest fill, the local position is newer
+            return
+        self.server_positions[ticker] = position
+        self._settle(ticker)
+
+    def _apply_snapshot(self, securities: dict):
+        requested_at = self.securities.requested_at
+        for ticker, security in securities.items():
+            self._update(ticker, int(security.position), security.last, requested_at)
+
+    async def _refresh(self):
+        if self.securities is not None:
+            # The snapshot calls _apply_snapshot
+            await self.securities.refresh()
+            return
+        requested_at = asyncio.get_running_loop().time()
+        securities_data = await apis.query_securities(self.auth)
+        if not securities_data:
+            return
+        for security in securities_data:
+            self._update(
+                security["ticker"], int(security["position"]), security["last"], requested_at
+            )
+
+    async def refresh(self):
+        """Refreshes positions from the server, concurrent callers share one request."""
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.ensure_future(self._refresh())
+        await asyncio.shield(self._refreshing)
+
+    async def refresh_limits(self):
+        """Reads net/gross limits from /v1/limits, keeping the defaults if unavailable."""
+        limits = await apis.query_trading_limits(self.auth)
+        if limits:
+            self.net_limit = min(limit["net_limit"] for limit in limits)
+            self.gross_limit = min(limit["gross_limit"] for limit in limits)
+
+    async def _run(self):
+        try:
+            await self.refresh_limits()
+        except Exception as e:
+            print(f"Error querying trading limits: {e}")
+        if self.securities is not None:
+            # The snapshot's own poller keeps positions current
+            return
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Error refreshing positions: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Starts the background refresh on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,151 @@
+import asyncio
+from typing import Optional
+import apis
+from models import AuthConfig
+from records import SecurityRecord, from_dict
+
+
+class SecuritiesSnapshot:
+    """
+    Latest /v1/securities snapshot of every ticker.
+
+    One unfiltered request per interval replaces the per-ticker queries of
+    every square-off and stop-loss task, the parsed records are fanned out
+    to subscribers by ticker and waiters are woken on each new snapshot.
+    """
+
+    def __init__(self, auth: AuthConfig, interval: float = 0.1):
+        self.auth = auth
+        self.interval = interval
+        self.securities = {}  # ticker -> SecurityRecord
+        self.version = 0  # incremented on every snapshot
+        # Loop time the latest snapshot was requested at, fills after it are not in it
+        self.requested_at = None
+        self._listeners = []  # callback(securities) on every snapshot
+        self._subscribers = {}  # ticker -> callbacks(SecurityRecord)
+        self._updated = asyncio.Condition()
+        self._refreshing = None
+        self._task = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def security(self, ticker: str) -> Optional[SecurityRecord]:
+        return self.securities.get(ticker)
+
+    def position(self, ticker: str) -> Optional[float]:
+        security = self.securities.get(ticker)
+        return security.position if security else None
+
+    def last_price(self, ticker: str) -> Optional[float]:
+        security = self.securities.get(ticker)
+        return security.last if security else None
+
+    def on_update(self, callback):
+        """Registers callback(securities), called with every snapshot."""
+        self._listeners.append(callback)
+
+    def subscribe(self, ticker: str, callback):
+        """Registers callback(security), called with ticker's record on every snapshot."""
+        self._subscribers.setdefault(ticker, []).append(callback)
+
+    def unsubscribe(self, ticker: str, callback):
+        callbacks = self._subscribers.get(ticker, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+    async def _refresh(self):
+        requested_at = asyncio.get_running_loop().time()
+        securities_data = await apis.query_securities(self.auth)
+        if not securities_data:
+            return
+        self.requested_at = requested_at
+        securities = {}
+        for item in securities_data:
+            security = from_dict(SecurityRecord, item)
+            securities[security.ticker] = security
+        self.securities = securities
+        self.version += 1
+        for callback in self._listeners:
+            callback(securities)
+        for ticker, callbacks in self._subscribers.items():
+            security = securities.get(ticker)
+            if security is not None:
+                for callback in list(callbacks):
+                    callback(security)
+        async with self._updated:
+            self._updated.notify_all()
+
+    async def refresh(self):
+        """Fetches a new snapshot, concurrent callers share one request."""
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.ensure_future(self._refresh())
+        await asyncio.shield(self._refreshing)
+
+    async def wait_for_update(
+        self, timeout: Optional[float] = None, updates: int = 1
+    ) -> bool:
+        """
+        Waits for updates more snapshots, returns False on timeout.
+
+        A request already in flight may predate the caller's last order, so
+        wait for 2 updates to see a snapshot taken after it.
+        """
+        version = self.version + updates
+        async with self._updated:
+            try:
+                await asyncio.wait_for(
+                    self._updated.wait_for(lambda: self.version >= version), timeout
+                )
+                return True
+            except asyncio.TimeoutError:
+                return False
+
+    async def latest(self, ticker: str) -> Optional[SecurityRecord]:
+        """Returns ticker's record, fetching a snapshot first if there is none yet."""
+        if ticker not in self.securities:
+            await self.refresh()
+        return self.securities.get(ticker)
+
+    async def fresh(self, ticker: str) -> Optional[SecurityRecord]:
+        """
+        Returns ticker's record from a snapshot requested after this call.
+
+        Returns None if no such snapshot arrived in time, the previous one may
+        predate the caller's last order.
+        """
+        since = asyncio.get_running_loop().time()
+        if self.is_running:
+            await self.wait_for_update(timeout=max(1.0, 4 * self.interval), updates=2)
+        else:
+            if self._refreshing is not None and not self._refreshing.done():
+                # The request in flight may predate the caller's last order
+                await asyncio.shield(self._refreshing)
+            await self.refresh()
+        if self.requested_at is None or self.requested_at < since:
+            return None
+        return self.securities.get(ticker)
+
+    async def _poll(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Error polling securities: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Starts the securities poller on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._poll())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
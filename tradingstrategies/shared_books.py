@@ -0,0 +1,218 @@
+import asyncio, os, struct, sys
+from typing import Optional
+import apis
+from client import close_client
+from models import AuthConfig
+from order_book import OrderBook, OrderBookCache
+from shm import SeqlockSlots
+from tick_clock import TickClock
+
+# bid levels, ask levels, then depth doubles each of bid and ask prices and
+# depth doubles each of bid and ask quantities, best level first. Quantities
+# are doubles as RIT books can hold fractional quantities
+LEVELS = struct.Struct("<II")
+
+
+def _book_record(depth: int) -> struct.Struct:
+    return struct.Struct(f"<II{4 * depth}d")
+
+
+class BookSnapshot:
+    """
+    Consistent copy of a published book, read like an OrderBook.
+
+    The slot is copied once, prices and quantities are typed views of that
+    copy and only the levels actually read become Python floats.
+    """
+
+    __slots__ = (
+        "ticker",
+        "sequence",
+        "bid_prices",
+        "bid_quantities",
+        "ask_prices",
+        "ask_quantities",
+    )
+
+    def __init__(self, ticker: str, sequence: int, payload: bytes, depth: int):
+        self.ticker = ticker
+        self.sequence = sequence
+        bid_levels, ask_levels = LEVELS.unpack_from(payload)
+        view = memoryview(payload)
+        quantities_at = LEVELS.size + 16 * depth
+        prices = view[LEVELS.size : quantities_at].cast("d")
+        quantities = view[quantities_at:].cast("d")
+        # Best level first on both sides, unlike OrderBook's ascending arrays
+        self.bid_prices = prices[:bid_levels]
+        self.ask_prices = prices[depth : depth + ask_levels]
+        self.bid_quantities = quantities[:bid_levels]
+        self.ask_quantities = quantities[depth : depth + ask_levels]
+
+    def best_bid(self):
+        """Returns (price, quantity) of the best bid or None."""
+        return (self.bid_prices[0], self.bid_quantities[0]) if self.bid_prices else None
+
+    def best_ask(self):
+        """Returns (price, quantity) of the best ask or None."""
+        return (self.ask_prices[0], self.ask_quantities[0]) if self.ask_prices else None
+
+    def bids(self, depth: Optional[int] = None) -> list:
+        """Returns up to depth (price, quantity) bid levels, best first."""
+        return list(zip(self.bid_prices[:depth].tolist(), self.bid_quantities[:depth].tolist()))
+
+    def asks(self, depth: Optional[int] = None) -> list:
+        """Returns up to depth (price, quantity) ask levels, best first."""
+        return list(zip(self.ask_prices[:depth].tolist(), self.ask_quantities[:depth].tolist()))
+
+
+class SharedBooks:
+    """
+    Latest order book of every ticker in shared memory, fixed depth, one seqlock slot per ticker.
+
+    One process polls /v1/securities/book and publishes, any number of local
+    processes read snapshots without a request of their own. Slot 0 holds the
+    comma separated tickers, so readers only need the block's name.
+    """
+
+    def __init__(self, slots: SeqlockSlots):
+        self.slots = slots
+        # 32 bytes per level: bid and ask price, bid and ask quantity
+        self.depth = (slots.slot_size - LEVELS.size) // 32
+        self.record = _book_record(self.depth)
+        names = slots.read_bytes(0)[1].rstrip(b"\0").decode()
+        self.tickers = names.split(",") if names else []
+        self.index = {ticker: slot for slot, ticker in enumerate(self.tickers, 1)}
+
+    @classmethod
+    def create(cls, tickers: list, depth: int = 20, name: Optional[str] = None):
+        record = _book_record(depth)
+        names = ",".join(tickers).encode()
+        if len(names) > record.size:
+            raise ValueError(f"Too many tickers for a book depth of {depth}")
+        slots = SeqlockSlots.create(len(tickers) + 1, record.size, name)
+        slots.write(0, struct.Struct(f"{record.size}s"), names)
+        return cls(slots)
+
+    @classmethod
+    def attach(cls, name: str):
+        return cls(SeqlockSlots.attach(name))
+
+    @property
+    def name(self) -> str:
+        return self.slots.name
+
+    def publish(self, book: OrderBook):
+        """Writes the top depth levels of book, tickers outside the layout are skipped."""
+        slot = self.index.get(book.ticker)
+        if slot is None:
+            return
+        depth = self.depth
+        bids, asks = book.bids(depth), book.asks(depth)
+        values = [len(bids), len(asks)]
+        for levels in (bids, asks):
+            values.extend(price for price, _ in levels)
+            values.extend([0.0] * (depth - len(levels)))
+        for levels in (bids, asks):
+            values.extend(quantity for _, quantity in levels)
+            values.extend([0.0] * (depth - len(levels)))
+        self.slots.write(slot, self.record, *values)
+
+    def sequence(self, ticker: str) -> int:
+        """Grows by 2 per publish, 0 until the ticker's book is first published."""
+        return self.slots.sequence(self.index[ticker])
+
+    def snapshot(self, ticker: str) -> Optional[BookSnapshot]:
+        """Returns a consistent copy of ticker's book, None until it is published."""
+        sequence, payload = self.slots.read_bytes(self.index[ticker])
+        if sequence == 0:
+            return None
+        return BookSnapshot(ticker, sequence, payload, self.depth)
+
+    def close(self):
+        self.slots.close()
+
+
+class SharedBookCache:
+    """
+    OrderBookCache interface over SharedBooks.
+
+    book(ticker) is a shared memory copy instead of a request. Tickers the
+    publisher does not cover go to the fallback cache when one is given.
+    """
+
+    def __init__(self, books: SharedBooks, fallback: Optional[OrderBookCache] = None):
+        self.books = books
+        self.fallback = fallback
+
+    async def book(self, ticker: str):
+        snapshot = self.books.snapshot(ticker) if ticker in self.books.index else None
+        if snapshot is None and self.fallback is not None:
+            return await self.fallback.book(ticker)
+        return snapshot
+
+    def start(self):
+        if self.fallback is not None:
+            return self.fallback.start()
+
+    async def stop(self):
+        """Stops the fallback poller and detaches from the shared memory."""
+        if self.fallback is not None:
+            await self.fallback.stop()
+        self.books.close()
+
+
+async def publish_books(
+    auth: AuthConfig,
+    name: Optional[str] = None,
+    tickers: Optional[list] = None,
+    depth: int = 20,
+    interval: float = 0.2,
+):
+    """
+    Polls the books of tickers, every security by default, into SharedBooks until the case stops.
+
+    Args:
+        name: Shared memory name readers attach to, generated when None.
+        depth: Price levels kept per side.
+        interval: Book poll interval.
+    """
+    if tickers is None:
+        tickers = [security["ticker"] for security in await apis.query_securities(auth)]
+    books = SharedBooks.create(tickers, depth, name)
+    print(f"Publishing {depth} levels of {', '.join(tickers)} to shared memory {books.name}")
+    cache = OrderBookCache(auth, depth, interval)
+    cache.on_update(books.publish)
+    clock = TickClock(auth, interval)
+    try:
+        for ticker in tickers:
+            await cache.book(ticker)
+        cache.start()
+        clock.start()
+        while clock.status != "STOPPED":
+            await asyncio.sleep(interval)
+        print("Case stopped, no longer publishing books")
+    finally:
+        await clock.stop()
+        await cache.stop()
+        await close_client(auth)
+        books.close()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv  # type: ignore
+
+    load_dotenv()
+    try:
+        asyncio.run(
+            publish_books(
+                {
+                    "username": os.getenv("USERNAME"),
+                    "password": os.getenv("PASSWORD"),
+                    "server": os.getenv("SERVER"),
+                    "port": os.getenv("PORT"),
+                },
+                name=sys.argv[1] if len(sys.argv) > 1 else "rit_books",
+            )
+        )
+    except KeyboardInterrupt:
+        pass
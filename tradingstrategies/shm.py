@@ -0,0 +1,89 @@
+import struct
+from multiprocessing import shared_memory
+from typing import Optional
+
+MAGIC = b"RITSHM01"
+# magic, slots, slot size
+HEADER = struct.Struct("<8sII")
+SEQUENCE = struct.Struct("<Q")
+
+
+class SeqlockSlots:
+    """
+    Fixed-size slots in one shared memory block, each guarded by a seqlock.
+
+    One process writes a slot: its sequence number becomes odd, the payload
+    is written, then the sequence becomes even again. Readers in any process
+    copy the payload and retry if the sequence was odd or changed meanwhile,
+    so they never see a torn record and never block the writer.
+
+    Layout: HEADER, then per slot an 8-byte sequence and slot_size bytes.
+    """
+
+    def __init__(self, block: shared_memory.SharedMemory, owner: bool):
+        self.block = block
+        self.owner = owner
+        self.buffer = block.buf
+        magic, self.slots, self.slot_size = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC:
+            raise ValueError(f"Shared memory {block.name} is not a seqlock block")
+        self.stride = SEQUENCE.size + self.slot_size
+
+    @classmethod
+    def create(cls, slots: int, slot_size: int, name: Optional[str] = None):
+        block = shared_memory.SharedMemory(
+            name, create=True, size=HEADER.size + slots * (SEQUENCE.size + slot_size)
+        )
+        HEADER.pack_into(block.buf, 0, MAGIC, slots, slot_size)
+        return cls(block, owner=True)
+
+    @classmethod
+    def attach(cls, name: str):
+        # Only the creator unlinks the block, a reader exiting must not remove it
+        return cls(shared_memory.SharedMemory(name, track=False), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.block.name
+
+    def _offset(self, slot: int) -> int:
+        if not 0 <= slot < self.slots:
+            raise IndexError(slot)
+        return HEADER.size + slot * self.stride
+
+    def sequence(self, slot: int) -> int:
+        """Even once the slot is written, bumped by 2 per write, 0 if never written."""
+        return SEQUENCE.unpack_from(self.buffer, self._offset(slot))[0]
+
+    def write(self, slot: int, record: struct.Struct, *values):
+        """Packs values into the slot, only one process may write a given slot."""
+        offset = self._offset(slot)
+        sequence = SEQUENCE.unpack_from(self.buffer, offset)[0]
+        SEQUENCE.pack_into(self.buffer, offset, sequence + 1)
+        record.pack_into(self.buffer, offset + SEQUENCE.size, *values)
+        SEQUENCE.pack_into(self.buffer, offset, sequence + 2)
+
+    def read_bytes(self, slot: int, size: Optional[int] = None) -> tuple:
+        """Returns (sequence, copy of the first size payload bytes) of a consistent write."""
+        offset = self._offset(slot)
+        start = offset + SEQUENCE.size
+        end = start + (self.slot_size if size is None else size)
+        buffer = self.buffer
+        while True:
+            before = SEQUENCE.unpack_from(buffer, offset)[0]
+            if before & 1:
+                continue
+            payload = bytes(buffer[start:end])
+            if SEQUENCE.unpack_from(buffer, offset)[0] == before:
+                return before, payload
+
+    def read(self, slot: int, record: struct.Struct) -> tuple:
+        """Returns (sequence, values) of a consistent write of record."""
+        sequence, payload = self.read_bytes(slot, record.size)
+        return sequence, record.unpack(payload)
+
+    def close(self):
+        self.buffer = None
+        self.block.close()
+        if self.owner:
+            self.block.unlink()
@@ -1,38 +1,23 @@
 import time, os, apis, asyncio
+from typing import Optional
+from client import close_client
+from order_book import OrderBookCache
+from shared_books import SharedBookCache, SharedBooks
+from market_depth import MarketDepth, evaluate_tender
+from display import DepthDisplay
+from tick_clock import TickClock
+from risk import PositionService
+from securities import SecuritiesSnapshot
+from time_sales import TimeSalesIngester
+from order_manager import OrderManager
+from recorder import Recorder
+from metrics import METRICS, Metrics, dump_metrics
+from profiling import profile_session
+from strategy3_models import StrategyConfig
+from models import AuthConfig
 from rich.console import Console  # type: ignore
-from rich.table import Table  # type: ignore
 from dotenv import load_dotenv  # type: ignore
 
-# Console setup for terminal output
-console = Console()
-# Load environment variables from .env file
-load_dotenv()
-# Read values from .env
-AUTH = {
-    "username": os.getenv("USERNAME"),
-    "password": os.getenv("PASSWORD"),
-    "server": os.getenv("SERVER"),
-    "port": os.getenv("PORT"),
-}
-T3_MARKET_DEPTH_POINTS = int(os.getenv("T3_MARKET_DEPTH_POINTS"))
-T3_MIN_PROFIT_MARGIN = float(os.getenv("T3_MIN_PROFIT_MARGIN"))
-T3_TRADE_UNTIL_TICK = int(os.getenv("T3_TRADE_UNTIL_TICK"))
-T3_MIN_VWAP_MARGIN = float(os.getenv("T3_MIN_VWAP_MARGIN"))
-T3_STOP_LOSS_PERCENT = float(os.getenv("T3_STOP_LOSS_PERCENT"))
-T3_BATCH_SIZE = int(os.getenv("T3_BATCH_SIZE"))
-T3_SQUARE_OFF_BATCH_SIZE = int(os.getenv("T3_SQUARE_OFF_BATCH_SIZE"))
-
-print(
-    f"Hyper parameters are\n"
-    + f"T3_MARKET_DEPTH_POINTS:{T3_MARKET_DEPTH_POINTS}\n"
-    + f"T3_MIN_PROFIT_MARGIN:{T3_MIN_PROFIT_MARGIN}\n"
-    + f"T3_TRADE_UNTIL_TICK:{T3_TRADE_UNTIL_TICK}\n"
-    + f"T3_MIN_VWAP_MARGIN:{T3_MIN_VWAP_MARGIN}\n"
-    + f"T3_STOP_LOSS_PERCENT:{T3_STOP_LOSS_PERCENT}\n"
-    + f"T3_BATCH_SIZE:{T3_BATCH_SIZE}\n"
-    + f"T3_SQUARE_OFF_BATCH_SIZE:{T3_SQUARE_OFF_BATCH_SIZE}"
-)
-
 
 # Function to calculate VWAP (Volume-Weighted Average Price)
 def calculate_vwap(price_volume_list):
@@ -42,249 +27,310 @@ def calculate_vwap(price_volume_list):
     return round(sum(p * v for p, v in price_volume_list) / total_volume, 2)
 
 
-# Function to generate the Market Depth table
-async def generate_market_depth(ticker: str):
-    order_book = await apis.query_security_order_book(
-        AUTH, ticker, T3_MARKET_DEPTH_POINTS
-    )
-
-    bids = sorted(order_book["bids"], key=lambda x: x["price"], reverse=True)[
-        :T3_MARKET_DEPTH_POINTS
-    ]  # Top number_of_data_points bid levels
-    asks = sorted(order_book["asks"], key=lambda x: x["price"])[
-        :T3_MARKET_DEPTH_POINTS
-    ]  # Top number_of_data_points ask levels
-
-    # Calculate cumulative volumes & VWAP
-    cumulative_bid_vol = 0
-    cumulative_ask_vol = 0
-    bid_vwap_list = []
-    ask_vwap_list = []
-
-    table = Table(
-        title=f"Market Depth View - {ticker}",
-        show_header=True,
-        header_style="bold cyan",
-    )
-
-    table.add_column("BidVWAP", justify="right")
-    table.add_column("Cum Bid Vol", justify="right")
-    table.add_column("Bid Volume", justify="right")
-    table.add_column("Bid Price", justify="right")
-    table.add_column("Ask Price", justify="right")
-    table.add_column("Ask Volume", justify="right")
-    table.add_column("Cum Ask Vol", justify="right")
-    table.add_column("AskVWAP", justify="right")
+def signed_tender_quantity(tender: dict) -> int:
+    return -1 * tender["quantity"] if tender["action"] == "SELL" else tender["quantity"]
 
-    for i in range(T3_MARKET_DEPTH_POINTS):
-        # Extract bid data
-        bid_price = bids[i]["price"] if i < len(bids) else 0
-        bid_volume = bids[i]["quantity"] if i < len(bids) else 0
-        cumulative_bid_vol += bid_volume
-        bid_vwap_list.append((bid_price, bid_volume))
 
-        # Extract ask data
-        ask_price = asks[i]["price"] if i < len(asks) else 0
-        ask_volume = asks[i]["quantity"] if i < len(asks) else 0
-        cumulative_ask_vol += ask_volume
-        ask_vwap_list.append((ask_price, ask_volume))
+class Strategy3:
+    """
+    Tender strategy, configured by an injected StrategyConfig.
 
-        # Calculate VWAPs
-        bid_vwap = calculate_vwap(bid_vwap_list)
-        ask_vwap = calculate_vwap(ask_vwap_list)
+    Owns the shared services (clock, securities, positions, orders, books,
+    display) for one set of credentials, so several instances with
+    different parameters can run in one process.
+    """
 
-        # Add row to table
-        table.add_row(
-            str(bid_vwap),
-            str(cumulative_bid_vol),
-            str(bid_volume),
-            str(bid_price),
-            str(ask_price),
-            str(ask_volume),
-            str(cumulative_ask_vol),
-            str(ask_vwap),
+    def __init__(
+        self,
+        config: StrategyConfig,
+        auth: AuthConfig,
+        console: Optional[Console] = None,
+        metrics: Optional[Metrics] = None,
+    ):
+        self.config = config
+        self.auth = auth
+        # Order books shared by every signal, refreshed by one background poller
+        self.book_cache = OrderBookCache(
+            auth, config.market_depth_points, config.book_poll_interval
         )
-    return table
-
-
-async def generate_signal(
-    ticker: str, price: float, action: str, quantity: int, margin: float = 0.0
-):
-    # Generate the market depth table
-    market_depth_table = await generate_market_depth(ticker)
-    console.print(market_depth_table)
-
-    # Convert generator to list
-    bid_vwap_list = [float(cell) for cell in market_depth_table.columns[0].cells]
-    ask_vwap_list = [float(cell) for cell in market_depth_table.columns[7].cells]
-
-    # For SELL action, we look at bids
-    if action == "SELL":
-        bid_vwap_at_quantity = None
-        for i, bid_cell in enumerate(market_depth_table.columns[1].cells):
-            cumulative_bid_vol = int(float(bid_cell))
-
-            if cumulative_bid_vol >= quantity:
-                bid_vwap_at_quantity = bid_vwap_list[i]
-                break
-
-        if bid_vwap_at_quantity is None:
-            bid_vwap_at_quantity = bid_vwap_list[0]
-
-        if price - margin > bid_vwap_at_quantity:
-            return (True, bid_vwap_at_quantity)
-        return (False, bid_vwap_at_quantity)
-
-    elif action == "BUY":
-        ask_vwap_at_quantity = None
-        for i, ask_cell in enumerate(market_depth_table.columns[6].cells):
-            cumulative_ask_vol = int(float(ask_cell))
-
-            if cumulative_ask_vol >= quantity:
-                ask_vwap_at_quantity = ask_vwap_list[i]
-                break
-
-        if ask_vwap_at_quantity is None:
-            ask_vwap_at_quantity = ask_vwap_list[0]
-
-        if price + margin < ask_vwap_at_quantity:
-            return (True, ask_vwap_at_quantity)
-        return (False, ask_vwap_at_quantity)
-
-    return (False, -1)
-
+        if config.shared_books:
+            # Books published by another process, tickers it does not cover are still polled
+            self.book_cache = SharedBookCache(
+                SharedBooks.attach(config.shared_books), fallback=self.book_cache
+            )
+        # Market depth tables are printed by their own task, 0 disables them
+        self.depth_display = DepthDisplay(console or Console(), config.display_interval)
+        # Single case poller, the loop below wakes on tick changes instead of sleeping
+        self.clock = TickClock(auth, config.clock_poll_interval)
+        # One /v1/securities request per interval, shared by every ticker and task
+        self.securities = SecuritiesSnapshot(auth, config.securities_poll_interval)
+        # Positions and net/gross limits from /v1/limits, limit checks are in memory
+        self.positions = PositionService(auth, securities=self.securities)
+        # Local index of open orders, end-of-period cancels work from it concurrently
+        self.orders = OrderManager(auth)
+        # Prints of the tickers being squared off, for the square-off trend
+        self.time_sales = TimeSalesIngester(auth, interval=config.time_sales_poll_interval)
+        # Every market data response is written to disk by a background thread
+        self.recorder = Recorder(auth, config.record_path) if config.record_path else None
+        # Stage latencies, next to the per-endpoint API latencies of the client
+        self.metrics = metrics or METRICS
+
+    # Function to generate the Market Depth view
+    async def generate_market_depth(self, ticker: str) -> MarketDepth:
+        order_book = await self.book_cache.book(ticker)
+        # Cumulative volumes & VWAPs of the top levels in one prefix-sum pass
+        return MarketDepth.from_order_book(order_book, self.config.market_depth_points)
+
+    async def generate_signal(
+        self, ticker: str, price: float, action: str, quantity: int, margin: float = 0.0
+    ):
+        market_depth = await self.generate_market_depth(ticker)
+        # Hand the depth to the display task, rendering never blocks the decision
+        self.depth_display.update(market_depth)
+        return evaluate_tender(market_depth, price, action, quantity, margin)
+
+    async def accept_tender(self, tender: dict) -> Optional[asyncio.Task]:
+        """
+        Reserves, accepts and confirms a tender, then schedules its square-off.
+
+        Returns:
+            The square-off task, or None if the tender was not taken on.
+        """
+        squareoff_action = "SELL" if tender["action"] == "BUY" else "BUY"
+        tender_quantity = signed_tender_quantity(tender)
+
+        start = time.perf_counter()
+        initial_position = self.positions.server_position(tender["ticker"])
+        # Check and reserve in one step, concurrent tenders see each other's reservations
+        is_reserved = self.positions.reserve(tender["ticker"], tender_quantity)
+        self.metrics.record_since("risk_check", start)
+        print(f"net_position:{self.positions.net} gross_position:{self.positions.gross}")
+        if not is_reserved:
+            print(f"Cannot accept Tender-{tender['tender_id']} at this time")
+            return None
 
-async def main():
-    end_of_time_hit = False
-    while True:
-        tender_response = []
         try:
-            current_tick = await apis.get_current_tick(AUTH)
-        except Exception as e:
-            print(f"Unable to get current tick {e}, redo loop")
-            await asyncio.sleep(0.2)
-            continue
-        if current_tick == 0:
-            end_of_time_hit = False
-        if current_tick <= T3_TRADE_UNTIL_TICK:
-            print(f"Current tick is {current_tick}")
-            tender_response = await apis.query_tenders(AUTH)
-        else:
-            print(
-                f"Current tick is {current_tick} more than cutoff time {T3_TRADE_UNTIL_TICK} end_of_time_hit:{end_of_time_hit}"
+            start = time.perf_counter()
+            tender_response = await apis.post_tender(
+                self.auth, tender["tender_id"], tender["price"]
             )
-            if not end_of_time_hit:
-                print("End of period hit, squaring off all open positions")
-                # First cancel all open orders
-                await apis.cancel_all_open_order(AUTH)
-                asyncio.create_task(
-                    apis.market_square_off_all_tickers(AUTH, T3_SQUARE_OFF_BATCH_SIZE)
-                )
-                end_of_time_hit = True
+            self.metrics.record_since("tender_accept", start)
+            print(f"Tender accepted: {tender_response}")
+            if not tender_response or not tender_response["success"]:
+                self.positions.release(tender["ticker"], tender_quantity)
+                return None
+
+            start = time.perf_counter()
+            is_tender_processed = await apis.is_tender_processed(
+                self.auth,
+                tender["ticker"],
+                tender["quantity"],
+                initial_position,
+                self.positions,
+            )
+            self.metrics.record_since("tender_processed", start)
+        except BaseException:
+            # Expired (404) or still throttled, the tender was not taken on
+            self.positions.release(tender["ticker"], tender_quantity)
+            raise
+        if not is_tender_processed:
+            # Not in the server position yet, the next refresh picks it up if it lands
+            self.positions.release(tender["ticker"], tender_quantity)
+            return None
+        self.positions.confirm(tender["ticker"], tender_quantity)
+        return asyncio.create_task(self.square_off(tender, squareoff_action))
+
+    def square_off(self, tender, squareoff_action: str):
+        """Returns the square-off coroutine of an accepted tender for the configured square_off_mode."""
+        config = self.config
+        # Buying back below the tender price, or selling above it, is the profit
+        sign = -1 if squareoff_action == "BUY" else 1
+        if config.square_off_mode == "limit":
+            return apis.limit_square_off_ticker(
+                self.auth,
+                tender["ticker"],
+                squareoff_action,
+                tender["price"] + sign * config.min_profit_margin,
+                tender["quantity"],
+                config.batch_size,
+            )
+        if config.square_off_mode == "stop_loss":
+            return apis.stop_loss_square_off_ticker(
+                self.auth,
+                tender["tender_id"],
+                tender["ticker"],
+                tender["price"] + sign * config.min_profit_margin,
+                tender["quantity"],
+                squareoff_action,
+                stoploss_price=tender["price"] * (1 - sign * config.stop_loss_percent),
+                batch_size=config.batch_size,
+                square_off_time=config.trade_until_tick,
+                clock=self.clock,
+                time_sales=self.time_sales,
+                securities=self.securities,
+            )
+        return apis.limit_square_off_ticker_trend_adjusted_price(
+            self.auth,
+            tender["ticker"],
+            squareoff_action,
+            tender["price"],
+            tender["quantity"],
+            config.square_off_batch_size,
+            square_off_time=config.trade_until_tick,
+            clock=self.clock,
+            time_sales=self.time_sales,
+            book_cache=self.book_cache,
+            orders=self.orders,
+        )
+
+    async def process_tenders(self, tenders: list) -> list:
+        """
+        Evaluates every open tender concurrently and accepts the favourable ones.
+
+        Signals are computed in parallel, then favourable tenders are accepted
+        concurrently against the shared positions service, best edge first.
 
-        if tender_response:
-            print(f"Details of tender received is: \n{tender_response}")
-            for tender in tender_response:
-                signal_response = await generate_signal(
+        Returns:
+            The square-off tasks of the tenders taken on.
+        """
+        start = time.perf_counter()
+        signals = await asyncio.gather(
+            *(
+                self.generate_signal(
                     tender["ticker"],
                     tender["price"],
                     tender["action"],
                     tender["quantity"],
-                    T3_MIN_VWAP_MARGIN,
+                    self.config.min_vwap_margin,
                 )
-                squareoff_action = "SELL" if tender["action"] == "BUY" else "BUY"
-                print(f"Signal analysed: \n{signal_response}")
-                if signal_response[0]:
-                    securities_data = await apis.query_securities(AUTH)
-                    net_position = 0
-                    gross_position = 0
-                    security_position = {}
-                    # Initialize security_position from securities_data
-                    for security in securities_data:
-                        security_position[security["ticker"]] = security["position"]
-
-                    tender_quantity = (
-                        -1 * tender["quantity"]
-                        if tender["action"] == "SELL"
-                        else tender["quantity"]
-                    )
-                    security_position[tender["ticker"]] += tender_quantity
-
-                    for ticker, position in security_position.items():
-                        net_position += position
-                        gross_position += abs(position)
-
-                    print(
-                        f"net_position:{net_position} gross_position:{gross_position}"
-                    )
-                    if abs(net_position) > 100000 or gross_position > 250000:
-                        print(f"Cannot accept this tender at this time")
-                        break
-                    securities_data = await apis.query_securities(AUTH, tender["ticker"])
-                    print(f"Queried intial position {securities_data[0]['position']}")
-                    tender_response = await apis.post_tender(
-                        AUTH, tender["tender_id"], tender["price"]
-                    )
-                    print(f"Tender accepted: {tender_response}")
-                    if tender_response["success"]:
-                        is_tender_processed = await apis.is_tender_processed(
-                            AUTH,
-                            tender["ticker"],
-                            tender["quantity"],
-                            securities_data[0]["position"],
-                        )
-                        profit_price = (
-                            tender["price"] - T3_MIN_PROFIT_MARGIN
-                            if squareoff_action == "BUY"
-                            else tender["price"] + T3_MIN_PROFIT_MARGIN
-                        )
-                        stoploss_price = (
-                            tender["price"] * (1 + T3_STOP_LOSS_PERCENT)
-                            if squareoff_action == "BUY"
-                            else tender["price"] * (1 - T3_STOP_LOSS_PERCENT)
+                for tender in tenders
+            ),
+            return_exceptions=True,
+        )
+        self.metrics.record_since("signal", start)
+
+        favourable = []
+        for tender, signal_response in zip(tenders, signals):
+            if isinstance(signal_response, Exception):
+                print(f"Signal failed for Tender-{tender['tender_id']}: {signal_response}")
+                continue
+            print(f"Signal analysed for Tender-{tender['tender_id']}: \n{signal_response}")
+            if signal_response[0]:
+                favourable.append((abs(tender["price"] - signal_response[1]), tender))
+
+        if not favourable:
+            print("Waiting for favorable condition to accept tender")
+            return []
+
+        favourable.sort(key=lambda edge_tender: edge_tender[0], reverse=True)
+        results = await asyncio.gather(
+            *(
+                self.accept_tender(tender)
+                for _, tender in favourable
+            ),
+            return_exceptions=True,
+        )
+        square_offs = []
+        for (_, tender), result in zip(favourable, results):
+            if isinstance(result, Exception):
+                print(f"An error occurred while accepting Tender-{tender['tender_id']}: {result}")
+            elif result is not None:
+                square_offs.append(result)
+        return square_offs
+
+    async def main(self):
+        end_of_time_hit = False
+        while True:
+            tender_response = []
+            try:
+                current_tick = await self.clock.current_tick()
+            except Exception as e:
+                current_tick = None
+                print(f"Unable to get current tick {e}")
+            if current_tick is None:
+                print("Current tick unknown, redo loop")
+                await asyncio.sleep(0.2)
+                continue
+            if current_tick == 0:
+                end_of_time_hit = False
+            if current_tick <= self.config.trade_until_tick:
+                print(f"Current tick is {current_tick}")
+                tender_response = await apis.query_tenders(self.auth)
+            else:
+                print(
+                    f"Current tick is {current_tick} more than cutoff time {self.config.trade_until_tick} end_of_time_hit:{end_of_time_hit}"
+                )
+                if not end_of_time_hit:
+                    print("End of period hit, squaring off all open positions")
+                    # First cancel all open orders
+                    await apis.cancel_all_open_order(self.auth, self.orders)
+                    asyncio.create_task(
+                        apis.market_square_off_all_tickers(
+                            self.auth,
+                            self.config.square_off_batch_size,
+                            self.positions,
+                            self.securities,
                         )
-                        if is_tender_processed:
-                            # asyncio.create_task(
-                            #     apis.stop_loss_square_off_ticker(AUTH, tender["tender_id"], tender["ticker"],
-                            #                                     profit_price, tender["quantity"], squareoff_action,
-                            #                                     stoploss_price=stoploss_price, batch_size=T3_BATCH_SIZE, square_off_time=T3_TRADE_UNTIL_TICK)
-                            # )
-                            # asyncio.create_task(
-                            #     apis.market_square_off_ticker(
-                            #         AUTH, tender["ticker"], T3_SQUARE_OFF_BATCH_SIZE
-                            #     )
-                            # )
-
-                            # asyncio.create_task(
-                            #     apis.limit_square_off_ticker(
-                            #         AUTH,
-                            #         tender["ticker"],
-                            #         squareoff_action,
-                            #         (
-                            #             tender["price"] + T3_MIN_PROFIT_MARGIN
-                            #             if squareoff_action == "SELL"
-                            #             else tender["price"] - T3_MIN_PROFIT_MARGIN
-                            #         ),
-                            #         tender["quantity"],
-                            #         T3_SQUARE_OFF_BATCH_SIZE,
-                            #     )
-                            # )
-
-                            asyncio.create_task(
-                                apis.limit_square_off_ticker_trend_adjusted_price(
-                                    AUTH,
-                                    tender["ticker"],
-                                    squareoff_action,
-                                    tender["price"],
-                                    tender["quantity"],
-                                    T3_SQUARE_OFF_BATCH_SIZE,
-                                )
-                            )
-
-                else:
-                    print(f"Waiting for favorable condition to accept tender")
-        await asyncio.sleep(1)
+                    )
+                    end_of_time_hit = True
+
+            if tender_response:
+                print(f"Details of tender received is: \n{tender_response}")
+                await self.process_tenders(tender_response)
+            # Tenders arrive and expire on ticks, so re-evaluate on the next one
+            await self.clock.wait_for_tick_change()
+
+    async def run(self):
+        if self.recorder is not None:
+            self.recorder.start()
+        self.clock.start()
+        self.securities.start()
+        self.positions.start()
+        self.orders.start()
+        self.time_sales.start()
+        self.book_cache.start()
+        self.depth_display.start()
+        if self.config.metrics_interval:
+            self.metrics.start(self.config.metrics_interval)
+        try:
+            if self.config.profile_dir:
+                with profile_session(self.config.profile_dir, "strategy3"):
+                    await self.main()
+            else:
+                await self.main()
+        finally:
+            await self.metrics.stop()
+            await self.depth_display.stop()
+            await self.book_cache.stop()
+            await self.time_sales.stop()
+            await self.orders.stop()
+            await self.positions.stop()
+            await self.securities.stop()
+            await self.clock.stop()
+            if self.recorder is not None:
+                await self.recorder.stop()
+            # Release the pooled keep-alive connections
+            await close_client(self.auth)
+            dump_metrics(self.config.metrics_path, self.metrics)
+
+
+def load_auth() -> AuthConfig:
+    """Reads the credentials from the environment (.env)."""
+    return {
+        "username": os.getenv("USERNAME"),
+        "password": os.getenv("PASSWORD"),
+        "server": os.getenv("SERVER"),
+        "port": os.getenv("PORT"),
+    }
 
 
 # Run the event loop
-asyncio.run(main())
+if __name__ == "__main__":
+    # Load environment variables from .env file
+    load_dotenv()
+    config = StrategyConfig.from_env()
+    print(
+        "Hyper parameters are\n"
+        + "\n".join(f"T3_{field.upper()}:{value}" for field, value in config)
+    )
+    asyncio.run(Strategy3(config, load_auth()).run())
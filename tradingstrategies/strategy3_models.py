@@ -0,0 +1,50 @@
+import os
+from typing import Literal, Optional
+from pydantic import BaseModel, Field
+
+
+class StrategyConfig(BaseModel):
+    """
+    Parameters of the tender strategy (strategy3).
+
+    Each field maps to a T3_<FIELD> environment variable, see from_env.
+    """
+
+    market_depth_points: int = Field(default=20, gt=0)
+    min_profit_margin: float = Field(default=0.20, ge=0)
+    trade_until_tick: int = Field(default=290, ge=0)
+    min_vwap_margin: float = Field(default=0.10)
+    stop_loss_percent: float = Field(default=0.01, ge=0)
+    batch_size: int = Field(default=2000, gt=0)
+    square_off_batch_size: int = Field(default=10000, gt=0)
+    # How accepted tenders are squared off:
+    #   trend      LIMIT orders repriced with the time and sales trend, MARKET near trade_until_tick
+    #   stop_loss  MARKET batches of batch_size once min_profit_margin is reached,
+    #              everything once the price moves stop_loss_percent against the tender
+    #   limit      one LIMIT order per batch_size at min_profit_margin from the tender price
+    square_off_mode: Literal["trend", "stop_loss", "limit"] = "trend"
+    book_poll_interval: float = Field(default=0.2, gt=0)
+    display_interval: float = Field(default=1.0, ge=0)
+    clock_poll_interval: float = Field(default=0.05, gt=0)
+    securities_poll_interval: float = Field(default=0.1, gt=0)
+    time_sales_poll_interval: float = Field(default=0.2, gt=0)
+    # Market data recording, <record_path>.idx/.dat, not recorded when unset
+    record_path: Optional[str] = None
+    # Latency summary every metrics_interval seconds (0 disables) and JSON dump at the end
+    metrics_interval: float = Field(default=10.0, ge=0)
+    metrics_path: Optional[str] = None
+    # cProfile and collapsed-stack samples of main, written per session, off when unset
+    profile_dir: Optional[str] = None
+    # Reads books from a shared_books.py publisher instead of polling them, by shared memory name
+    shared_books: Optional[str] = None
+
+    @classmethod
+    def from_env(cls, prefix: str = "T3_", **overrides):
+        """Reads every field from its environment variable, overrides win over both."""
+        values = {
+            field: os.getenv(f"{prefix}{field.upper()}")
+            for field in cls.model_fields
+            if os.getenv(f"{prefix}{field.upper()}") is not None
+        }
+        values.update(overrides)
+        return cls(**values)
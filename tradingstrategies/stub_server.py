@@ -0,0 +1,86 @@
+import asyncio, json
+from urllib.parse import urlsplit, parse_qsl
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    401: "Unauthorized",
+    404: "Not Found",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+}
+
+
+def default_handler(method: str, path: str, params: dict):
+    """Answers every request with a fixed case payload."""
+    return 200, {
+        "name": "STUB",
+        "period": 1,
+        "tick": 1,
+        "ticks_per_period": 300,
+        "total_periods": 1,
+        "status": "ACTIVE",
+        "is_enforce_trading_limits": False,
+    }
+
+
+async def _handle_connection(reader, writer, handler):
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+            content_length = 0
+            keep_alive = True
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                name = name.strip().lower()
+                if name == "content-length":
+                    content_length = int(value)
+                elif name == "connection" and value.strip().lower() == "close":
+                    keep_alive = False
+            if content_length:
+                await reader.readexactly(content_length)
+
+            url = urlsplit(target)
+            try:
+                status, payload = handler(method, url.path, dict(parse_qsl(url.query)))
+            except Exception as e:
+                status, payload = 500, {"code": "INTERNAL_ERROR", "message": str(e)}
+            body = json.dumps(payload).encode()
+            headers = [
+                f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}",
+                "Content-Type: application/json",
+                f"Content-Length: {len(body)}",
+                "Connection: keep-alive" if keep_alive else "Connection: close",
+            ]
+            writer.write(("\r\n".join(headers) + "\r\n\r\n").encode() + body)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_stub_server(handler=default_handler, host="127.0.0.1", port=0):
+    """
+    Starts a minimal HTTP/1.1 keep-alive server on localhost.
+
+    Args:
+        handler: Callable taking (method, path, params) and returning (status, json payload).
+        host: Interface to bind.
+        port: Port to bind, 0 picks a free port.
+
+    Returns:
+        The asyncio server and the port it is listening on.
+    """
+    server = await asyncio.start_server(
+        lambda r, w: _handle_connection(r, w, handler), host, port
+    )
+    return server, server.sockets[0].getsockname()[1]
@@ -0,0 +1,240 @@
+import asyncio, json, multiprocessing, queue, sys, time
+from client import close_client, get_client
+from metrics import Metrics
+from strategy3 import Strategy3
+from strategy3_models import StrategyConfig
+from supervisor_models import InstanceConfig, SupervisorConfig
+from vwap_models import TradeConfig
+from vwap_strategy import run_vwap_orders
+
+
+class Instance:
+    """
+    One strategy with its own credentials, connection pool and latency metrics.
+
+    Health and throughput are counted from the responses of its client.
+    """
+
+    def __init__(self, config: InstanceConfig, stale_after: float = 5.0):
+        self.config = config
+        self.auth = config.auth.model_dump()
+        self.stale_after = stale_after
+        self.metrics = Metrics()
+        self.state = "pending"  # pending, running, restarting, stopped or failed
+        self.error = None
+        self.restarts = 0
+        self.requests = 0
+        self.errors = 0  # responses with a 4xx or 5xx status, see failures for the rest
+        self.orders = 0  # orders accepted
+        self.started_at = None
+        self.last_response_at = None
+        self._rate_mark = (time.monotonic(), 0)
+
+    def _on_response(self, method: str, path: str, params, response):
+        self.requests += 1
+        self.last_response_at = time.monotonic()
+        if response.status_code >= 400:
+            self.errors += 1
+        elif method == "POST" and path == "/v1/orders":
+            self.orders += 1
+
+    def _strategy(self):
+        """Returns the coroutine running the configured strategy."""
+        if self.config.strategy == "strategy3":
+            config = StrategyConfig(**{"display_interval": 0, **self.config.config})
+            return Strategy3(config, self.auth, metrics=self.metrics).run()
+        orders = [
+            TradeConfig(**self.auth, **order) for order in self.config.config.get("orders", [])
+        ]
+        return run_vwap_orders(
+            orders, use_volume_profile=self.config.config.get("use_volume_profile", False)
+        )
+
+    async def run(self):
+        """Runs the strategy, restarting it up to max_restarts times if it raises."""
+        while True:
+            client = get_client(self.auth, self.config.client, metrics=self.metrics)
+            client.add_listener(self._on_response)
+            self.state = "running"
+            self.started_at = time.monotonic()
+            try:
+                await self._strategy()
+                self.state = "stopped"
+                return
+            except asyncio.CancelledError:
+                self.state = "stopped"
+                raise
+            except Exception as e:
+                self.error = repr(e)
+                print(f"Instance {self.config.name} failed: {e}")
+                if self.restarts >= self.config.max_restarts:
+                    self.state = "failed"
+                    return
+                self.restarts += 1
+                self.state = "restarting"
+                await asyncio.sleep(1)
+            finally:
+                await close_client(self.auth)
+
+    @property
+    def failures(self) -> int:
+        """Requests that got no response, counted by the client's metrics."""
+        return sum(
+            histogram.count
+            for name, histogram in self.metrics.histograms.items()
+            if name.endswith(" error")
+        )
+
+    @property
+    def healthy(self) -> bool:
+        if self.state != "running":
+            return False
+        last = self.last_response_at or self.started_at
+        return time.monotonic() - last < self.stale_after
+
+    def status(self) -> dict:
+        """Health and throughput since the previous call."""
+        now = time.monotonic()
+        mark, requests = self._rate_mark
+        self._rate_mark = (now, self.requests)
+        order_latency = self.metrics.histograms.get("POST /v1/orders 200")
+        return {
+            "name": self.config.name,
+            "strategy": self.config.strategy,
+            "state": self.state,
+            "healthy": self.healthy,
+            "restarts": self.restarts,
+            "requests": self.requests,
+            "errors": self.errors + self.failures,
+            "orders": self.orders,
+            "requests_per_second": (self.requests - requests) / (now - mark) if now > mark else 0.0,
+            "order_p99_ms": order_latency.percentile(99) / 1000 if order_latency else None,
+            "error": self.error,
+        }
+
+
+def format_report(statuses: list) -> str:
+    lines = [
+        f"{'instance':<16}{'strategy':<11}{'state':<12}{'health':<8}{'req/s':>8}"
+        f"{'requests':>10}{'errors':>8}{'orders':>8}{'order p99 ms':>14}"
+    ]
+    for status in statuses:
+        p99 = status["order_p99_ms"]
+        health = "-" if status["state"] != "running" else "ok" if status["healthy"] else "STALE"
+        lines.append(
+            f"{status['name']:<16}{status['strategy']:<11}{status['state']:<12}"
+            f"{health:<8}{status['requests_per_second']:>8.1f}"
+            f"{status['requests']:>10}{status['errors']:>8}{status['orders']:>8}"
+            f"{'-' if p99 is None else f'{p99:.2f}':>14}"
+        )
+        if status["error"]:
+            lines.append(f"  last error: {status['error']}")
+    return "\n".join(lines)
+
+
+async def _report(instances: list, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        print(format_report([instance.status() for instance in instances]))
+
+
+async def run_instances(config: SupervisorConfig) -> list:
+    """Runs every instance concurrently on the running event loop, returns their final status."""
+    instances = [Instance(instance, config.stale_after) for instance in config.instances]
+    reporter = asyncio.create_task(_report(instances, config.report_interval))
+    try:
+        await asyncio.gather(*(instance.run() for instance in instances))
+    finally:
+        reporter.cancel()
+        await asyncio.gather(reporter, return_exceptions=True)
+    statuses = [instance.status() for instance in instances]
+    print(format_report(statuses))
+    return statuses
+
+
+def _process_main(config_json: str, stale_after: float, interval: float, statuses):
+    """Worker process entry point, sends the instance's status every interval."""
+    instance = Instance(InstanceConfig.model_validate_json(config_json), stale_after)
+
+    async def main():
+        async def report():
+            while True:
+                await asyncio.sleep(interval)
+                statuses.put(instance.status())
+
+        reporter = asyncio.create_task(report())
+        try:
+            await instance.run()
+        finally:
+            reporter.cancel()
+            await asyncio.gather(reporter, return_exceptions=True)
+            statuses.put(instance.status())
+
+    asyncio.run(main())
+
+
+def run_processes(config: SupervisorConfig) -> list:
+    """Runs every instance in its own worker process, the parent only reports."""
+    context = multiprocessing.get_context("spawn")
+    statuses = context.Queue()
+    workers = {
+        instance.name: context.Process(
+            target=_process_main,
+            args=(instance.model_dump_json(), config.stale_after, config.report_interval, statuses),
+            name=instance.name,
+        )
+        for instance in config.instances
+    }
+    latest = {
+        instance.name: {
+            "name": instance.name,
+            "strategy": instance.strategy,
+            "state": "pending",
+            "healthy": False,
+            "restarts": 0,
+            "requests": 0,
+            "errors": 0,
+            "orders": 0,
+            "requests_per_second": 0.0,
+            "order_p99_ms": None,
+            "error": None,
+        }
+        for instance in config.instances
+    }
+    for worker in workers.values():
+        worker.start()
+    try:
+        next_report = time.monotonic() + config.report_interval
+        while any(worker.is_alive() for worker in workers.values()) or not statuses.empty():
+            try:
+                status = statuses.get(timeout=max(0.0, next_report - time.monotonic()))
+                latest[status["name"]] = status
+            except queue.Empty:
+                pass
+            if time.monotonic() >= next_report:
+                print(format_report(list(latest.values())))
+                next_report += config.report_interval
+    finally:
+        for worker in workers.values():
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+    for name, worker in workers.items():
+        if worker.exitcode and latest[name]["state"] not in ("stopped", "failed"):
+            latest[name].update(state="failed", healthy=False, error=f"exit code {worker.exitcode}")
+    print(format_report(list(latest.values())))
+    return list(latest.values())
+
+
+def supervise(config: SupervisorConfig) -> list:
+    if config.processes:
+        return run_processes(config)
+    return asyncio.run(run_instances(config))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: supervisor.py <supervisor.json>")
+        sys.exit(1)
+    with open(sys.argv[1]) as f:
+        supervise(SupervisorConfig.model_validate(json.load(f)))
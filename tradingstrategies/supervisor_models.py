@@ -0,0 +1,43 @@
+from typing import Literal, Optional
+from pydantic import BaseModel, Field, model_validator
+from models import AuthConfig, ClientConfig
+
+
+class InstanceConfig(BaseModel):
+    """
+    One strategy instance of the supervisor.
+
+    config holds the strategy's own parameters: StrategyConfig fields for
+    strategy3, {"orders": [{ticker, number_of_shares_to_fill,
+    number_of_trades, action}, ...], "use_volume_profile": bool} for vwap.
+    """
+
+    name: str
+    strategy: Literal["strategy3", "vwap"]
+    auth: AuthConfig
+    config: dict = Field(default_factory=dict)
+    client: Optional[ClientConfig] = None
+    max_restarts: int = Field(default=0, ge=0)
+
+
+class SupervisorConfig(BaseModel):
+    instances: list[InstanceConfig]
+    # Run every instance in its own worker process instead of one event loop
+    processes: bool = False
+    report_interval: float = Field(default=10.0, gt=0)
+    # An instance without a response for this long is reported unhealthy
+    stale_after: float = Field(default=5.0, gt=0)
+
+    @model_validator(mode="after")
+    def check_unique_instances(self):
+        names = [instance.name for instance in self.instances]
+        if len(set(names)) != len(names):
+            raise ValueError("Instance names must be unique")
+        # Clients are pooled by credentials, instances must not share one
+        auths = [
+            (instance.auth.server, instance.auth.port, instance.auth.username)
+            for instance in self.instances
+        ]
+        if len(set(auths)) != len(auths):
+            raise ValueError("Instances must not share server, port and username")
+        return self
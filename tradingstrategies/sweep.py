@@ -0,0 +1,131 @@
+import contextlib, itertools, json, os, random, sys, time
+from concurrent.futures import ProcessPoolExecutor
+from backtest import backtest_strategy3
+from strategy3_models import StrategyConfig
+
+
+def grid(space: dict) -> list:
+    """Every combination of {parameter: [values]}."""
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*space.values())]
+
+
+def random_search(space: dict, samples: int, seed: int = 0) -> list:
+    """
+    samples random combinations of the space.
+
+    A list is sampled uniformly, a [low, high] pair under a "range" key
+    e.g. {"min_profit_margin": {"range": [0.05, 0.5]}} is sampled from the
+    interval, as an int when both bounds are ints.
+    """
+    rng = random.Random(seed)
+    candidates = []
+    for _ in range(samples):
+        params = {}
+        for name, values in space.items():
+            if isinstance(values, dict):
+                low, high = values["range"]
+                if isinstance(low, int) and isinstance(high, int):
+                    params[name] = rng.randint(low, high)
+                else:
+                    params[name] = round(rng.uniform(low, high), 4)
+            else:
+                params[name] = rng.choice(values)
+        candidates.append(params)
+    return candidates
+
+
+# Defaults for every job, parallel runs must not share the environment's output paths
+JOB_DEFAULTS = {
+    "display_interval": 0,
+    "record_path": None,
+    "metrics_path": None,
+    "profile_dir": None,
+    "shared_books": None,
+}
+
+
+def _run_one(job: tuple) -> dict:
+    """Backtests one (session, params) in a worker process, returns a result row."""
+    session, params = job
+    config = StrategyConfig.from_env(**{**JOB_DEFAULTS, **params})
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        result = backtest_strategy3(session, config)
+    return {
+        "session": session,
+        **params,
+        "pnl": result.pnl,
+        "realized": result.realized,
+        "unrealized": result.unrealized,
+        "slippage": result.slippage,
+        "fill_rate": result.fill_rate,
+        "orders": result.orders,
+        "tenders_accepted": result.tenders_accepted,
+        "elapsed": result.elapsed,
+    }
+
+
+def sweep(sessions: list, candidates: list, workers: int = None) -> list:
+    """Backtests every candidate on every session across worker processes."""
+    jobs = [(session, params) for params in candidates for session in sessions]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_run_one, jobs))
+
+
+def to_columns(rows: list) -> dict:
+    columns = {}
+    for row in rows:
+        for name in row:
+            columns.setdefault(name, [])
+    return {name: [row.get(name) for row in rows] for name in columns}
+
+
+def write_results(path: str, rows: list):
+    """Writes the rows column by column: {"columns": {name: [values]}}."""
+    with open(path, "w") as f:
+        json.dump({"rows": len(rows), "columns": to_columns(rows)}, f)
+
+
+def read_results(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)["columns"]
+
+
+def summarize(rows: list, top: int = 10):
+    """Prints the best candidates by P&L summed over the sessions."""
+    totals = {}
+    for row in rows:
+        params = tuple(
+            (name, value)
+            for name, value in row.items()
+            if name in StrategyConfig.model_fields
+        )
+        totals.setdefault(params, []).append(row["pnl"])
+    ranked = sorted(totals.items(), key=lambda item: sum(item[1]), reverse=True)
+    for params, pnls in ranked[:top]:
+        print(f"pnl:{sum(pnls):>12.2f} sessions:{len(pnls)} {dict(params)}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        print(
+            "usage: sweep.py <space.json> <results.json> <session.jsonl>...\n"
+            'space.json: {"grid": {param: [values]}} or '
+            '{"random": {param: [values] | {"range": [low, high]}}, "samples": n, "seed": s}'
+        )
+        sys.exit(1)
+    with open(sys.argv[1]) as f:
+        spec = json.load(f)
+    if "grid" in spec:
+        candidates = grid(spec["grid"])
+    else:
+        candidates = random_search(spec["random"], spec["samples"], spec.get("seed", 0))
+    sessions = sys.argv[3:]
+    start = time.perf_counter()
+    rows = sweep(sessions, candidates, spec.get("workers"))
+    write_results(sys.argv[2], rows)
+    print(
+        f"{len(rows)} backtests of {len(candidates)} candidates in "
+        f"{time.perf_counter() - start:.1f}s, results in {sys.argv[2]}"
+    )
+    summarize(rows)
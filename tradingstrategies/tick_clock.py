@@ -0,0 +1,117 @@
+import asyncio
+from typing import Optional
+import apis
+from models import AuthConfig
+
+
+class TickClock:
+    """
+    Central case clock.
+
+    One task polls /v1/case and wakes every waiter when the tick, period or
+    status changes, so strategies wait on the clock instead of each polling
+    the case endpoint on their own fixed sleep.
+    """
+
+    def __init__(self, auth: AuthConfig, interval: float = 0.05):
+        self.auth = auth
+        self.interval = interval
+        self.case = None  # latest /v1/case response
+        self.period = None
+        self.tick = None
+        self.status = None
+        self._callbacks = []
+        self._changed = asyncio.Condition()
+        self._task = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def ticks_per_period(self) -> Optional[int]:
+        return self.case["ticks_per_period"] if self.case else None
+
+    def on_tick(self, callback):
+        """Registers callback(period, tick), called on every tick change."""
+        self._callbacks.append(callback)
+
+    async def refresh(self) -> bool:
+        """Polls the case once and wakes waiters if anything changed."""
+        case_data = await apis.query_case_status(self.auth)
+        if case_data is None:
+            return False
+        changed = (case_data["period"], case_data["tick"], case_data["status"]) != (
+            self.period,
+            self.tick,
+            self.status,
+        )
+        self.case = case_data
+        if changed:
+            self.period = case_data["period"]
+            self.tick = case_data["tick"]
+            self.status = case_data["status"]
+            for callback in self._callbacks:
+                callback(self.period, self.tick)
+            async with self._changed:
+                self._changed.notify_all()
+        return changed
+
+    async def current_tick(self) -> Optional[int]:
+        """Returns the latest tick, polling once if the clock has not seen the case yet."""
+        if self.tick is None:
+            await self.refresh()
+        return self.tick
+
+    async def _wait(self, predicate, timeout: Optional[float] = None) -> bool:
+        async with self._changed:
+            try:
+                await asyncio.wait_for(self._changed.wait_for(predicate), timeout)
+                return True
+            except asyncio.TimeoutError:
+                return False
+
+    async def wait_for_tick_change(self, timeout: Optional[float] = None) -> bool:
+        """Waits for the next tick or period change, returns False on timeout."""
+        current = (self.period, self.tick)
+        return await self._wait(lambda: (self.period, self.tick) != current, timeout)
+
+    async def wait_for_tick(self, tick: int, timeout: Optional[float] = None) -> bool:
+        """Waits until the current period reaches tick, or the period changes."""
+        period = self.period
+        return await self._wait(
+            lambda: self.tick is not None and (self.tick >= tick or self.period != period),
+            timeout,
+        )
+
+    async def wait_ticks(self, ticks: int, timeout: Optional[float] = None) -> bool:
+        """Waits for ticks more ticks to elapse in the current period."""
+        await self.current_tick()
+        return await self.wait_for_tick(self.tick + ticks, timeout)
+
+    async def wait_for_period_change(self, timeout: Optional[float] = None) -> bool:
+        period = self.period
+        return await self._wait(lambda: self.period != period, timeout)
+
+    async def _poll(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Error polling case status: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Starts the case poller on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._poll())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
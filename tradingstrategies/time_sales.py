@@ -0,0 +1,168 @@
+import asyncio
+from array import array
+from typing import Optional
+import apis
+from models import AuthConfig, TimeSalesParams
+
+
+class TimeSalesRing:
+    """
+    Fixed-size ring buffer of time & sales prints for one ticker.
+
+    Prints are stored column-wise in typed arrays. Volume and notional over
+    the prints currently held are maintained on every append, so rolling
+    VWAP, volume and last price are O(1).
+    """
+
+    def __init__(self, ticker: str, capacity: int = 1024):
+        self.ticker = ticker
+        self.capacity = capacity
+        self.prices = array("d", bytes(8 * capacity))
+        # Doubles, quantities arrive as floats from the API
+        self.quantities = array("d", bytes(8 * capacity))
+        self.ticks = array("q", bytes(8 * capacity))
+        self.ids = array("q", bytes(8 * capacity))
+        self.count = 0  # prints held, at most capacity
+        self.total = 0  # prints ever appended
+        self.volume = 0.0
+        self.notional = 0.0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, print_id: int, tick: int, price: float, quantity: float):
+        slot = self.total % self.capacity
+        if self.count == self.capacity:
+            # Evict the oldest print from the rolling aggregates
+            self.volume -= self.quantities[slot]
+            self.notional -= self.prices[slot] * self.quantities[slot]
+        else:
+            self.count += 1
+        self.prices[slot] = price
+        self.quantities[slot] = quantity
+        self.ticks[slot] = tick
+        self.ids[slot] = print_id
+        self.volume += quantity
+        self.notional += price * quantity
+        self.total += 1
+
+    @property
+    def last_price(self) -> Optional[float]:
+        return self.prices[(self.total - 1) % self.capacity] if self.total else None
+
+    @property
+    def last_id(self) -> Optional[int]:
+        return self.ids[(self.total - 1) % self.capacity] if self.total else None
+
+    @property
+    def vwap(self) -> Optional[float]:
+        """VWAP of the prints currently held."""
+        return self.notional / self.volume if self.volume else None
+
+    def latest(self, n: int) -> list:
+        """Returns up to n most recent prints as (id, tick, price, quantity), newest first."""
+        return [
+            (self.ids[slot], self.ticks[slot], self.prices[slot], self.quantities[slot])
+            for slot in (
+                (self.total - 1 - i) % self.capacity for i in range(min(n, self.count))
+            )
+        ]
+
+
+class TimeSalesIngester:
+    """
+    Streams time & sales for a set of tickers into ring buffers.
+
+    Each ticker keeps a cursor on the last print ID seen and polls with
+    after=<cursor>, so only new prints cross the wire. A new ticker starts
+    from its latest page of prints instead of the whole period's history.
+    """
+
+    def __init__(
+        self,
+        auth: AuthConfig,
+        tickers=(),
+        interval: float = 0.2,
+        capacity: int = 1024,
+        page_size: int = 100,
+    ):
+        self.auth = auth
+        self.interval = interval
+        self.capacity = capacity
+        self.page_size = page_size
+        self.rings = {}  # ticker -> TimeSalesRing
+        self.cursors = {}  # ticker -> last print ID ingested, None until seeded
+        self._task = None
+        for ticker in tickers:
+            self.subscribe(ticker)
+
+    def subscribe(self, ticker: str) -> TimeSalesRing:
+        ring = self.rings.get(ticker)
+        if ring is None:
+            ring = self.rings[ticker] = TimeSalesRing(ticker, self.capacity)
+            self.cursors[ticker] = None
+        return ring
+
+    def last_price(self, ticker: str) -> Optional[float]:
+        ring = self.rings.get(ticker)
+        return ring.last_price if ring else None
+
+    def vwap(self, ticker: str) -> Optional[float]:
+        ring = self.rings.get(ticker)
+        return ring.vwap if ring else None
+
+    def _ingest(self, ring: TimeSalesRing, page: list) -> int:
+        new_prints = 0
+        cursor = self.cursors[ring.ticker] or 0
+        # Prints come newest first
+        for sale in sorted(page, key=lambda sale: sale["id"]):
+            if sale["id"] > cursor:
+                ring.append(sale["id"], sale["tick"], sale["price"], sale["quantity"])
+                cursor = sale["id"]
+                new_prints += 1
+        self.cursors[ring.ticker] = cursor
+        return new_prints
+
+    async def poll(self, ticker: str) -> int:
+        """Fetches every print after the cursor, returns how many were new."""
+        ring = self.subscribe(ticker)
+        if self.cursors[ticker] is None:
+            # Seed from the latest page, paging in the period's history would stall the first poll
+            page = await apis.query_time_and_sales(
+                self.auth, TimeSalesParams(ticker=ticker, limit=self.page_size)
+            )
+            if page is None:
+                return 0
+            return self._ingest(ring, page)
+        page = await apis.query_time_and_sales_after(
+            self.auth, ticker, self.cursors[ticker], page_size=self.page_size
+        )
+        if not page:
+            return 0
+        return self._ingest(ring, page)
+
+    async def _run(self):
+        while True:
+            results = await asyncio.gather(
+                *(self.poll(ticker) for ticker in list(self.rings)),
+                return_exceptions=True,
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    print(f"Error ingesting time and sales: {result}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Starts the ingestion task on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
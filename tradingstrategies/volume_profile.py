@@ -0,0 +1,109 @@
+from array import array
+from itertools import accumulate
+from typing import Optional
+import apis
+from client import auth_key
+from models import AuthConfig
+
+
+class VolumeProfile:
+    """
+    Expected intraday volume curve of one ticker, indexed by tick.
+
+    cumulative[t] is the expected volume traded before tick t, so the
+    volume expected in any window is a single subtraction.
+    """
+
+    def __init__(self, ticker: str, period: int, volumes):
+        self.ticker = ticker
+        self.period = period
+        self.cumulative = array("d", accumulate(volumes, initial=0.0))
+
+    @property
+    def ticks_per_period(self) -> int:
+        return len(self.cumulative) - 1
+
+    @classmethod
+    def uniform(cls, ticker: str, period: int, ticks_per_period: int):
+        return cls(ticker, period, [1.0] * ticks_per_period)
+
+    @classmethod
+    def from_time_and_sales(
+        cls,
+        ticker: str,
+        period: int,
+        ticks_per_period: int,
+        prints: list,
+        prior_weight: float = 0.1,
+    ):
+        """
+        Builds the curve from time & sales prints of one period.
+
+        Every tick also gets prior_weight times the mean observed volume, so
+        ticks with no prints still receive a small share of the order.
+        """
+        volumes = [0.0] * ticks_per_period
+        for sale in prints:
+            tick = min(max(int(sale["tick"]), 1), ticks_per_period)
+            volumes[tick - 1] += sale["quantity"]
+        prior = prior_weight * sum(volumes) / ticks_per_period or 1.0
+        return cls(ticker, period, [volume + prior for volume in volumes])
+
+    def expected_volume(self, start_tick: int, end_tick: int) -> float:
+        """Returns the volume expected from start_tick (inclusive) to end_tick (exclusive)."""
+        start = min(max(start_tick, 1), self.ticks_per_period + 1) - 1
+        end = min(max(end_tick, 1), self.ticks_per_period + 1) - 1
+        return self.cumulative[end] - self.cumulative[start] if end > start else 0.0
+
+    def slice_quantity(
+        self, remaining: int, start_tick: int, window_end: int, horizon_end: int
+    ) -> int:
+        """
+        Sizes the next child order to the share of remaining volume expected in its window.
+
+        Args:
+            remaining: Shares still to fill, from actual fills.
+            start_tick: Tick the slice is sent at.
+            window_end: Tick the next slice is due at.
+            horizon_end: Tick the parent order must be done by.
+        """
+        horizon_volume = self.expected_volume(start_tick, horizon_end)
+        if horizon_volume <= 0:
+            return remaining
+        share = self.expected_volume(start_tick, window_end) / horizon_volume
+        return min(remaining, round(remaining * share))
+
+
+# (server, port, ticker, period) -> VolumeProfile
+_profiles: dict = {}
+
+
+async def fetch_time_and_sales(
+    auth: AuthConfig, ticker: str, period: Optional[int] = None, page_size: int = 1000
+) -> list:
+    """Fetches every print of a period."""
+    prints = await apis.query_time_and_sales_after(auth, ticker, 0, period, page_size)
+    return prints or []
+
+
+async def load_volume_profile(
+    auth: AuthConfig, ticker: str, period: int, ticks_per_period: int
+) -> VolumeProfile:
+    """
+    Returns the volume curve of ticker for period, cached per ticker and period.
+
+    RIT OHLC bars carry no volume, so the curve is built from time & sales.
+    Falls back to a uniform curve when the period has no prints.
+    """
+    key = (*auth_key(auth)[:2], ticker, period)
+    profile = _profiles.get(key)
+    if profile is None:
+        prints = await fetch_time_and_sales(auth, ticker, period)
+        if prints:
+            profile = VolumeProfile.from_time_and_sales(
+                ticker, period, ticks_per_period, prints
+            )
+        else:
+            profile = VolumeProfile.uniform(ticker, period, ticks_per_period)
+        _profiles[key] = profile
+    return profile
@@ -1,14 +1,23 @@
 import apis
-import os
+import asyncio, httpx
+from dataclasses import asdict
+from typing import Optional
+from client import auth_key
 from utility import pretty_print
-from models import CaseDataResponse, OrderRequest, OrderResponse, OrderStatus
+from models import OrderRequest, OrderStatus
+from records import CaseRecord, OrderRecord, from_dict
+from tick_clock import TickClock
+from volume_profile import load_volume_profile
 from vwap_models import TradeConfig
-import time
-import sys
 
 
 class VWAPStrategy:
-    def __init__(self, config: TradeConfig):
+    def __init__(
+        self,
+        config: TradeConfig,
+        clock: Optional[TickClock] = None,
+        use_volume_profile: bool = False,
+    ):
         # Authentication details
         self.auth = {
             "username": config.username,
@@ -23,27 +32,151 @@ class VWAPStrategy:
         self.number_of_trades = config.number_of_trades
         self.action = config.action
 
-        # Fetch case data
-        case_data = CaseDataResponse.model_validate(apis.query_case_status(self.auth))
-        self.current_tick = case_data.tick
-        self.ticks_per_period = case_data.ticks_per_period
+        # Child slices are scheduled on case ticks, the clock can be shared between parents
+        self.clock = clock or TickClock(self.auth)
+        self.start_tick = None
+        self.trade_size = None
+        self.ticks_between_trades = None
 
-        # Calculate trade size and time between trades
+        # Size slices to the historical volume curve instead of equal TWAP slices
+        self.use_volume_profile = use_volume_profile
+        self.volume_profile = None
+
+        # Fills are tracked per child order ID
+        self.fills = {}  # order_id -> OrderRecord
+        # Child order IDs placed or recovered, shared by parents on the same case
+        # so a post without response never adopts a sibling's identical order
+        self.claimed_orders = set()
+        # Extra attempts for a child order that was not placed
+        self.post_retries = 3
+
+    async def plan(self):
+        """Fetches case data and splits the parent order into child slices."""
+        case_data = from_dict(CaseRecord, await apis.query_case_status(self.auth))
+        self.start_tick = case_data.tick
+        ticks_per_period = case_data.ticks_per_period
+
+        # Calculate trade size and ticks between trades
         self.trade_size = self.number_of_shares_to_fill // self.number_of_trades
-        self.time_between_trades = int(
-            (self.ticks_per_period - self.current_tick) / self.number_of_trades
+        self.ticks_between_trades = int(
+            (ticks_per_period - self.start_tick) / self.number_of_trades
         )
 
         # Adjust if there's only one trade
-        if self.time_between_trades <= 1:
+        if self.ticks_between_trades <= 1:
             self.number_of_trades = 1
             self.trade_size = self.number_of_shares_to_fill
 
-    def execute_trade(self, trade_index, is_order_detail_allowed=True):
-        quantity = self.trade_size
-        # For last trade, get left over value, as some might be fractional
-        if self.number_of_trades != 1 and trade_index == self.number_of_trades - 1:
-            quantity = self.number_of_shares_to_fill - trade_index * self.trade_size
+        if self.use_volume_profile:
+            # Use the previous period's curve, the current one is still being traded
+            profile_period = max(case_data.period - 1, 1)
+            self.volume_profile = await load_volume_profile(
+                self.auth, self.ticker, profile_period, ticks_per_period
+            )
+
+    @property
+    def filled_quantity(self) -> float:
+        return sum(order.quantity_filled for order in self.fills.values())
+
+    @property
+    def average_price(self) -> Optional[float]:
+        filled = self.filled_quantity
+        if not filled:
+            return None
+        return (
+            sum(order.quantity_filled * (order.vwap or 0) for order in self.fills.values())
+            / filled
+        )
+
+    async def track_fill(self, order: OrderRecord, is_order_detail_allowed=True):
+        """Follows one child order by ID until it is no longer OPEN."""
+        while order.status == "OPEN":
+            await self.clock.wait_for_tick_change(timeout=1)
+            order_data = await apis.query_order_details(self.auth, order.order_id)
+            # A failed query keeps the previous record, the next tick retries
+            if order_data is not None:
+                order = from_dict(OrderRecord, order_data)
+        self.fills[order.order_id] = order
+        if is_order_detail_allowed:
+            pretty_print(asdict(order))
+        return order
+
+    def slice_quantity(self, trade_index) -> int:
+        """Returns the size of the next child order."""
+        if self.volume_profile is None:
+            # For last trade, get left over value, as some might be fractional
+            if self.number_of_trades != 1 and trade_index == self.number_of_trades - 1:
+                return self.number_of_shares_to_fill - trade_index * self.trade_size
+            return self.trade_size
+
+        # Re-plan from actual fills: split what is left by the expected volume
+        remaining = int(self.number_of_shares_to_fill - self.filled_quantity)
+        if trade_index == self.number_of_trades - 1:
+            return remaining
+        current_tick = self.clock.tick if self.clock.tick is not None else self.start_tick
+        return self.volume_profile.slice_quantity(
+            remaining,
+            current_tick,
+            self.start_tick + (trade_index + 1) * self.ticks_between_trades,
+            self.start_tick + self.number_of_trades * self.ticks_between_trades,
+        )
+
+    async def find_order(self, order_details: OrderRequest, since_tick: int):
+        """
+        Looks for a child order whose post got no response, it may still have been placed.
+
+        Returns:
+            The order's JSON if it was placed, {} if it was not,
+            None if the orders could not be queried.
+        """
+        for status in (OrderStatus.OPEN, OrderStatus.TRANSACTED):
+            orders = await apis.query_orders(self.auth, status)
+            if orders is None:
+                return None
+            for order in orders:
+                if (
+                    order["order_id"] not in self.claimed_orders
+                    and order["ticker"] == order_details.ticker
+                    and order["type"] == order_details.type
+                    and order["action"] == order_details.action
+                    and order["quantity"] == order_details.quantity
+                    and order["tick"] >= since_tick
+                ):
+                    self.claimed_orders.add(order["order_id"])
+                    return order
+        return {}
+
+    async def place_order(self, order_details: OrderRequest):
+        """
+        Posts a child order, re-posting it on the next tick only once the
+        exchange shows it was not placed.
+
+        Returns:
+            The order's JSON, or None if it was not placed.
+        """
+        since_tick = await self.clock.current_tick() or self.start_tick or 0
+        order_data = await apis.post_order(self.auth, order_details)
+        for _ in range(self.post_retries):
+            if order_data is not None:
+                self.claimed_orders.add(order_data["order_id"])
+                return order_data
+            # A timed out post may have executed, never send the order twice
+            order_data = await self.find_order(order_details, since_tick)
+            if order_data is None:
+                return None
+            if order_data:
+                return order_data
+            await self.clock.wait_for_tick_change(timeout=1)
+            order_data = await apis.post_order(self.auth, order_details)
+        if order_data is not None:
+            self.claimed_orders.add(order_data["order_id"])
+        return order_data
+
+    async def execute_trade(self, trade_index, is_order_detail_allowed=True):
+        quantity = self.slice_quantity(trade_index)
+        if quantity <= 0:
+            print(f"Skipping trade {trade_index + 1} for {self.ticker}, nothing to fill")
+            return None
 
         # Order parameters
         order_details = OrderRequest(
@@ -54,32 +187,88 @@ class VWAPStrategy:
             dry_run=0,
         )
 
-        # Post order
-        OrderResponse.model_validate(apis.post_order(self.auth, order_details))
+        try:
+            order_data = await self.place_order(order_details)
+        except httpx.HTTPStatusError as e:
+            # Still throttled after the client's retries
+            print(f"Skipping trade {trade_index + 1} for {self.ticker}: {e}")
+            return None
+        if order_data is None:
+            print(f"Skipping trade {trade_index + 1} for {self.ticker}, the order was not placed")
+            return None
+        order = from_dict(OrderRecord, order_data)
         print(
             f"Executed trade {trade_index + 1} for {self.ticker} with {quantity} shares ....... \n"
         )
+        return await self.track_fill(order, is_order_detail_allowed)
 
-        # Query order details
-        order_detail = apis.query_orders(self.auth, OrderStatus.TRANSACTED)
-        if is_order_detail_allowed:
-            pretty_print(order_detail)
-
-    def is_trading_active(self):
-        case_data = CaseDataResponse.model_validate(apis.query_case_status(self.auth))
+    async def is_trading_active(self):
+        case_data = from_dict(CaseRecord, await apis.query_case_status(self.auth))
         return case_data.status == "ACTIVE"
 
-    def start(self, is_order_detail_allowed=True):
-        if not self.is_trading_active():
-            sys.stdout.write(f"\rTrading is not active\n")
+    async def start(self, is_order_detail_allowed=True):
+        if not await self.is_trading_active():
+            print("Trading is not active")
             return
 
-        for i in range(0, self.number_of_trades):
-            self.execute_trade(i, is_order_detail_allowed)
+        await self.plan()
+        owns_clock = not self.clock.is_running
+        if owns_clock:
+            self.clock.start()
+        try:
+            for i in range(0, self.number_of_trades):
+                await self.execute_trade(i, is_order_detail_allowed)
 
-            # Sleep before placing the next order (skip sleep after the last trade)
-            if i < self.number_of_trades - 1:
-                for remaining in range(self.time_between_trades, 0, -1):
-                    sys.stdout.write(f"\rWaiting... {remaining} seconds  ")
-                    sys.stdout.flush()
-                    time.sleep(1)
+                # Wait for the next slice's tick (skip after the last trade)
+                if i < self.number_of_trades - 1:
+                    await self.clock.wait_for_tick(
+                        self.start_tick + (i + 1) * self.ticks_between_trades
+                    )
+        finally:
+            if owns_clock:
+                await self.clock.stop()
+        print(
+            f"VWAP {self.action.value} {self.ticker} filled {self.filled_quantity} "
+            f"of {self.number_of_shares_to_fill} at {self.average_price}"
+        )
+
+
+async def run_vwap_orders(
+    configs: list, is_order_detail_allowed=False, use_volume_profile=False
+):
+    """
+    Runs several VWAP parent orders concurrently on one event loop.
+
+    Parents trading on the same case share a single tick clock and the set
+    of child orders already claimed.
+
+    Returns:
+        The VWAPStrategy of every parent, in the order of configs.
+    """
+    clocks = {}
+    claimed_orders = {}
+    strategies = []
+    for config in configs:
+        strategy = VWAPStrategy(config, use_volume_profile=use_volume_profile)
+        key = auth_key(strategy.auth)
+        if key not in clocks:
+            clocks[key] = strategy.clock
+            claimed_orders[key] = strategy.claimed_orders
+        strategy.clock = clocks[key]
+        strategy.claimed_orders = claimed_orders[key]
+        strategies.append(strategy)
+
+    for clock in clocks.values():
+        clock.start()
+    try:
+        results = await asyncio.gather(
+            *(strategy.start(is_order_detail_allowed) for strategy in strategies),
+            return_exceptions=True,
+        )
+        for strategy, result in zip(strategies, results):
+            if isinstance(result, Exception):
+                print(f"VWAP {strategy.action.value} {strategy.ticker} failed: {result}")
+    finally:
+        for clock in clocks.values():
+            await clock.stop()
+    return strategies